@@ -0,0 +1,122 @@
+"""
+Event-loop blocking benchmark for the Socket.IO data-access path.
+
+Runs the same GameService work the socket handlers do, first through the
+old synchronous SessionLocal call made directly on the event loop, then
+through the two socketio_server paths: AsyncSession.run_sync on the asyncio
+driver, and sync sessions on the bounded RoomExecutor thread pool. A probe
+task measures how late the loop wakes it up; that lag is time every other
+connected racer would have waited.
+
+Usage:
+    python -m backend.benchmarks.event_loop_blocking --ops 200 --concurrency 20 --query-delay-ms 5
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import text
+
+from ..database import SessionLocal, engine
+from ..services.game_service import GameService
+from ..realtime.executor import game_executor
+from ..socketio_server import call_with_async_session, call_with_session
+
+PROBE_INTERVAL = 0.001
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def handler_work(svc: GameService, delay_s: float) -> None:
+    """What a typical handler does: resolve a room, optionally hit a slow query"""
+    svc.get_race_snapshot("BENCH0")
+    if delay_s and engine.dialect.name == "postgresql":
+        svc.db.execute(text("SELECT pg_sleep(:s)"), {"s": delay_s})
+
+
+async def sync_handler(delay_s: float) -> None:
+    """Old path: blocking session straight on the event loop"""
+    db = SessionLocal()
+    try:
+        handler_work(GameService(db), delay_s)
+    finally:
+        db.close()
+
+
+async def async_handler(delay_s: float) -> None:
+    """Same service code through the async session"""
+    await call_with_async_session(handler_work, delay_s)
+
+
+async def threadpool_handler(delay_s: float) -> None:
+    """Same service code on the bounded executor (one room per op, so no ordering waits)"""
+    await game_executor.submit(f"BENCH-{id(asyncio.current_task())}", call_with_session, handler_work, delay_s)
+
+
+async def probe(lags: list, stop: asyncio.Event) -> None:
+    """Record how late the loop resumes a 1 ms sleep"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(0.0, loop.time() - start - PROBE_INTERVAL) * 1000)
+
+
+async def run_mode(name: str, handler, ops: int, concurrency: int, delay_s: float) -> dict:
+    lags: list = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await handler(delay_s)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(ops)))
+    wall_ms = (time.perf_counter() - started) * 1000
+    stop.set()
+    await probe_task
+
+    return {
+        "mode": name,
+        "ops": ops,
+        "concurrency": concurrency,
+        "wall_ms": round(wall_ms, 2),
+        "ops_per_s": round(ops / (wall_ms / 1000), 1) if wall_ms else 0.0,
+        "loop_lag_p50_ms": round(percentile(lags, 50), 3),
+        "loop_lag_p99_ms": round(percentile(lags, 99), 3),
+        "loop_lag_max_ms": round(max(lags, default=0.0), 3),
+        "loop_blocked_ms": round(sum(lag for lag in lags if lag > 1.0), 2)
+    }
+
+
+async def main(ops: int, concurrency: int, delay_ms: float) -> list:
+    delay_s = delay_ms / 1000
+    # Warm every connection pool so pool setup isn't measured
+    await sync_handler(0)
+    await async_handler(0)
+    await threadpool_handler(0)
+    return [
+        await run_mode("sync_on_loop", sync_handler, ops, concurrency, delay_s),
+        await run_mode("async_session", async_handler, ops, concurrency, delay_s),
+        await run_mode("threadpool_executor", threadpool_handler, ops, concurrency, delay_s)
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--query-delay-ms", type=float, default=5.0,
+                        help="Extra server-side query time per op (PostgreSQL only)")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.ops, args.concurrency, args.query_delay_ms)), indent=2))
@@ -0,0 +1,301 @@
+"""
+Socket.IO race load generator.
+
+Simulates M rooms of N racers against backend.main:app using the real
+socket events: every racer connects and sends join_room, the host sends
+start_game, then everyone sends update_progress at a fixed rate at a
+realistic typing speed until the snippet is done (or --duration runs out)
+and sends finish_race. Latency is measured from the moment a racer emits
+update_progress to every progress_update frame that carries that value
+(including the sender's own copy), across all rooms.
+
+By default the app runs in-process under uvicorn on a free port, against
+whatever DATABASE_URL points at: a local PostgreSQL or a SQLite file such
+as ``sqlite:///./load.db``. Pass --url to target a server that is already
+running on the same database instead. Clients and server then no longer
+share one event loop, which gives cleaner latency numbers.
+
+Results are printed as one JSON document for regression tracking (the
+server's own log lines share stdout; use --output to get a clean file).
+Requires the aiohttp package (socket.io client transport).
+
+Usage:
+    python -m backend.benchmarks.race_load --rooms 20 --racers 4 --duration 30 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import time
+import uuid
+
+import aiohttp
+import socketio
+import uvicorn
+
+from ..database import SessionLocal
+from ..models import User, Game, GameParticipant
+from .event_loop_blocking import percentile
+
+
+class LoadStats:
+    """Counters and latency samples shared by every simulated racer"""
+
+    def __init__(self):
+        self.sent_at = {}
+        self.latencies_ms = []
+        self.progress_sent = 0
+        self.frames_received = 0
+        self.updates_received = 0
+        self.rooms_started = 0
+        self.rooms_finished = 0
+        self.errors = []
+
+    def record_frame(self, room_code: str, data: dict) -> None:
+        now = time.perf_counter()
+        self.frames_received += 1
+        for update in data.get('updates', [data]):
+            self.updates_received += 1
+            sent = self.sent_at.get((room_code, update.get('user_id'), update.get('progress')))
+            if sent is not None:
+                self.latencies_ms.append((now - sent) * 1000)
+
+    def report(self) -> dict:
+        samples = self.latencies_ms
+        return {
+            "progress_sent": self.progress_sent,
+            "progress_frames_received": self.frames_received,
+            "progress_updates_received": self.updates_received,
+            "rooms_started": self.rooms_started,
+            "rooms_finished": self.rooms_finished,
+            "latency_ms": {
+                "samples": len(samples),
+                "p50": round(percentile(samples, 50), 3),
+                "p95": round(percentile(samples, 95), 3),
+                "p99": round(percentile(samples, 99), 3),
+                "max": round(max(samples, default=0.0), 3)
+            },
+            "errors": len(self.errors),
+            "error_samples": self.errors[:5]
+        }
+
+
+class Racer:
+    """One simulated player with its own Socket.IO connection"""
+
+    def __init__(self, url: str, room_code: str, user_id: int, stats: LoadStats):
+        self.url = url
+        self.room_code = room_code
+        self.user_id = user_id
+        self.stats = stats
+        self.started = asyncio.Event()
+        self.game_finished = asyncio.Event()
+        self.client = socketio.AsyncClient(reconnection=False)
+        self.client.on('progress_update', lambda data: stats.record_frame(room_code, data))
+        self.client.on('game_started', lambda data: self.started.set())
+        self.client.on('game_finished', lambda data: self.game_finished.set())
+        self.client.on('error', lambda data: stats.errors.append(data))
+
+    async def join(self) -> None:
+        await self.client.connect(self.url, transports=['websocket'], socketio_path='/socket.io')
+        await self.client.emit('join_room', {'room_code': self.room_code, 'user_id': self.user_id})
+
+    async def race(self, snippet_len: int, wpm: float, rate_hz: float, deadline: float) -> None:
+        """Type the snippet at `wpm` (5 chars per word), reporting `rate_hz` times a second"""
+        interval = 1 / rate_hz
+        chars_per_tick = wpm * 5 / 60 * interval
+        accuracy = random.uniform(90, 100)
+        typed = 0.0
+        # Spread racers across the tick so updates don't arrive in lockstep
+        await asyncio.sleep(random.uniform(0, interval))
+        while typed < snippet_len and time.perf_counter() < deadline:
+            typed = min(snippet_len, typed + chars_per_tick)
+            progress = int(typed)
+            self.stats.sent_at[(self.room_code, self.user_id, progress)] = time.perf_counter()
+            self.stats.progress_sent += 1
+            await self.client.emit('update_progress', {
+                'room_code': self.room_code,
+                'user_id': self.user_id,
+                'progress': progress,
+                'wpm': round(wpm, 1),
+                'accuracy': round(accuracy, 2)
+            })
+            await asyncio.sleep(interval)
+        await self.client.emit('finish_race', {
+            'room_code': self.room_code,
+            'user_id': self.user_id,
+            'wpm': round(wpm, 1),
+            'accuracy': round(accuracy, 2)
+        })
+
+    async def close(self) -> None:
+        if self.client.connected:
+            # A bare disconnect only marks the racer away for the resume window
+            await self.client.emit('leave_room', {'room_code': self.room_code, 'user_id': self.user_id})
+            await self.client.disconnect()
+
+
+def create_users(count: int) -> list:
+    """Insert throwaway users directly; signup's password hashing would dominate setup"""
+    run = uuid.uuid4().hex[:8]
+    db = SessionLocal()
+    try:
+        users = [
+            User(username=f"load_{run}_{i}", email=f"load_{run}_{i}@example.com", password_hash="-")
+            for i in range(count)
+        ]
+        db.add_all(users)
+        db.commit()
+        return [u.id for u in users]
+    finally:
+        db.close()
+
+
+def delete_users(user_ids: list) -> None:
+    """Remove the run's users along with any games or participants that outlived it"""
+    db = SessionLocal()
+    try:
+        game_ids = [g.id for g in db.query(Game.id).filter(Game.host_user_id.in_(user_ids))]
+        db.query(GameParticipant).filter(
+            GameParticipant.user_id.in_(user_ids) | GameParticipant.game_id.in_(game_ids)
+        ).delete(synchronize_session=False)
+        db.query(Game).filter(Game.id.in_(game_ids)).delete(synchronize_session=False)
+        db.query(User).filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def setup_room(http: aiohttp.ClientSession, url: str, user_ids: list) -> tuple:
+    """Create a room over REST, join the other racers and return (room_code, snippet length)"""
+    async with http.post(f"{url}/games/create", json={'user_id': user_ids[0], 'max_players': len(user_ids)}) as res:
+        res.raise_for_status()
+        room_code = (await res.json())['room_code']
+    for user_id in user_ids[1:]:
+        async with http.post(f"{url}/games/join", json={'user_id': user_id, 'room_code': room_code}) as res:
+            res.raise_for_status()
+    async with http.get(f"{url}/games/{room_code}") as res:
+        res.raise_for_status()
+        snippet_len = len((await res.json())['snippet_code'])
+    return room_code, snippet_len
+
+
+async def run_room(url: str, room_code: str, snippet_len: int, user_ids: list, stats: LoadStats, args) -> None:
+    racers = [Racer(url, room_code, user_id, stats) for user_id in user_ids]
+    try:
+        await asyncio.gather(*(racer.join() for racer in racers))
+        # Give the join broadcasts a moment before the host starts
+        await asyncio.sleep(0.2)
+        await racers[0].client.emit('start_game', {'room_code': room_code, 'user_id': user_ids[0]})
+        await asyncio.wait_for(asyncio.gather(*(r.started.wait() for r in racers)), timeout=10)
+        stats.rooms_started += 1
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(*(
+            racer.race(snippet_len, random.gauss(args.wpm, args.wpm * 0.15), args.rate, deadline)
+            for racer in racers
+        ))
+        await asyncio.wait_for(racers[0].game_finished.wait(), timeout=10)
+        stats.rooms_finished += 1
+    except Exception as e:
+        stats.errors.append(f"{room_code}: {type(e).__name__}: {e}")
+    finally:
+        await asyncio.gather(*(racer.close() for racer in racers), return_exceptions=True)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def start_server() -> tuple:
+    """Serve backend.main:app in-process and return (server, task, base url)"""
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config("backend.main:app", host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    return server, task, f"http://127.0.0.1:{port}"
+
+
+def server_stats() -> dict:
+    """Counters of the in-process server's real-time pipeline"""
+    from ..realtime.executor import game_executor
+    from ..realtime.rate_limit import progress_limiter
+    from ..socketio_server import progress_broadcaster, outbound
+    return {
+        "broadcaster": progress_broadcaster.stats(),
+        "outbound": outbound.stats(),
+        "rate_limit": progress_limiter.stats(),
+        "executor": game_executor.stats()
+    }
+
+
+async def main(args) -> dict:
+    server = task = None
+    url = args.url
+    if url is None:
+        server, task, url = await start_server()
+    stats = LoadStats()
+    user_ids = await asyncio.to_thread(create_users, args.rooms * args.racers)
+    groups = [user_ids[i:i + args.racers] for i in range(0, len(user_ids), args.racers)]
+    try:
+        setup_started = time.perf_counter()
+        async with aiohttp.ClientSession() as http:
+            rooms = [await setup_room(http, url, group) for group in groups]
+        setup_s = time.perf_counter() - setup_started
+
+        race_started = time.perf_counter()
+        await asyncio.gather(*(
+            run_room(url, room_code, snippet_len, group, stats, args)
+            for (room_code, snippet_len), group in zip(rooms, groups)
+        ))
+        race_s = time.perf_counter() - race_started
+        # Racers leave at the end, which deletes their games; give the
+        # server a moment, and delete_users removes whatever is left
+        await asyncio.sleep(0.5)
+    finally:
+        result = {
+            "config": {
+                "rooms": args.rooms,
+                "racers_per_room": args.racers,
+                "wpm": args.wpm,
+                "rate_hz": args.rate,
+                "duration_s": args.duration,
+                "target": args.url or "in-process"
+            }
+        }
+        if server is not None:
+            result["server"] = server_stats()
+            server.should_exit = True
+            await task
+        await asyncio.to_thread(delete_users, user_ids)
+
+    result.update(stats.report())
+    result.update({
+        "setup_s": round(setup_s, 3),
+        "race_s": round(race_s, 3),
+        "progress_sent_per_s": round(stats.progress_sent / race_s, 1) if race_s else 0.0,
+        "progress_updates_received_per_s": round(stats.updates_received / race_s, 1) if race_s else 0.0
+    })
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument("--racers", type=int, default=4, help="Racers per room")
+    parser.add_argument("--wpm", type=float, default=60.0, help="Mean typing speed")
+    parser.add_argument("--rate", type=float, default=5.0, help="Progress updates per racer per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Max race length in seconds")
+    parser.add_argument("--url", default=None, help="Target an already running server instead")
+    parser.add_argument("--output", default=None, help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    report = json.dumps(asyncio.run(main(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    print(report)
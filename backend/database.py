@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.pool import NullPool
 from dotenv import load_dotenv
@@ -17,6 +19,9 @@ if not DATABASE_URL:
 
 def create_database_if_not_exists():
     """Check if database exists, create it if it doesn't."""
+    if make_url(DATABASE_URL).get_backend_name() != "postgresql":
+        # SQLite stand-ins (tests, benchmarks) create their file on connect
+        return
     parsed_url = urlparse(DATABASE_URL)
     username = parsed_url.username
     password = parsed_url.password
@@ -59,21 +64,51 @@ def create_database_if_not_exists():
         raise
 
 
+# SQLite connections are handed to the socket executor's worker threads
+connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+
 # Create SQLAlchemy engine for PostgreSQL with connection health checks
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+engine = create_engine(DATABASE_URL, pool_pre_ping=True, connect_args=connect_args)
 
 # Database session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def make_async_url(database_url: str) -> str:
+    """Map a sync database URL to the equivalent asyncio driver URL"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend in ("postgresql", "postgres"):
+        url = url.set(drivername="postgresql+asyncpg")
+    elif backend == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url.render_as_string(hide_password=False)
+
+
+# Async engine for Socket.IO handlers so queries never block the event loop
+async_engine = create_async_engine(make_async_url(DATABASE_URL), pool_pre_ping=True)
+
+# Async session factory; objects stay usable after commit since handlers
+# read them once the session is closed
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 # Base class for ORM models
 Base = declarative_base()
 
 def init_db():
-    """Creates database if it doesn't exist, then creates tables and seeds data."""
+    """Creates database if it doesn't exist, then creates or upgrades tables and seeds data."""
     create_database_if_not_exists()
     Base.metadata.create_all(bind=engine)
     print("✅ Database tables created successfully.")
     
+    # create_all never alters existing tables; upgrade those in place
+    try:
+        from .migrations import upgrade_schema
+    except ImportError:
+        from migrations import upgrade_schema
+    
+    upgrade_schema(engine)
+    
     # Import and run seed_data function
     try:
         from .seed_data import seed_data
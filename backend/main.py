@@ -1,14 +1,22 @@
 import os
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
-from .database import init_db
+from .database import init_db, engine, async_engine
 from .routes import auth as auth_router
 from .routes import codesnippets as snippets_router
 from .routes import games as games_router
 from .routes import users as users_router
-from .socketio_server import sio
+from .socketio_server import sio, progress_broadcaster, spectator_feed, connections
+from .realtime.write_behind import progress_writer
+from .realtime.executor import game_executor
+from .realtime.affinity import room_affinity
+from .realtime.timers import room_timers
+from .realtime.reaper import game_reaper
+from .realtime.matchmaking import matchmaker
+from .realtime.metrics import metrics, MetricsMiddleware, instrument_engine
 import socketio
 
 
@@ -18,7 +26,26 @@ import socketio
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    progress_writer.start()
+    progress_broadcaster.start()
+    spectator_feed.start()
+    connections.start()
+    room_affinity.start()
+    room_timers.start()
+    game_reaper.start()
+    matchmaker.start()
     yield
+    await matchmaker.stop()
+    await game_reaper.stop()
+    await room_timers.stop()
+    await room_affinity.stop()
+    await connections.stop()
+    # Flush buffered race progress before shutting down
+    await progress_broadcaster.stop()
+    await spectator_feed.stop()
+    await progress_writer.stop()
+    game_executor.shutdown()
+    await connections.close()
 
 
 # --------------------------
@@ -26,6 +53,10 @@ async def lifespan(app: FastAPI):
 # --------------------------
 app = FastAPI(lifespan=lifespan)
 
+# Query time per request / socket event, for both sync and async sessions
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 
 # --------------------------
 # CORS CONFIGURATION
@@ -59,6 +90,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms (outermost, so they include CORS handling)
+app.add_middleware(MetricsMiddleware)
+
 
 # --------------------------
 # HEALTH CHECK
@@ -68,6 +102,15 @@ def root():
     return {"status": "healthy", "app": "CodeRacer API"}
 
 
+# --------------------------
+# METRICS
+# --------------------------
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Latency histograms and load gauges in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # --------------------------
 # INCLUDE ROUTERS
 # --------------------------
@@ -0,0 +1,61 @@
+"""
+In-place schema upgrades for existing databases.
+
+Base.metadata.create_all only creates missing tables; it never alters a
+table that already exists. Every upgrade here is idempotent and checks the
+live schema first, so init_db can run it on every startup.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+try:
+    from .models import RaceReplay
+except ImportError:
+    from models import RaceReplay
+
+# Game counters added after the games table first shipped
+GAME_COUNTER_COLUMNS = ("player_count", "finished_count", "last_finish_position")
+
+# Recompute the counters from the participant rows they summarise
+BACKFILL_GAME_COUNTERS = text("""
+    UPDATE games SET
+        player_count = (
+            SELECT COUNT(*) FROM game_participants p WHERE p.game_id = games.id
+        ),
+        finished_count = (
+            SELECT COUNT(*) FROM game_participants p WHERE p.game_id = games.id AND p.is_finished
+        ),
+        last_finish_position = COALESCE((
+            SELECT MAX(p.finish_position) FROM game_participants p WHERE p.game_id = games.id
+        ), 0)
+""")
+
+
+def add_game_counters(engine: Engine) -> bool:
+    """Add and backfill the games counter columns; returns whether any were missing"""
+    existing = {c["name"] for c in inspect(engine).get_columns("games")}
+    missing = [name for name in GAME_COUNTER_COLUMNS if name not in existing]
+    if not missing:
+        return False
+    with engine.begin() as conn:
+        for name in missing:
+            conn.execute(text(f"ALTER TABLE games ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+        # A 0 player_count would end in-progress races on their first finisher
+        conn.execute(BACKFILL_GAME_COUNTERS)
+    return True
+
+
+def add_game_status_index(engine: Engine) -> None:
+    """Index games.status for the reaper's per-status scans"""
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_games_status ON games (status)"))
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """Bring an existing database up to the current models"""
+    tables = set(inspect(engine).get_table_names())
+    if "race_replays" not in tables:
+        RaceReplay.__table__.create(bind=engine, checkfirst=True)
+    if "games" in tables and add_game_counters(engine):
+        print("✅ Added and backfilled game counters.")
+    add_game_status_index(engine)
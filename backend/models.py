@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Numeric, TIMESTAMP, Boolean, Float
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Numeric, TIMESTAMP, Boolean, Float, LargeBinary
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .database import Base  # .database jostain syystä
@@ -65,8 +65,13 @@ class Game(Base):
     room_code = Column(String(10), unique=True, nullable=False, index=True)
     host_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     snippet_id = Column(Integer, ForeignKey("snippets.id"), nullable=False)
-    status = Column(String(20), default="waiting")  # waiting, in_progress, finished
+    status = Column(String(20), default="waiting", index=True)  # waiting, in_progress, finished
     max_players = Column(Integer, default=4)
+    # Maintained atomically alongside participant changes for O(1) finish checks
+    player_count = Column(Integer, nullable=False, default=0, server_default="0")
+    finished_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Last finish position handed out; advanced atomically per finisher
+    last_finish_position = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(TIMESTAMP, server_default=func.now())
     started_at = Column(TIMESTAMP, nullable=True)
     finished_at = Column(TIMESTAMP, nullable=True)
@@ -92,3 +97,17 @@ class GameParticipant(Base):
 
     game = relationship("Game", back_populates="participants")
     user = relationship("User", back_populates="game_participants")
+
+
+class RaceReplay(Base):
+    __tablename__ = "race_replays"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Replays outlive their game row, which is deleted when the room empties
+    game_id = Column(Integer, ForeignKey("games.id", ondelete="SET NULL"), nullable=True, index=True)
+    room_code = Column(String(10), nullable=False, index=True)
+    snippet_id = Column(Integer, ForeignKey("snippets.id"), nullable=True)
+    duration_ms = Column(Integer, nullable=False)
+    event_count = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)  # Packed timeline, see realtime/replay.py
+    created_at = Column(TIMESTAMP, server_default=func.now())
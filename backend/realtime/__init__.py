@@ -0,0 +1 @@
+# In-process real-time race state and Socket.IO helpers
@@ -0,0 +1,188 @@
+"""
+Room-to-worker affinity.
+
+Room codes map to a worker by rendezvous (highest random weight) hashing
+over the live worker set, so a worker joining or leaving only moves the
+rooms that hash to it. Workers announce themselves in Redis with a
+heartbeat (a sorted set scored by last-seen time plus a hash of public
+endpoints). Clients look up a room's endpoint via GET
+/games/{room_code}/endpoint, or are redirected with a ``room_migrate``
+event, so every socket of a room lands on its owner. The owner then emits
+to the room locally (ignore_queue) and only falls back to the Redis message
+queue for rooms it doesn't own and while rooms settle after a rebalance.
+
+Off unless ROOM_AFFINITY=1 and REDIS_URL are set; broadcasts then always
+go through the message queue, as before.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from .room_backend import NODE_ID, ROOM_STATE_PREFIX, WORKER_HEARTBEAT_S, WORKER_TTL_S
+
+ROOM_AFFINITY = os.getenv("ROOM_AFFINITY", "0") == "1"
+NODE_ENDPOINT = os.getenv("NODE_ENDPOINT") or None
+ROOM_MIGRATION_GRACE_S = float(os.getenv("ROOM_MIGRATION_GRACE_S", "30"))
+
+# Called with (previous workers, current workers, dead workers this node claimed)
+OnRebalance = Callable[[Tuple[str, ...], Tuple[str, ...], List[str]], Awaitable[None]]
+
+
+def owner_of(room_code: str, nodes: Iterable[str]) -> Optional[str]:
+    """Rendezvous hash: the worker with the highest weight for this room"""
+    best, best_weight = None, -1
+    for node in nodes:
+        digest = hashlib.blake2b(f"{node}|{room_code}".encode(), digest_size=8).digest()
+        weight = int.from_bytes(digest, "big")
+        if weight > best_weight:
+            best, best_weight = node, weight
+    return best
+
+
+class AffinityRouter:
+    """Tracks live workers and decides which one owns each room"""
+
+    def __init__(
+        self,
+        node_id: str = NODE_ID,
+        endpoint: Optional[str] = NODE_ENDPOINT,
+        redis=None,
+        enabled: bool = ROOM_AFFINITY,
+        heartbeat_s: float = WORKER_HEARTBEAT_S,
+        ttl_s: float = WORKER_TTL_S,
+        grace_s: float = ROOM_MIGRATION_GRACE_S,
+        prefix: str = ROOM_STATE_PREFIX,
+        clock: Callable[[], float] = time.time
+    ):
+        self.node_id = node_id
+        self.endpoint = endpoint
+        self.redis = redis
+        self.enabled = enabled
+        self.heartbeat_s = heartbeat_s
+        self.ttl_s = ttl_s
+        self.grace_s = grace_s
+        self.clock = clock
+        self.workers_key = f"{prefix}:workers"
+        self.endpoints_key = f"{prefix}:endpoints"
+        self.nodes: Tuple[str, ...] = (node_id,)
+        self.endpoints: Dict[str, Optional[str]] = {node_id: endpoint}
+        self.rebalanced_at = float("-inf")
+        self.on_rebalance: Optional[OnRebalance] = None
+        self._task: Optional[asyncio.Task] = None
+        self.rebalances = 0
+        self.local_emits = 0
+        self.queued_emits = 0
+
+    @property
+    def active(self) -> bool:
+        """Affinity only matters when workers share a message queue"""
+        return self.enabled and self.redis is not None
+
+    def owner(self, room_code: str) -> Optional[str]:
+        return owner_of(room_code, self.nodes)
+
+    def owns(self, room_code: str) -> bool:
+        return self.owner(room_code) == self.node_id
+
+    def endpoint_for(self, room_code: str) -> Optional[str]:
+        """Public Socket.IO endpoint of the room's owner, if it announced one"""
+        return self.endpoints.get(self.owner(room_code))
+
+    def migrating(self) -> bool:
+        """Whether rooms may still have sockets on their previous owner"""
+        return self.clock() - self.rebalanced_at < self.grace_s
+
+    def use_queue(self, room_code: str) -> bool:
+        """Whether a broadcast to this room has to go through the message queue"""
+        if not self.active:
+            # Plain multi-worker fan-out; not an affinity decision to count
+            return True
+        if not self.migrating() and self.owns(room_code):
+            self.local_emits += 1
+            return False
+        self.queued_emits += 1
+        return True
+
+    async def refresh(self) -> bool:
+        """Heartbeat, reload the live worker set, and report whether it changed"""
+        if not self.active:
+            return False
+        now = self.clock()
+        cutoff = now - self.ttl_s
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.workers_key, {self.node_id: now})
+            pipe.hset(self.endpoints_key, self.node_id, self.endpoint or "")
+            pipe.zrangebyscore(self.workers_key, cutoff, "+inf")
+            pipe.zrangebyscore(self.workers_key, "-inf", f"({cutoff}")
+            pipe.hgetall(self.endpoints_key)
+            _, _, live, stale, endpoints = await pipe.execute()
+        # Whoever removes a stale worker first owns its cleanup
+        dead = []
+        for node in stale:
+            if await self.redis.zrem(self.workers_key, node):
+                await self.redis.hdel(self.endpoints_key, node)
+                dead.append(node)
+        self.endpoints = {node: endpoints.get(node) or None for node in live}
+        nodes = tuple(sorted(live))
+        if nodes == self.nodes and not dead:
+            return False
+        previous, self.nodes = self.nodes, nodes
+        if nodes != previous:
+            self.rebalanced_at = now
+            self.rebalances += 1
+        if self.on_rebalance is not None:
+            await self.on_rebalance(previous, nodes, dead)
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Worker heartbeat failed: {e}")
+            await asyncio.sleep(self.heartbeat_s)
+
+    def start(self) -> None:
+        """Start heartbeating on the running event loop"""
+        if self.active and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop heartbeating and deregister so other workers rebalance promptly"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.active:
+            await self.redis.zrem(self.workers_key, self.node_id)
+            await self.redis.hdel(self.endpoints_key, self.node_id)
+            await self.redis.aclose()
+
+    def stats(self) -> dict:
+        """Worker set and how many broadcasts skipped the message queue"""
+        return {
+            "enabled": self.active,
+            "node_id": self.node_id,
+            "workers": len(self.nodes),
+            "rebalances": self.rebalances,
+            "migrating": self.migrating(),
+            "local_emits": self.local_emits,
+            "queued_emits": self.queued_emits
+        }
+
+
+def _create_router() -> AffinityRouter:
+    redis_url = os.getenv("REDIS_URL")
+    client = aioredis.from_url(redis_url, decode_responses=True) if ROOM_AFFINITY and redis_url else None
+    return AffinityRouter(redis=client)
+
+
+# Process-wide router shared by the socket handlers and the endpoint route
+room_affinity = _create_router()
@@ -0,0 +1,119 @@
+"""
+Tick-based progress broadcasting.
+
+Instead of emitting one progress_update per inbound event, handlers mark
+participants dirty and a single ticker emits at most one merged frame per
+room per tick. Outbound message count then scales with the number of rooms
+and the tick rate, not with keystroke rate.
+"""
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .race_state import ParticipantState
+
+PROGRESS_TICK_HZ = float(os.getenv("PROGRESS_TICK_HZ", "15"))
+
+# Called with the room code and the participants that changed since the last tick
+EmitFrame = Callable[[str, List[ParticipantState]], Awaitable[None]]
+
+
+def progress_entry(participant: ParticipantState) -> dict:
+    """Compact per-participant entry of a progress frame"""
+    return {
+        'user_id': participant.user_id,
+        'progress': participant.progress,
+        'wpm': float(participant.wpm),
+        'accuracy': float(participant.accuracy)
+    }
+
+
+def progress_frame(room_code: str, participants: List[ParticipantState]) -> dict:
+    """JSON room frame carrying the latest values of every changed participant"""
+    return {
+        'room_code': room_code,
+        'updates': [progress_entry(p) for p in participants]
+    }
+
+
+class ProgressBroadcaster:
+    """Merges progress changes per room and emits them once per tick"""
+
+    def __init__(self, emit: EmitFrame, tick_hz: float = PROGRESS_TICK_HZ):
+        self.emit = emit
+        self.interval = 1 / tick_hz
+        # room_code -> {user_id -> participant changed since the last tick}
+        self._dirty: Dict[str, Dict[int, ParticipantState]] = {}
+        self._task: Optional[asyncio.Task] = None
+        # Counters
+        self.changes = 0
+        self.frames = 0
+        self.ticks = 0
+
+    def mark_dirty(self, room_code: str, participant: ParticipantState) -> None:
+        """Queue a participant's latest progress for the room's next frame"""
+        self.changes += 1
+        self._dirty.setdefault(room_code, {})[participant.user_id] = participant
+
+    def discard_room(self, room_code: str) -> None:
+        """Drop pending changes for a room, e.g. after it was deleted"""
+        self._dirty.pop(room_code, None)
+
+    async def flush_room(self, room_code: str) -> bool:
+        """Emit a room's pending frame now instead of waiting for the tick"""
+        changed = self._dirty.pop(room_code, None)
+        if not changed:
+            return False
+        self.frames += 1
+        await self.emit(room_code, list(changed.values()))
+        return True
+
+    async def tick(self) -> int:
+        """Emit one merged frame per dirty room and return the frame count"""
+        self.ticks += 1
+        dirty, self._dirty = self._dirty, {}
+        for room_code, changed in dirty.items():
+            self.frames += 1
+            try:
+                await self.emit(room_code, list(changed.values()))
+            except Exception as e:
+                print(f"Progress broadcast to {room_code} failed: {e}")
+        return len(dirty)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += self.interval
+            await self.tick()
+            # Sleep to the next deadline so slow ticks don't drift the rate,
+            # but never try to catch up on ticks that were missed entirely
+            now = loop.time()
+            if next_tick < now:
+                next_tick = now
+            await asyncio.sleep(next_tick - now)
+
+    def start(self) -> None:
+        """Start the ticker on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the ticker after emitting whatever is pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.tick()
+
+    def stats(self) -> dict:
+        """Counters for comparing inbound changes with outbound frames"""
+        return {
+            'pending_rooms': len(self._dirty),
+            'changes': self.changes,
+            'frames': self.frames,
+            'ticks': self.ticks
+        }
@@ -0,0 +1,72 @@
+"""
+Connection registry for Socket.IO rooms.
+
+Keeps room -> {sid -> user_id} and the reverse sid -> {room_code} index in
+sync so join, leave and disconnect each cost O(1) per membership instead of
+scanning every active room.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class ConnectionRegistry:
+    """Bidirectional index of socket room memberships"""
+
+    def __init__(self):
+        self._rooms: Dict[str, Dict[str, int]] = {}
+        self._sid_rooms: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        """Number of rooms with at least one connection"""
+        return len(self._rooms)
+
+    def add(self, room_code: str, sid: str, user_id: int) -> None:
+        """Record that a socket joined a room as the given user"""
+        self._rooms.setdefault(room_code, {})[sid] = user_id
+        self._sid_rooms.setdefault(sid, set()).add(room_code)
+
+    def remove(self, room_code: str, sid: str) -> Optional[int]:
+        """Remove one membership and return its user_id, if it existed"""
+        members = self._rooms.get(room_code)
+        if members is None or sid not in members:
+            return None
+        user_id = members.pop(sid)
+        if not members:
+            del self._rooms[room_code]
+        rooms = self._sid_rooms.get(sid)
+        if rooms is not None:
+            rooms.discard(room_code)
+            if not rooms:
+                del self._sid_rooms[sid]
+        return user_id
+
+    def pop_sid(self, sid: str) -> List[Tuple[str, int]]:
+        """Remove every membership of a socket and return (room_code, user_id) pairs"""
+        removed = []
+        for room_code in self._sid_rooms.pop(sid, set()):
+            members = self._rooms.get(room_code)
+            if members is None or sid not in members:
+                continue
+            removed.append((room_code, members.pop(sid)))
+            if not members:
+                del self._rooms[room_code]
+        return removed
+
+    def members(self, room_code: str) -> Dict[str, int]:
+        """Copy of a room's sid -> user_id mapping"""
+        return dict(self._rooms.get(room_code, {}))
+
+    def room_codes(self) -> List[str]:
+        """Rooms with at least one connection"""
+        return list(self._rooms)
+
+    def rooms_of(self, sid: str) -> Set[str]:
+        """Copy of the rooms a socket is in"""
+        return set(self._sid_rooms.get(sid, set()))
+
+    def user_of(self, room_code: str, sid: str) -> Optional[int]:
+        """user_id a socket joined a room as, if any"""
+        return self._rooms.get(room_code, {}).get(sid)
+
+    def connection_count(self) -> int:
+        """Number of sockets in at least one room"""
+        return len(self._sid_rooms)
@@ -0,0 +1,149 @@
+"""
+Bounded executor for GameService work issued by Socket.IO handlers.
+
+Jobs for the same room run strictly in submission order, jobs for different
+rooms run in parallel on a fixed-size thread pool, and submissions beyond a
+queue-depth limit are rejected instead of piling up behind slow queries.
+"""
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict
+
+SOCKET_DB_WORKERS = int(os.getenv("SOCKET_DB_WORKERS", "8"))
+SOCKET_DB_MAX_PENDING = int(os.getenv("SOCKET_DB_MAX_PENDING", "256"))
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised when the executor already has the maximum number of pending jobs"""
+
+
+class LatencyStats:
+    """Running count/total/max of a latency in milliseconds"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms: float) -> None:
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3)
+        }
+
+
+class RoomExecutor:
+    """Per-room ordered, depth-limited executor for blocking service calls"""
+
+    def __init__(self, max_workers: int = SOCKET_DB_WORKERS, max_pending: int = SOCKET_DB_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="game-service")
+        # room_code -> lock serialising that room's jobs, and how many jobs hold a reference
+        self._room_locks: Dict[str, asyncio.Lock] = {}
+        self._room_refs: Dict[str, int] = {}
+        self.pending = 0
+        # Metrics
+        self.submitted = 0
+        self.rejected = 0
+        self.failed = 0
+        self.queue_wait = LatencyStats()
+        self.execution = LatencyStats()
+
+    async def submit(self, room_code: str, fn: Callable, *args, reject_when_full: bool = True):
+        """Run blocking fn(*args) on the pool after earlier jobs for the same room"""
+        loop = asyncio.get_running_loop()
+
+        async def run_on_pool(enqueued: float):
+            timings = {}
+
+            def timed():
+                timings["start"] = time.perf_counter()
+                try:
+                    return fn(*args)
+                finally:
+                    timings["end"] = time.perf_counter()
+
+            # Carry the caller's context (e.g. its metrics DbTimer) onto the thread
+            context = contextvars.copy_context()
+            try:
+                return await loop.run_in_executor(self._pool, context.run, timed)
+            finally:
+                if "start" in timings:
+                    self.queue_wait.record((timings["start"] - enqueued) * 1000)
+                    self.execution.record((timings["end"] - timings["start"]) * 1000)
+
+        return await self._ordered(room_code, run_on_pool, reject_when_full)
+
+    async def submit_async(
+        self,
+        room_code: str,
+        fn: Callable[..., Awaitable],
+        *args,
+        reject_when_full: bool = True
+    ):
+        """Await fn(*args) on the loop after earlier jobs for the same room"""
+        async def run_on_loop(enqueued: float):
+            start = time.perf_counter()
+            self.queue_wait.record((start - enqueued) * 1000)
+            try:
+                return await fn(*args)
+            finally:
+                self.execution.record((time.perf_counter() - start) * 1000)
+
+        return await self._ordered(room_code, run_on_loop, reject_when_full)
+
+    async def _ordered(self, room_code: str, run, reject_when_full: bool):
+        if reject_when_full and self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ExecutorSaturatedError("Server busy, please retry")
+        self.pending += 1
+        self.submitted += 1
+        enqueued = time.perf_counter()
+        lock = self._room_locks.setdefault(room_code, asyncio.Lock())
+        self._room_refs[room_code] = self._room_refs.get(room_code, 0) + 1
+        try:
+            # asyncio.Lock wakes waiters in FIFO order, which preserves submission order
+            async with lock:
+                return await run(enqueued)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+            self._room_refs[room_code] -= 1
+            if not self._room_refs[room_code]:
+                del self._room_refs[room_code]
+                del self._room_locks[room_code]
+
+    def shutdown(self) -> None:
+        """Stop accepting work and wait for running jobs"""
+        self._pool.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        """Queue depth, rejection and latency metrics"""
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "workers": self.max_workers,
+            "active_rooms": len(self._room_locks),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "queue_wait": self.queue_wait.to_dict(),
+            "execution": self.execution.to_dict()
+        }
+
+
+# Process-wide executor shared by the Socket.IO handlers
+game_executor = RoomExecutor()
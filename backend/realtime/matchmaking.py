@@ -0,0 +1,231 @@
+"""
+Quick-play matchmaking.
+
+Players waiting for a race are kept in memory, one min-heap per
+(language, skill band) bucket ordered by enqueue time, so enqueueing and
+taking the longest-waiting players are O(log n). Cancelled tickets are
+removed lazily when they reach the top of their heap. A ticker groups full
+rooms of ``max_players`` as soon as a bucket has enough players, and once
+the oldest player has waited ``MATCH_MAX_WAIT_S`` it starts a smaller room
+with everyone in the bucket (at least ``MATCH_MIN_PLAYERS``). The database
+is only touched when a room is actually formed.
+
+The queue is per worker; with several workers each one matches the
+players connected to it.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+MATCH_MAX_PLAYERS = int(os.getenv("MATCH_MAX_PLAYERS", "4"))
+MATCH_MIN_PLAYERS = int(os.getenv("MATCH_MIN_PLAYERS", "2"))
+MATCH_MAX_WAIT_S = float(os.getenv("MATCH_MAX_WAIT_S", "10"))
+MATCH_TICK_S = float(os.getenv("MATCH_TICK_S", "0.5"))
+
+BucketKey = Tuple[str, Optional[int]]
+
+
+class MatchmakingError(ValueError):
+    """Raised for malformed matchmaking requests"""
+
+
+@dataclass(order=True)
+class MatchTicket:
+    """One waiting player; orders by enqueue time"""
+    enqueued_at: float
+    seq: int
+    user_id: int = field(compare=False)
+    sid: str = field(compare=False)
+    language: str = field(compare=False)
+    skill_band: Optional[int] = field(compare=False, default=None)
+    cancelled: bool = field(compare=False, default=False)
+
+    @property
+    def bucket(self) -> BucketKey:
+        return (self.language, self.skill_band)
+
+
+@dataclass
+class Match:
+    """Players grouped into one room"""
+    language: str
+    skill_band: Optional[int]
+    tickets: List[MatchTicket]
+
+    @property
+    def user_ids(self) -> List[int]:
+        return [t.user_id for t in self.tickets]
+
+
+# Called with every match a tick forms
+OnMatch = Callable[[Match], Awaitable[None]]
+
+
+def normalize_language(language) -> str:
+    if not isinstance(language, str) or not language.strip():
+        raise MatchmakingError("Missing language")
+    return language.strip().lower()
+
+
+class MatchmakingQueue:
+    """Bucketed waiting queues and the ticker that forms rooms from them"""
+
+    def __init__(
+        self,
+        max_players: int = MATCH_MAX_PLAYERS,
+        min_players: int = MATCH_MIN_PLAYERS,
+        max_wait_s: float = MATCH_MAX_WAIT_S,
+        tick_s: float = MATCH_TICK_S,
+        clock=time.monotonic
+    ):
+        self.max_players = max_players
+        self.min_players = min(min_players, max_players)
+        self.max_wait_s = max_wait_s
+        self.tick_s = tick_s
+        self.clock = clock
+        self.on_match: Optional[OnMatch] = None
+        self._heaps: Dict[BucketKey, List[MatchTicket]] = {}
+        # Live (not cancelled) tickets per bucket
+        self._waiting: Dict[BucketKey, int] = {}
+        self._by_user: Dict[int, MatchTicket] = {}
+        self._by_sid: Dict[str, Set[int]] = {}
+        self._seq = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        # Counters
+        self.enqueued = 0
+        self.matched = 0
+        self.rooms = 0
+
+    def __len__(self) -> int:
+        return len(self._by_user)
+
+    def enqueue(self, user_id: int, sid: str, language, skill_band: Optional[int] = None) -> MatchTicket:
+        """Queue a player, replacing any earlier ticket of the same user"""
+        if skill_band is not None and not isinstance(skill_band, int):
+            raise MatchmakingError("Invalid skill band")
+        language = normalize_language(language)
+        self.cancel(user_id)
+        ticket = MatchTicket(
+            enqueued_at=self.clock(),
+            seq=next(self._seq),
+            user_id=user_id,
+            sid=sid,
+            language=language,
+            skill_band=skill_band
+        )
+        heapq.heappush(self._heaps.setdefault(ticket.bucket, []), ticket)
+        self._waiting[ticket.bucket] = self._waiting.get(ticket.bucket, 0) + 1
+        self._by_user[user_id] = ticket
+        self._by_sid.setdefault(sid, set()).add(user_id)
+        self.enqueued += 1
+        return ticket
+
+    def cancel(self, user_id: int) -> bool:
+        """Take a player out of the queue; the heap entry is dropped lazily"""
+        ticket = self._by_user.pop(user_id, None)
+        if ticket is None:
+            return False
+        ticket.cancelled = True
+        self._waiting[ticket.bucket] -= 1
+        self._forget_sid(ticket)
+        return True
+
+    def cancel_sid(self, sid: str) -> None:
+        """Forget every ticket queued from a socket that went away"""
+        for user_id in list(self._by_sid.get(sid, ())):
+            self.cancel(user_id)
+
+    def _forget_sid(self, ticket: MatchTicket) -> None:
+        user_ids = self._by_sid.get(ticket.sid)
+        if user_ids is not None:
+            user_ids.discard(ticket.user_id)
+            if not user_ids:
+                del self._by_sid[ticket.sid]
+
+    def waiting(self, language, skill_band: Optional[int] = None) -> int:
+        """Players currently waiting in a bucket"""
+        return self._waiting.get((normalize_language(language), skill_band), 0)
+
+    def _pop(self, key: BucketKey, count: int) -> List[MatchTicket]:
+        heap, taken = self._heaps[key], []
+        while heap and len(taken) < count:
+            ticket = heapq.heappop(heap)
+            if ticket.cancelled:
+                continue
+            del self._by_user[ticket.user_id]
+            self._forget_sid(ticket)
+            taken.append(ticket)
+        self._waiting[key] -= len(taken)
+        return taken
+
+    def _head(self, key: BucketKey) -> Optional[MatchTicket]:
+        heap = self._heaps[key]
+        while heap and heap[0].cancelled:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def match(self) -> List[Match]:
+        """Form every room that is ready now"""
+        now = self.clock()
+        matches = []
+        for key in list(self._heaps):
+            while self._waiting[key] >= self.max_players:
+                matches.append(Match(key[0], key[1], self._pop(key, self.max_players)))
+            head = self._head(key)
+            if head and self._waiting[key] >= self.min_players and now - head.enqueued_at >= self.max_wait_s:
+                matches.append(Match(key[0], key[1], self._pop(key, self._waiting[key])))
+            if not self._heaps[key]:
+                del self._heaps[key]
+                del self._waiting[key]
+        self.rooms += len(matches)
+        self.matched += sum(len(m.tickets) for m in matches)
+        return matches
+
+    async def tick(self) -> int:
+        """Form ready rooms and hand each to on_match; returns the room count"""
+        matches = self.match()
+        for match in matches:
+            if self.on_match is None:
+                continue
+            try:
+                await self.on_match(match)
+            except Exception as e:
+                print(f"Forming a {match.language} match failed: {e}")
+        return len(matches)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick_s)
+            await self.tick()
+
+    def start(self) -> None:
+        """Start the matcher on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the matcher; waiting players are dropped"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            'waiting': len(self._by_user),
+            'buckets': len(self._heaps),
+            'enqueued': self.enqueued,
+            'matched': self.matched,
+            'rooms': self.rooms
+        }
+
+
+# Process-wide queue shared by the Socket.IO handlers
+matchmaker = MatchmakingQueue()
@@ -0,0 +1,318 @@
+"""
+Built-in latency and load metrics in Prometheus text format.
+
+Histograms keep fixed buckets per label set, so observing a value is a
+bisect and three additions with no allocation. Socket.IO handlers are
+wrapped once at import time with their histogram already resolved, which
+keeps the cost on the update_progress path to two perf_counter calls.
+Database time is summed per HTTP request or socket event through a context
+variable that the SQLAlchemy cursor hooks add to; gauges are read from
+callbacks only when /metrics is scraped.
+"""
+import inspect
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; from sub-millisecond in-memory handlers up to slow queries
+LATENCY_BUCKETS_S = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+Labels = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    """Bucketed observations of one label set"""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        # One extra bucket for values above the last bound (+Inf)
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class HistogramFamily:
+    """A histogram metric with one Histogram per label set"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS_S):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._children: Dict[Labels, Histogram] = {}
+
+    def labels(self, *values) -> Histogram:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = Histogram(self.buckets)
+        return child
+
+    def observe(self, value: float, *values) -> None:
+        self.labels(*values).observe(value)
+
+    def samples(self) -> List[str]:
+        lines = []
+        names = self.label_names + ("le",)
+        for key, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (_format_value(bound),))} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class CounterFamily:
+    """A monotonically increasing counter per label set"""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *values, amount: float = 1) -> None:
+        key = tuple(str(v) for v in values)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *values) -> float:
+        return self._values.get(tuple(str(v) for v in values), 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class GaugeFamily:
+    """
+    A value read from a callback at scrape time. With label names the
+    callback returns a mapping of label values (a tuple) to values.
+    Counters kept elsewhere (e.g. a component's stats) are exposed the same
+    way with kind "counter".
+    """
+
+    def __init__(self, name: str, help: str, read: Callable[[], object], label_names: Sequence[str] = (),
+                 kind: str = "gauge"):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.read = read
+        self.label_names = tuple(label_names)
+
+    def samples(self) -> List[str]:
+        try:
+            value = self.read()
+        except Exception as e:
+            print(f"Reading gauge {self.name} failed: {e}")
+            return []
+        if not self.label_names:
+            return [f"{self.name} {_format_value(value)}"]
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(v)}"
+            for key, v in sorted(value.items())
+        ]
+
+
+class MetricsRegistry:
+    """Named metric families rendered together for a scrape"""
+
+    def __init__(self):
+        self._families: Dict[str, object] = {}
+
+    def _register(self, family):
+        if family.name in self._families:
+            raise ValueError(f"Metric {family.name} already registered")
+        self._families[family.name] = family
+        return family
+
+    def histogram(self, name: str, help: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS_S) -> HistogramFamily:
+        return self._register(HistogramFamily(name, help, label_names, buckets))
+
+    def counter(self, name: str, help: str, label_names: Sequence[str] = ()) -> CounterFamily:
+        return self._register(CounterFamily(name, help, label_names))
+
+    def gauge(self, name: str, help: str, read: Callable[[], object],
+              label_names: Sequence[str] = ()) -> GaugeFamily:
+        """Register (or replace) a gauge read at scrape time"""
+        self._families.pop(name, None)
+        return self._register(GaugeFamily(name, help, read, label_names))
+
+    def counter_from(self, name: str, help: str, read: Callable[[], object],
+                     label_names: Sequence[str] = ()) -> GaugeFamily:
+        """Register (or replace) a counter whose value is read at scrape time"""
+        self._families.pop(name, None)
+        return self._register(GaugeFamily(name, help, read, label_names, kind="counter"))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for family in self._families.values():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            lines.extend(family.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry scraped by GET /metrics
+metrics = MetricsRegistry()
+
+socket_event_seconds = metrics.histogram(
+    "coderacer_socket_event_seconds", "Socket.IO event handler latency", ("event",)
+)
+socket_event_db_seconds = metrics.histogram(
+    "coderacer_socket_event_db_seconds", "Database time spent by one Socket.IO event", ("event",)
+)
+http_request_seconds = metrics.histogram(
+    "coderacer_http_request_seconds", "HTTP request latency", ("method", "route", "status")
+)
+http_request_db_seconds = metrics.histogram(
+    "coderacer_http_request_db_seconds", "Database time spent by one HTTP request", ("method", "route")
+)
+room_emits_total = metrics.counter(
+    "coderacer_room_emits_total", "Messages broadcast to rooms", ("event",)
+)
+
+
+class DbTimer:
+    """Database time accumulated by the current request or event"""
+    __slots__ = ("seconds",)
+
+    def __init__(self):
+        self.seconds = 0.0
+
+
+# Set while a request or event runs; threads and tasks it starts share it
+current_db_timer: ContextVar[Optional[DbTimer]] = ContextVar("current_db_timer", default=None)
+
+
+def instrument_engine(engine) -> None:
+    """Add every query's duration on a (sync) engine to the current DbTimer"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_db_timer.get() is not None:
+            conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        timer = current_db_timer.get()
+        if timer is not None:
+            timer.seconds += time.perf_counter() - conn.info["metrics_query_start"].pop()
+
+
+def timed_handler(event: str, handler):
+    """Wrap a Socket.IO handler to record its latency and database time"""
+    latency = socket_event_seconds.labels(event)
+    db_time = socket_event_db_seconds.labels(event)
+    params = inspect.signature(handler).parameters.values()
+    # Only pass the arguments the handler takes, as python-socketio's own
+    # fallback would, so legacy signatures don't fail and run twice
+    nargs = None if any(p.kind == p.VAR_POSITIONAL for p in params) else len(params)
+
+    async def wrapper(*args):
+        timer = DbTimer()
+        token = current_db_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            return await handler(*args[:nargs])
+        finally:
+            latency.observe(time.perf_counter() - start)
+            db_time.observe(timer.seconds)
+            current_db_timer.reset(token)
+
+    wrapper.__name__ = getattr(handler, "__name__", event)
+    wrapper.__doc__ = handler.__doc__
+    return wrapper
+
+
+def instrument_socket_handlers(sio, namespace: str = "/") -> None:
+    """Time every event handler registered on a Socket.IO server so far"""
+    handlers = sio.handlers.get(namespace, {})
+    for event, handler in list(handlers.items()):
+        if inspect.iscoroutinefunction(handler):
+            handlers[event] = timed_handler(event, handler)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and database time"""
+
+    def __init__(self, app):
+        self.app = app
+        # endpoint -> path template, filled on first use
+        self._paths: Dict[object, str] = {}
+
+    def route_of(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            # Keeps unknown paths (scanners, typos) from exploding label sets
+            return "unmatched"
+        path = self._paths.get(endpoint)
+        if path is None:
+            app = scope.get("app")
+            for candidate in getattr(getattr(app, "router", None), "routes", ()):
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    path = candidate.path
+                    break
+            path = self._paths[endpoint] = path or getattr(endpoint, "__name__", "unknown")
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        timer = DbTimer()
+        token = current_db_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = self.route_of(scope)
+            http_request_seconds.observe(time.perf_counter() - start, scope["method"], route, status[0])
+            http_request_db_seconds.observe(timer.seconds, scope["method"], route)
+            current_db_timer.reset(token)
@@ -0,0 +1,223 @@
+"""
+Per-connection outbound queues with backpressure.
+
+Room broadcasts normally hand every message straight to each socket's
+Engine.IO queue, which grows without bound when a client can't keep up
+(e.g. a bad mobile link). With these queues each connection gets a
+bounded queue of its own and a sender that only hands messages to the
+transport while the socket's Engine.IO queue is short. Meanwhile progress
+is coalesced: a newer entry for the same participant supersedes the queued
+one, and when the queue is full the oldest progress entries are dropped.
+Events pushed with a key (spectator snapshots) are coalesced the same way
+and dropped next. Lifecycle events (game_started, player_finished,
+game_finished, ...) are never dropped and keep their order relative to
+progress; a connection whose lifecycle events alone overflow the queue is
+handed to ``on_overflow`` (the server disconnects it, and the client
+resyncs on reconnect) rather than allowed to grow without bound.
+"""
+import asyncio
+import itertools
+import os
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+# Messages queued per connection before the oldest progress or snapshot is dropped (0 disables)
+OUTBOUND_QUEUE_MAX = int(os.getenv("OUTBOUND_QUEUE_MAX", "64"))
+# Packets allowed in a socket's Engine.IO queue before its sender holds back
+OUTBOUND_TRANSPORT_MAX = int(os.getenv("OUTBOUND_TRANSPORT_MAX", "16"))
+# How often a held-back sender checks whether the transport drained
+OUTBOUND_POLL_S = float(os.getenv("OUTBOUND_POLL_S", "0.05"))
+
+# Sends one event to one socket
+SendEvent = Callable[[str, str, Any], Awaitable[None]]
+# Sends one merged progress frame (sid, room_code, encoding, participants) to one socket
+SendProgress = Callable[[str, str, str, List[Any]], Awaitable[None]]
+# Packets waiting in a socket's transport queue
+TransportDepth = Callable[[str], int]
+# Called with a connection whose queue overflowed with undroppable events
+OnOverflow = Callable[[str], Awaitable[None]]
+
+
+class ConnectionQueue:
+    """Ordered pending messages of one connection"""
+    __slots__ = ("items", "progress", "task")
+
+    def __init__(self):
+        # key -> ("event", event, data), ("keyed", event, data)
+        # or ("progress", room_code, encoding, participant)
+        self.items: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.progress = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+class OutboundQueues:
+    """Bounded per-connection queues and their senders"""
+
+    def __init__(
+        self,
+        send_event: SendEvent,
+        send_progress: SendProgress,
+        transport_depth: TransportDepth = lambda sid: 0,
+        max_items: int = OUTBOUND_QUEUE_MAX,
+        transport_max: int = OUTBOUND_TRANSPORT_MAX,
+        poll_s: float = OUTBOUND_POLL_S,
+        on_overflow: Optional[OnOverflow] = None
+    ):
+        self.send_event = send_event
+        self.send_progress = send_progress
+        self.transport_depth = transport_depth
+        self.max_items = max_items
+        self.transport_max = transport_max
+        self.poll_s = poll_s
+        self.on_overflow = on_overflow
+        self._queues: Dict[str, ConnectionQueue] = {}
+        # Messages dropped per connected sid, for /metrics
+        self.dropped_by_sid: Dict[str, int] = {}
+        self._seq = itertools.count()
+        # Counters
+        self.enqueued = 0
+        self.sent = 0
+        self.superseded = 0
+        self.dropped = 0
+        self.held_back = 0
+        self.overflowed = 0
+        self.max_depth = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_items > 0
+
+    def depth(self, sid: str) -> int:
+        """Messages waiting for a connection"""
+        queue = self._queues.get(sid)
+        return len(queue) if queue else 0
+
+    def depths(self) -> Dict[str, int]:
+        """Messages waiting per connection with a non-empty queue"""
+        return {sid: len(queue) for sid, queue in self._queues.items() if queue.items}
+
+    def push_event(self, sid: str, event: str, data: Any, key: Optional[Hashable] = None) -> None:
+        """
+        Queue an event. Without a key it must be delivered; with one, a newer
+        event under the same key supersedes the queued one and it may be
+        dropped when the queue is full (e.g. periodic snapshots).
+        """
+        queue = self._queue(sid)
+        if key is None:
+            queue.items[next(self._seq)] = ("event", event, data)
+        else:
+            key = ("keyed", key)
+            if queue.items.pop(key, None) is not None:
+                self.superseded += 1
+            queue.items[key] = ("keyed", event, data)
+        if self._trim(sid, queue):
+            self._after_push(sid, queue)
+
+    def push_progress(self, sid: str, room_code: str, encoding: str, participant) -> None:
+        """Queue a participant's progress, superseding an older queued entry"""
+        queue = self._queue(sid)
+        key = ("progress", room_code, encoding, participant.user_id)
+        if queue.items.pop(key, None) is not None:
+            self.superseded += 1
+        else:
+            queue.progress += 1
+        queue.items[key] = ("progress", room_code, encoding, participant)
+        if self._trim(sid, queue):
+            self._after_push(sid, queue)
+
+    def forget(self, sid: str) -> None:
+        """Drop a disconnected socket's queue and stop its sender"""
+        self.dropped_by_sid.pop(sid, None)
+        queue = self._queues.pop(sid, None)
+        if queue and queue.task:
+            queue.task.cancel()
+
+    def _queue(self, sid: str) -> ConnectionQueue:
+        queue = self._queues.get(sid)
+        if queue is None:
+            queue = self._queues[sid] = ConnectionQueue()
+        return queue
+
+    def _trim(self, sid: str, queue: ConnectionQueue) -> bool:
+        """Fit the queue to max_items; False if the connection overflowed"""
+        # Oldest progress goes first, then the oldest keyed events
+        for kind in ("progress", "keyed"):
+            while len(queue.items) > self.max_items:
+                key = next((k for k, item in queue.items.items() if item[0] == kind), None)
+                if key is None:
+                    break
+                del queue.items[key]
+                if kind == "progress":
+                    queue.progress -= 1
+                self.dropped += 1
+                self.dropped_by_sid[sid] = self.dropped_by_sid.get(sid, 0) + 1
+        if len(queue.items) <= self.max_items:
+            return True
+        # Only lifecycle events left: this client is not coming back in time
+        self.overflowed += 1
+        self.forget(sid)
+        if self.on_overflow is not None:
+            asyncio.get_running_loop().create_task(self.on_overflow(sid))
+        return False
+
+    def _after_push(self, sid: str, queue: ConnectionQueue) -> None:
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, len(queue.items))
+        if queue.task is None or queue.task.done():
+            queue.task = asyncio.get_running_loop().create_task(self._drain(sid, queue))
+
+    def _take(self, queue: ConnectionQueue) -> Tuple[tuple, List[Any]]:
+        """Pop the next message; consecutive progress of one room becomes one frame"""
+        _, item = queue.items.popitem(last=False)
+        if item[0] != "progress":
+            return item, []
+        queue.progress -= 1
+        participants = [item[3]]
+        while queue.items:
+            key, nxt = next(iter(queue.items.items()))
+            if nxt[0] != "progress" or nxt[1:3] != item[1:3]:
+                break
+            del queue.items[key]
+            queue.progress -= 1
+            participants.append(nxt[3])
+        return item, participants
+
+    async def _drain(self, sid: str, queue: ConnectionQueue) -> None:
+        while queue.items:
+            if self.transport_depth(sid) >= self.transport_max:
+                # The client isn't keeping up; let progress coalesce here
+                self.held_back += 1
+                await asyncio.sleep(self.poll_s)
+                if self._queues.get(sid) is not queue:
+                    return
+                continue
+            item, participants = self._take(queue)
+            try:
+                if item[0] == "progress":
+                    await self.send_progress(sid, item[1], item[2], participants)
+                else:
+                    await self.send_event(sid, item[1], item[2])
+                self.sent += 1
+            except Exception as e:
+                print(f"Outbound send to {sid} failed: {e}")
+        if self._queues.get(sid) is queue and not queue.items:
+            del self._queues[sid]
+
+    def stats(self) -> dict:
+        """Queue depth and drop counters"""
+        depths = [len(q) for q in self._queues.values()]
+        return {
+            'connections': len(depths),
+            'queued': sum(depths),
+            'deepest': max(depths, default=0),
+            'max_depth': self.max_depth,
+            'enqueued': self.enqueued,
+            'sent': self.sent,
+            'superseded': self.superseded,
+            'dropped': self.dropped,
+            'held_back': self.held_back,
+            'overflowed': self.overflowed
+        }
@@ -0,0 +1,330 @@
+"""
+In-memory race state engine for active game rooms.
+
+Socket handlers mutate and broadcast progress from this state so the hot
+path never touches the database. Rows are loaded on join/start and written
+back through GameService on finish/leave; in-race progress is persisted
+lazily by realtime.write_behind.
+
+Roster and lifecycle changes (joins, leaves, finishes, host and status
+changes) bump a per-room version and go into a bounded change log, so a
+(re)connecting client that knows its last version gets only the changes
+since then. Progress is not versioned; it travels in progress frames.
+"""
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from ..models import Game, GameParticipant
+from ..services.game_service import clamp_progress
+from .typing_stats import TypingStats
+
+ROOM_CHANGE_LOG_SIZE = int(os.getenv("ROOM_CHANGE_LOG_SIZE", "64"))
+
+
+class RaceStateError(Exception):
+    """Raised when an event refers to a room or participant that is not tracked"""
+
+
+@dataclass
+class ParticipantState:
+    """Live progress of a single participant"""
+    participant_id: int
+    user_id: int
+    username: str
+    slot: int = 0  # Small per-room index used by the compact wire format
+    progress: int = 0
+    wpm: float = 0.0
+    accuracy: float = 0.0
+    is_finished: bool = False
+    finish_position: Optional[int] = None
+    # Keystroke counters, once the client reports keystroke batches
+    typing: Optional[TypingStats] = field(default=None, repr=False)
+
+    def to_dict(self) -> dict:
+        """Participant payload as sent to clients"""
+        return {
+            'id': self.participant_id,
+            'user_id': self.user_id,
+            'username': self.username,
+            'slot': self.slot,
+            'progress': self.progress,
+            'wpm': float(self.wpm),
+            'accuracy': float(self.accuracy),
+            'is_finished': self.is_finished,
+            'finish_position': self.finish_position
+        }
+
+
+@dataclass
+class RoomState:
+    """Live state of a single game room"""
+    room_code: str
+    game_id: int
+    host_user_id: int
+    status: str
+    snippet_length: int
+    snippet: str = ""
+    participants: Dict[int, ParticipantState] = field(default_factory=dict)
+    version: int = 0
+    changes: Deque[dict] = field(default_factory=lambda: deque(maxlen=ROOM_CHANGE_LOG_SIZE))
+
+    def participant_list(self) -> List[dict]:
+        """All participants as client payloads"""
+        return [p.to_dict() for p in self.participants.values()]
+
+    def by_slot(self, slot: int) -> Optional[ParticipantState]:
+        """Participant occupying a wire-format slot"""
+        for p in self.participants.values():
+            if p.slot == slot:
+                return p
+        return None
+
+    def record(self, change: dict) -> None:
+        """Bump the version and append a change to the log"""
+        self.version += 1
+        change['version'] = self.version
+        self.changes.append(change)
+
+    def changes_since(self, version: Optional[int]) -> Optional[List[dict]]:
+        """Changes after `version`, or None when the log no longer covers it"""
+        if version is None or version > self.version:
+            return None
+        oldest = self.changes[0]['version'] if self.changes else self.version + 1
+        if version + 1 < oldest and version != self.version:
+            return None
+        return [c for c in self.changes if c['version'] > version]
+
+    def sync(self, since_version: Optional[int] = None) -> dict:
+        """Delta since the client's version, or a full snapshot if that is unknown"""
+        changes = self.changes_since(since_version)
+        if changes is None:
+            return {
+                'room_code': self.room_code,
+                'full': True,
+                'version': self.version,
+                'host_user_id': self.host_user_id,
+                'status': self.status,
+                'participants': self.participant_list()
+            }
+        return {
+            'room_code': self.room_code,
+            'full': False,
+            'version': self.version,
+            'changes': changes
+        }
+
+
+def _roster_fields(p: ParticipantState) -> tuple:
+    return (p.participant_id, p.username, p.slot, p.is_finished, p.finish_position)
+
+
+def _upsert(p: ParticipantState) -> dict:
+    return {'op': 'upsert', 'participant': p.to_dict()}
+
+
+def _room_change(room: RoomState) -> dict:
+    return {'op': 'room', 'host_user_id': room.host_user_id, 'status': room.status}
+
+
+def _record_diff(prior: RoomState, room: RoomState) -> None:
+    """Log what a reload changed compared to the previous state of the same game"""
+    if (prior.host_user_id, prior.status) != (room.host_user_id, room.status):
+        room.record(_room_change(room))
+    for user_id in prior.participants:
+        if user_id not in room.participants:
+            room.record({'op': 'remove', 'user_id': user_id})
+    for user_id, p in room.participants.items():
+        old = prior.participants.get(user_id)
+        if old is None or _roster_fields(old) != _roster_fields(p):
+            room.record(_upsert(p))
+
+
+class RaceStateEngine:
+    """Registry of live room state keyed by room code"""
+
+    def __init__(self):
+        self._rooms: Dict[str, RoomState] = {}
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def get(self, room_code: str) -> Optional[RoomState]:
+        """Get the tracked state for a room, if any"""
+        return self._rooms.get(room_code.upper())
+
+    def load(
+        self,
+        game: Game,
+        participants: Iterable[GameParticipant],
+        snippet: str
+    ) -> RoomState:
+        """
+        Replace a room's state with a fresh snapshot from the database.
+
+        Live progress of participants already tracked for the same game and
+        status is kept, since it is newer than what the database holds.
+        Differences from the previous state are recorded as versioned changes.
+        """
+        prior = previous = self.get(game.room_code)
+        if previous and previous.game_id != game.id:
+            previous = None
+        # Slots stay stable for the lifetime of the game so clients can cache them
+        slots = {uid: p.slot for uid, p in previous.participants.items()} if previous else {}
+        if previous and previous.status != game.status:
+            previous = None
+        room = RoomState(
+            room_code=game.room_code.upper(),
+            game_id=game.id,
+            host_user_id=game.host_user_id,
+            status=game.status,
+            snippet_length=len(snippet),
+            snippet=snippet
+        )
+        participants = list(participants)
+        used = {slots[p.user_id] for p in participants if p.user_id in slots}
+        free = (slot for slot in range(len(participants) + len(used)) if slot not in used)
+        for p in participants:
+            room.participants[p.user_id] = ParticipantState(
+                participant_id=p.id,
+                user_id=p.user_id,
+                username=p.username,
+                slot=slots[p.user_id] if p.user_id in slots else next(free),
+                progress=p.progress or 0,
+                wpm=float(p.wpm or 0.0),
+                accuracy=float(p.accuracy or 0.0),
+                is_finished=bool(p.is_finished),
+                finish_position=p.finish_position
+            )
+            live = previous.participants.get(p.user_id) if previous else None
+            if live and not p.is_finished:
+                state = room.participants[p.user_id]
+                state.progress, state.wpm, state.accuracy = live.progress, live.wpm, live.accuracy
+                state.typing = live.typing
+        if prior and prior.game_id == game.id:
+            room.version, room.changes = prior.version, prior.changes
+            _record_diff(prior, room)
+        else:
+            # New rooms start at the wall clock in ms so versions clients
+            # remember from before a restart or a different game never match
+            room.version = max(prior.version + 1 if prior else 0, int(time.time() * 1000))
+        self._rooms[room.room_code] = room
+        return room
+
+    def drop(self, room_code: str) -> None:
+        """Stop tracking a room"""
+        self._rooms.pop(room_code.upper(), None)
+
+    def update_progress(
+        self,
+        room_code: str,
+        user_id: int,
+        progress: int,
+        wpm: float,
+        accuracy: float
+    ) -> Optional[ParticipantState]:
+        """
+        Apply a clamped progress update and return the participant state.
+
+        Returns None when the clamped values equal the participant's current
+        ones, so redundant updates can be dropped.
+        """
+        participant = self._get_participant(room_code, user_id)
+        room = self._rooms[room_code.upper()]
+        values = clamp_progress(progress, wpm, accuracy, room.snippet_length)
+        if values == (participant.progress, participant.wpm, participant.accuracy):
+            return None
+        participant.progress, participant.wpm, participant.accuracy = values
+        return participant
+
+    def apply_keystrokes(
+        self,
+        room_code: str,
+        user_id: int,
+        batch: List[list],
+        now: float
+    ) -> Optional[ParticipantState]:
+        """
+        Fold a keystroke batch into the participant's counters and derive
+        progress, WPM and accuracy from them.
+
+        Raises KeystrokeError for malformed batches; returns None when the
+        derived values did not change.
+        """
+        participant = self._get_participant(room_code, user_id)
+        if participant.is_finished:
+            return None
+        room = self._rooms[room_code.upper()]
+        if participant.typing is None:
+            participant.typing = TypingStats()
+        stats = participant.typing
+        stats.apply(batch, room.snippet, now)
+        values = clamp_progress(stats.progress, stats.wpm(now), stats.accuracy(), room.snippet_length)
+        if values == (participant.progress, participant.wpm, participant.accuracy):
+            return None
+        participant.progress, participant.wpm, participant.accuracy = values
+        return participant
+
+    def typing_result(self, room_code: str, user_id: int, now: float) -> Optional[Tuple[float, float]]:
+        """Server-computed (wpm, accuracy) for a participant that sent keystrokes"""
+        room = self.get(room_code)
+        participant = room.participants.get(user_id) if room else None
+        if participant is None or participant.typing is None:
+            return None
+        stats = participant.typing
+        _, wpm, accuracy = clamp_progress(stats.progress, stats.wpm(now), stats.accuracy(), room.snippet_length)
+        return wpm, accuracy
+
+    def apply_finish(self, room_code: str, row: GameParticipant) -> Optional[ParticipantState]:
+        """Copy a persisted finish result into the live state"""
+        room = self.get(room_code)
+        if not room or row.user_id not in room.participants:
+            return None
+        participant = room.participants[row.user_id]
+        before = _roster_fields(participant)
+        participant.progress = row.progress or 0
+        participant.wpm = float(row.wpm or 0.0)
+        participant.accuracy = float(row.accuracy or 0.0)
+        participant.is_finished = bool(row.is_finished)
+        participant.finish_position = row.finish_position
+        if _roster_fields(participant) != before:
+            room.record(_upsert(participant))
+        return participant
+
+    def set_status(self, room_code: str, status: str) -> None:
+        """Record a lifecycle status change of a tracked room"""
+        room = self.get(room_code)
+        if room and room.status != status:
+            room.status = status
+            room.record(_room_change(room))
+
+    def remove_participant(
+        self,
+        room_code: str,
+        user_id: int,
+        new_host_id: Optional[int] = None
+    ) -> None:
+        """Remove a participant and apply a host transfer if one happened"""
+        room = self.get(room_code)
+        if not room:
+            return
+        if room.participants.pop(user_id, None) is not None:
+            room.record({'op': 'remove', 'user_id': user_id})
+        if new_host_id is not None and new_host_id != room.host_user_id:
+            room.host_user_id = new_host_id
+            room.record(_room_change(room))
+
+    def _get_participant(self, room_code: str, user_id: int) -> ParticipantState:
+        room = self.get(room_code)
+        if not room:
+            raise RaceStateError("Game not found")
+        participant = room.participants.get(user_id)
+        if not participant:
+            raise RaceStateError("Participant not found")
+        return participant
+
+
+# Process-wide engine shared by the Socket.IO handlers
+race_state = RaceStateEngine()
@@ -0,0 +1,113 @@
+"""
+Per-connection admission control for progress events.
+
+Each socket gets a token bucket (PROGRESS_RATE_PER_S tokens per second, up
+to PROGRESS_BURST). Events arriving with an empty bucket are dropped before
+they touch any state, and updates identical to the participant's last
+accepted values are dropped by the caller. Counters show how much work this
+saves.
+
+Keystroke batches carry events that can't be resent, so they get a second
+bucket charged per keystroke (KEYSTROKE_RATE_PER_S, up to KEYSTROKE_BURST)
+instead of per event: a client flushing several batches after a stall
+stays within it, one flooding the server does not.
+"""
+import os
+import time
+from typing import Callable, Dict
+
+PROGRESS_RATE_PER_S = float(os.getenv("PROGRESS_RATE_PER_S", "20"))
+PROGRESS_BURST = float(os.getenv("PROGRESS_BURST", "40"))
+# Well above human typing speed; the burst covers two full batches
+KEYSTROKE_RATE_PER_S = float(os.getenv("KEYSTROKE_RATE_PER_S", "30"))
+KEYSTROKE_BURST = float(os.getenv("KEYSTROKE_BURST", "128"))
+
+
+class TokenBucket:
+    """Classic token bucket refilled lazily on each check"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1) -> bool:
+        """Consume `cost` tokens if available"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+
+class ProgressRateLimiter:
+    """Token buckets per sid plus accepted/dropped counters"""
+
+    def __init__(
+        self,
+        rate: float = PROGRESS_RATE_PER_S,
+        burst: float = PROGRESS_BURST,
+        clock: Callable[[], float] = time.monotonic,
+        keystroke_rate: float = KEYSTROKE_RATE_PER_S,
+        keystroke_burst: float = KEYSTROKE_BURST
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.keystroke_rate = keystroke_rate
+        self.keystroke_burst = keystroke_burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._keystroke_buckets: Dict[str, TokenBucket] = {}
+        self.accepted = 0
+        self.rate_limited = 0
+        self.redundant = 0
+
+    def allow(self, sid: str) -> bool:
+        """Whether the socket may send another progress event right now"""
+        now = self.clock()
+        bucket = self._buckets.get(sid)
+        if bucket is None:
+            bucket = self._buckets[sid] = TokenBucket(self.rate, self.burst, now)
+        if bucket.take(now):
+            return True
+        self.rate_limited += 1
+        return False
+
+    def allow_keystrokes(self, sid: str, count: int) -> bool:
+        """Whether the socket may send a batch of `count` keystrokes right now"""
+        now = self.clock()
+        bucket = self._keystroke_buckets.get(sid)
+        if bucket is None:
+            bucket = self._keystroke_buckets[sid] = TokenBucket(self.keystroke_rate, self.keystroke_burst, now)
+        if bucket.take(now, max(count, 1)):
+            return True
+        self.rate_limited += 1
+        return False
+
+    def record_accepted(self) -> None:
+        self.accepted += 1
+
+    def record_redundant(self) -> None:
+        self.redundant += 1
+
+    def forget(self, sid: str) -> None:
+        """Drop a disconnected socket's bucket"""
+        self._buckets.pop(sid, None)
+        self._keystroke_buckets.pop(sid, None)
+
+    def stats(self) -> dict:
+        """Accepted and dropped frame counts"""
+        return {
+            "tracked_sockets": len(self._buckets.keys() | self._keystroke_buckets.keys()),
+            "accepted": self.accepted,
+            "dropped_rate_limited": self.rate_limited,
+            "dropped_redundant": self.redundant
+        }
+
+
+# Process-wide limiter shared by the Socket.IO handlers
+progress_limiter = ProgressRateLimiter()
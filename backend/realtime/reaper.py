@@ -0,0 +1,130 @@
+"""
+Background reaper for abandoned games.
+
+Games left waiting, stuck in progress (e.g. the worker holding the race
+died) or finished are deleted once they have been inactive longer than the
+age threshold for their status. Each run deletes at most
+``REAPER_BATCH_SIZE`` games per status, so no single transaction grows with
+the backlog. Live races are never touched: rooms with sockets attached to
+this worker are excluded, and rows locked by another transaction are
+skipped instead of waited for.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..repositories.game_repository import GameRepository
+
+REAPER_INTERVAL_S = float(os.getenv("REAPER_INTERVAL_S", "300"))
+REAPER_BATCH_SIZE = int(os.getenv("REAPER_BATCH_SIZE", "200"))
+
+# Inactivity after which a game of each status is deleted (0 disables)
+REAPER_MAX_AGE_S = {
+    "waiting": float(os.getenv("REAPER_WAITING_MAX_AGE_S", str(6 * 3600))),
+    "in_progress": float(os.getenv("REAPER_IN_PROGRESS_MAX_AGE_S", str(2 * 3600))),
+    "finished": float(os.getenv("REAPER_FINISHED_MAX_AGE_S", str(24 * 3600)))
+}
+
+# Called with the room codes a run deleted
+OnReaped = Callable[[List[str]], Awaitable[None]]
+
+
+class GameReaper:
+    """Periodically deletes stale games in bounded batches"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        interval_s: float = REAPER_INTERVAL_S,
+        batch_size: int = REAPER_BATCH_SIZE,
+        max_age_s: Optional[Dict[str, float]] = None,
+        live_rooms: Callable[[], Iterable[str]] = lambda: ()
+    ):
+        self.session_factory = session_factory
+        self.interval = interval_s
+        self.batch_size = batch_size
+        self.max_age_s = dict(REAPER_MAX_AGE_S if max_age_s is None else max_age_s)
+        self.live_rooms = live_rooms
+        self.on_reaped: Optional[OnReaped] = None
+        self._task: Optional[asyncio.Task] = None
+        # Counters
+        self.runs = 0
+        self.games_reaped = 0
+        self.participants_reaped = 0
+        self.last_run: Dict[str, int] = {}
+
+    def _reap(self, exclude: List[str], now: datetime) -> Dict[str, tuple]:
+        reaped = {}
+        for status, max_age in self.max_age_s.items():
+            if max_age <= 0:
+                continue
+            db = self.session_factory()
+            try:
+                reaped[status] = GameRepository(db).delete_stale(
+                    status, now - timedelta(seconds=max_age), self.batch_size, exclude
+                )
+            finally:
+                db.close()
+        return reaped
+
+    async def run_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Reap one batch per status and return the rows reclaimed"""
+        exclude = list(self.live_rooms())
+        reaped = await asyncio.to_thread(self._reap, exclude, now or datetime.utcnow())
+        report = {"games": 0, "participants": 0}
+        room_codes: List[str] = []
+        for status, (codes, participants) in reaped.items():
+            report[status] = len(codes)
+            report["games"] += len(codes)
+            report["participants"] += participants
+            room_codes.extend(codes)
+        self.runs += 1
+        self.games_reaped += report["games"]
+        self.participants_reaped += report["participants"]
+        self.last_run = report
+        if room_codes and self.on_reaped is not None:
+            await self.on_reaped(room_codes)
+        return report
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                report = await self.run_once()
+            except Exception as e:
+                print(f"Game reaper run failed: {e}")
+                continue
+            if report["games"]:
+                print(f"Game reaper reclaimed {report['games']} games and {report['participants']} participants")
+
+    def start(self) -> None:
+        """Start the periodic sweep on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the periodic sweep"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """Rows reclaimed so far and by the last run"""
+        return {
+            "runs": self.runs,
+            "games_reaped": self.games_reaped,
+            "participants_reaped": self.participants_reaped,
+            "last_run": self.last_run
+        }
+
+
+# Process-wide reaper; socketio_server tells it which rooms are live
+game_reaper = GameReaper()
@@ -0,0 +1,203 @@
+"""
+Race replay recording and the compact replay blob format.
+
+While a race runs, every accepted progress change is appended to a
+per-room buffer of parallel ``array`` columns (time delta, slot, progress
+delta, WPM, accuracy), so recording costs a few bytes per event and no
+per-event objects. When the race finishes the buffer is packed once into a
+single blob and stored as one RaceReplay row:
+
+    header   <4sBHHII  magic, version, roster count, roster bytes, event count, duration ms
+    roster   <BIBB     slot, user_id, finish position (0 = none), name length, then UTF-8 name
+    event    <IBhHH    ms since previous event, slot, progress delta, wpm x10, accuracy x100
+
+Events are fixed-width, so playback can read the blob in chunks and decode
+them incrementally without loading the whole log.
+"""
+import os
+import struct
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from .race_state import ParticipantState, RoomState
+
+REPLAY_MAX_EVENTS = int(os.getenv("REPLAY_MAX_EVENTS", "50000"))
+
+MAGIC = b"CRRP"
+REPLAY_VERSION = 1
+HEADER = struct.Struct("<4sBHHII")
+ROSTER_ENTRY = struct.Struct("<BIBB")
+EVENT = struct.Struct("<IBhHH")
+
+
+class ReplayFormatError(ValueError):
+    """Raised when a replay blob cannot be decoded"""
+
+
+def _fixed(value: float, scale: int) -> int:
+    return max(0, min(0xFFFF, int(round(value * scale))))
+
+
+class ReplayBuffer:
+    """Append-only, array-backed progress timeline of one race"""
+
+    def __init__(self, room: RoomState, started: float, max_events: int = REPLAY_MAX_EVENTS):
+        self.room_code = room.room_code
+        self.game_id = room.game_id
+        self.roster = {p.slot: (p.user_id, p.username) for p in room.participants.values()}
+        self.started = started
+        self.max_events = max_events
+        self.dt_ms = array("I")
+        self.slots = array("B")
+        self.dprogress = array("h")
+        self.wpm = array("H")
+        self.accuracy = array("H")
+        self._last_ms = 0
+        self._progress: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.dt_ms)
+
+    def append(self, participant: ParticipantState, now: float) -> bool:
+        """Record one participant's current values; False once the buffer is full"""
+        if len(self.dt_ms) >= self.max_events:
+            return False
+        # Late joiners get their roster entry on first progress
+        self.roster.setdefault(participant.slot, (participant.user_id, participant.username))
+        elapsed_ms = max(self._last_ms, int((now - self.started) * 1000))
+        previous = self._progress.get(participant.slot, 0)
+        delta = max(-0x8000, min(0x7FFF, participant.progress - previous))
+        self.dt_ms.append(elapsed_ms - self._last_ms)
+        self.slots.append(participant.slot & 0xFF)
+        self.dprogress.append(delta)
+        self.wpm.append(_fixed(participant.wpm, 10))
+        self.accuracy.append(_fixed(participant.accuracy, 100))
+        self._last_ms = elapsed_ms
+        self._progress[participant.slot] = previous + delta
+        return True
+
+    @property
+    def duration_ms(self) -> int:
+        return self._last_ms
+
+    def to_blob(self, finish_positions: Optional[Dict[int, int]] = None) -> bytes:
+        """Pack the timeline into the replay blob format"""
+        finish_positions = finish_positions or {}
+        roster = bytearray()
+        for slot, (user_id, username) in sorted(self.roster.items()):
+            name = username.encode("utf-8")[:255]
+            position = min(0xFF, finish_positions.get(user_id) or 0)
+            roster += ROSTER_ENTRY.pack(slot, user_id, position, len(name)) + name
+        count = len(self.dt_ms)
+        blob = bytearray(HEADER.size + len(roster) + count * EVENT.size)
+        HEADER.pack_into(blob, 0, MAGIC, REPLAY_VERSION, len(self.roster), len(roster), count, self._last_ms)
+        blob[HEADER.size:HEADER.size + len(roster)] = roster
+        offset = HEADER.size + len(roster)
+        for i in range(count):
+            EVENT.pack_into(blob, offset, self.dt_ms[i], self.slots[i], self.dprogress[i],
+                            self.wpm[i], self.accuracy[i])
+            offset += EVENT.size
+        return bytes(blob)
+
+
+def read_header(data: bytes) -> dict:
+    """Decode the fixed-size blob header"""
+    if len(data) < HEADER.size:
+        raise ReplayFormatError("Replay too short")
+    magic, version, roster_count, roster_bytes, event_count, duration_ms = HEADER.unpack_from(data)
+    if magic != MAGIC or version != REPLAY_VERSION:
+        raise ReplayFormatError("Unsupported replay format")
+    return {
+        "roster_count": roster_count,
+        "roster_bytes": roster_bytes,
+        "event_count": event_count,
+        "duration_ms": duration_ms
+    }
+
+
+def read_roster(data: bytes, count: int) -> List[dict]:
+    """Decode the roster section"""
+    roster, offset = [], 0
+    for _ in range(count):
+        if offset + ROSTER_ENTRY.size > len(data):
+            raise ReplayFormatError("Truncated roster")
+        slot, user_id, position, name_len = ROSTER_ENTRY.unpack_from(data, offset)
+        offset += ROSTER_ENTRY.size
+        username = data[offset:offset + name_len].decode("utf-8", errors="replace")
+        offset += name_len
+        roster.append({"slot": slot, "user_id": user_id, "username": username, "position": position or None})
+    return roster
+
+
+class ReplayDecoder:
+    """Turns chunks of packed events back into absolute progress samples"""
+
+    def __init__(self, roster: Iterable[dict]):
+        self.users = {entry["slot"]: entry["user_id"] for entry in roster}
+        self.t_ms = 0
+        self.progress: Dict[int, int] = {}
+
+    def feed(self, chunk: bytes) -> List[dict]:
+        """Decode a chunk holding a whole number of events"""
+        if len(chunk) % EVENT.size:
+            raise ReplayFormatError("Chunk is not aligned to events")
+        samples = []
+        for dt_ms, slot, delta, wpm, accuracy in EVENT.iter_unpack(chunk):
+            self.t_ms += dt_ms
+            progress = self.progress.get(slot, 0) + delta
+            self.progress[slot] = progress
+            samples.append({
+                "t": self.t_ms,
+                "user_id": self.users.get(slot),
+                "slot": slot,
+                "progress": progress,
+                "wpm": wpm / 10,
+                "accuracy": accuracy / 100
+            })
+        return samples
+
+
+class RaceRecorder:
+    """Live replay buffers keyed by room code"""
+
+    def __init__(self, max_events: int = REPLAY_MAX_EVENTS, clock=time.monotonic):
+        self.max_events = max_events
+        self.clock = clock
+        self._buffers: Dict[str, ReplayBuffer] = {}
+        self.recorded = 0
+        self.dropped = 0
+
+    def start(self, room: RoomState) -> None:
+        """Begin recording a room's race, replacing any earlier buffer"""
+        self._buffers[room.room_code] = ReplayBuffer(room, self.clock(), self.max_events)
+
+    def record(self, room_code: str, participant: ParticipantState) -> None:
+        """Append a progress change if the room is being recorded"""
+        buffer = self._buffers.get(room_code)
+        if buffer is None:
+            return
+        if buffer.append(participant, self.clock()):
+            self.recorded += 1
+        else:
+            self.dropped += 1
+
+    def finish(self, room_code: str) -> Optional[ReplayBuffer]:
+        """Stop recording and hand back the buffer for persisting"""
+        return self._buffers.pop(room_code, None)
+
+    def discard(self, room_code: str) -> None:
+        """Stop recording without keeping anything"""
+        self._buffers.pop(room_code, None)
+
+    def stats(self) -> dict:
+        return {
+            "recording_rooms": len(self._buffers),
+            "buffered_events": sum(len(b) for b in self._buffers.values()),
+            "recorded": self.recorded,
+            "dropped": self.dropped
+        }
+
+
+# Process-wide recorder shared by the Socket.IO handlers
+race_recorder = RaceRecorder()
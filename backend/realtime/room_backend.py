@@ -0,0 +1,276 @@
+"""
+Pluggable room/connection state for one or many Socket.IO workers.
+
+Every backend keeps a local ConnectionRegistry of the sockets attached to
+this process (a sid only ever lives on one worker), which answers the hot
+per-event lookups without I/O. The Redis backend also mirrors each
+membership into shared hashes so presence and disconnect cleanup see the
+sockets of every worker serving a room:
+
+    {prefix}:room:{room_code}   hash  sid -> user_id
+    {prefix}:sid:{sid}          set   room codes the socket joined
+    {prefix}:node:{node_id}     set   sids owned by a worker
+    {prefix}:member_nodes       zset  node_id -> last heartbeat time
+
+The per-node set lets a surviving worker purge the memberships of one that
+died without a clean disconnect. Every worker heartbeats into
+``member_nodes`` and purges nodes whose heartbeat is older than
+``WORKER_TTL_S``, so a crashed or restarted worker (its NODE_ID changes
+with the pid) never leaves its sockets behind, with or without affinity.
+"""
+import asyncio
+import os
+import socket
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from .connections import ConnectionRegistry
+
+ROOM_STATE_BACKEND = os.getenv("ROOM_STATE_BACKEND")
+ROOM_STATE_PREFIX = os.getenv("ROOM_STATE_PREFIX", "coderacer")
+NODE_ID = os.getenv("NODE_ID") or f"{socket.gethostname()}:{os.getpid()}"
+WORKER_HEARTBEAT_S = float(os.getenv("WORKER_HEARTBEAT_S", "5"))
+WORKER_TTL_S = float(os.getenv("WORKER_TTL_S", "15"))
+
+Membership = Tuple[str, int]
+# Called with the memberships purged from dead workers
+OnPurge = Callable[[List[Membership]], Awaitable[None]]
+
+
+def parse_user_id(raw) -> Optional[int]:
+    """user_id stored in a shared hash, or None if it isn't an integer"""
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+class RoomStateBackend:
+    """
+    Room membership store shared by the socket handlers.
+
+    The base class is process-local; subclasses that span workers set
+    ``shared`` and override the async methods to read the shared view.
+    """
+
+    shared = False
+
+    def __init__(self, node_id: str = NODE_ID):
+        self.node_id = node_id
+        self.local = ConnectionRegistry()
+        self.on_purge: Optional[OnPurge] = None
+
+    def start(self) -> None:
+        """Start background upkeep on the running event loop, if the backend has any"""
+
+    async def stop(self) -> None:
+        """Stop background upkeep"""
+
+    async def add(self, room_code: str, sid: str, user_id: int) -> None:
+        """Record that a socket joined a room as the given user"""
+        self.local.add(room_code, sid, user_id)
+
+    async def remove(self, room_code: str, sid: str) -> Optional[int]:
+        """Remove one membership and return its user_id, if it existed"""
+        return self.local.remove(room_code, sid)
+
+    async def pop_sid(self, sid: str) -> List[Tuple[str, int]]:
+        """Remove every membership of a socket and return (room_code, user_id) pairs"""
+        return self.local.pop_sid(sid)
+
+    async def members(self, room_code: str) -> Dict[str, int]:
+        """sid -> user_id for every socket in a room"""
+        return self.local.members(room_code)
+
+    async def user_connected(self, room_code: str, user_id: int) -> bool:
+        """Whether the user still has any socket in the room"""
+        return user_id in (await self.members(room_code)).values()
+
+    def user_of(self, room_code: str, sid: str) -> Optional[int]:
+        """user_id a local socket joined a room as, if any"""
+        return self.local.user_of(room_code, sid)
+
+    def local_members(self, room_code: str) -> Dict[str, int]:
+        """sid -> user_id for the sockets of a room attached to this worker"""
+        return self.local.members(room_code)
+
+    def local_rooms(self) -> List[str]:
+        """Rooms with at least one socket attached to this worker"""
+        return self.local.room_codes()
+
+    async def close(self) -> None:
+        """Release any connections held by the backend"""
+
+    def stats(self) -> dict:
+        """Membership counts for this worker"""
+        return {
+            "backend": type(self).__name__,
+            "node_id": self.node_id,
+            "local_rooms": len(self.local),
+            "local_connections": self.local.connection_count()
+        }
+
+
+class InMemoryRoomStateBackend(RoomStateBackend):
+    """Single-process backend: the local registry is the whole picture"""
+
+
+class RedisRoomStateBackend(RoomStateBackend):
+    """
+    Mirrors memberships into Redis so every worker shares one view.
+
+    Expects a client created with ``decode_responses=True``.
+    """
+
+    shared = True
+
+    def __init__(
+        self,
+        client,
+        node_id: str = NODE_ID,
+        prefix: str = ROOM_STATE_PREFIX,
+        heartbeat_s: float = WORKER_HEARTBEAT_S,
+        ttl_s: float = WORKER_TTL_S,
+        clock: Callable[[], float] = time.time
+    ):
+        super().__init__(node_id)
+        self.redis = client
+        self.prefix = prefix
+        self.heartbeat_s = heartbeat_s
+        self.ttl_s = ttl_s
+        self.clock = clock
+        self.nodes_key = f"{prefix}:member_nodes"
+        self._task: Optional[asyncio.Task] = None
+        self.purged_nodes = 0
+
+    def _room_key(self, room_code: str) -> str:
+        return f"{self.prefix}:room:{room_code}"
+
+    def _sid_key(self, sid: str) -> str:
+        return f"{self.prefix}:sid:{sid}"
+
+    def _node_key(self, node_id: str) -> str:
+        return f"{self.prefix}:node:{node_id}"
+
+    async def add(self, room_code: str, sid: str, user_id: int) -> None:
+        await super().add(room_code, sid, user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._room_key(room_code), sid, user_id)
+            pipe.sadd(self._sid_key(sid), room_code)
+            pipe.sadd(self._node_key(self.node_id), sid)
+            await pipe.execute()
+
+    async def remove(self, room_code: str, sid: str) -> Optional[int]:
+        user_id = await super().remove(room_code, sid)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hget(self._room_key(room_code), sid)
+            pipe.hdel(self._room_key(room_code), sid)
+            pipe.srem(self._sid_key(sid), room_code)
+            shared_user_id, *_ = await pipe.execute()
+        if not self.local.rooms_of(sid):
+            await self.redis.srem(self._node_key(self.node_id), sid)
+        if user_id is None:
+            user_id = parse_user_id(shared_user_id)
+        return user_id
+
+    async def pop_sid(self, sid: str) -> List[Tuple[str, int]]:
+        removed = await super().pop_sid(sid)
+        await self._drop_shared_sid(sid, self.node_id)
+        return removed
+
+    async def _drop_shared_sid(self, sid: str, node_id: str) -> List[Tuple[str, int]]:
+        """Delete a socket's shared memberships and return what they were"""
+        room_codes = sorted(await self.redis.smembers(self._sid_key(sid)))
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for room_code in room_codes:
+                pipe.hget(self._room_key(room_code), sid)
+                pipe.hdel(self._room_key(room_code), sid)
+            pipe.delete(self._sid_key(sid))
+            pipe.srem(self._node_key(node_id), sid)
+            results = await pipe.execute()
+        removed = [(room_code, parse_user_id(raw)) for room_code, raw in zip(room_codes, results[0::2])]
+        return [(room_code, user_id) for room_code, user_id in removed if user_id is not None]
+
+    async def purge_node(self, node_id: str) -> List[Tuple[str, int]]:
+        """
+        Remove every membership owned by another (dead) worker.
+
+        Returns the (room_code, user_id) pairs so the caller can run the
+        same leave logic a disconnect would have.
+        """
+        removed = []
+        for sid in sorted(await self.redis.smembers(self._node_key(node_id))):
+            removed.extend(await self._drop_shared_sid(sid, node_id))
+        await self.redis.delete(self._node_key(node_id))
+        return removed
+
+    async def members(self, room_code: str) -> Dict[str, int]:
+        raw = await self.redis.hgetall(self._room_key(room_code))
+        members = {sid: parse_user_id(user_id) for sid, user_id in raw.items()}
+        return {sid: user_id for sid, user_id in members.items() if user_id is not None}
+
+    async def heartbeat(self) -> List[Membership]:
+        """Announce this worker and purge workers whose heartbeat expired"""
+        now = self.clock()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.nodes_key, {self.node_id: now})
+            pipe.zrangebyscore(self.nodes_key, "-inf", f"({now - self.ttl_s}")
+            _, stale = await pipe.execute()
+        removed = []
+        for node_id in stale:
+            # Whoever removes a stale worker first owns its cleanup
+            if node_id != self.node_id and await self.redis.zrem(self.nodes_key, node_id):
+                self.purged_nodes += 1
+                removed.extend(await self.purge_node(node_id))
+        if removed and self.on_purge is not None:
+            await self.on_purge(removed)
+        return removed
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                print(f"Room membership heartbeat failed: {e}")
+            await asyncio.sleep(self.heartbeat_s)
+
+    def start(self) -> None:
+        """Start heartbeating; the first beat also purges workers that died earlier"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop heartbeating. This worker's memberships stay until its heartbeat
+        expires and a surviving worker purges them (running the leave logic).
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+    def stats(self) -> dict:
+        return {**super().stats(), "purged_nodes": self.purged_nodes}
+
+
+def create_room_backend(redis_url: Optional[str] = None) -> RoomStateBackend:
+    """
+    Backend selected by ROOM_STATE_BACKEND ("memory" or "redis").
+
+    Defaults to Redis whenever a REDIS_URL is configured, since that is
+    what multi-worker deployments use for the Socket.IO message queue.
+    """
+    kind = ROOM_STATE_BACKEND or ("redis" if redis_url else "memory")
+    if kind == "redis":
+        if not redis_url:
+            raise ValueError("ROOM_STATE_BACKEND=redis requires REDIS_URL")
+        return RedisRoomStateBackend(aioredis.from_url(redis_url, decode_responses=True))
+    return InMemoryRoomStateBackend()
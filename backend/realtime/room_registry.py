@@ -0,0 +1,95 @@
+"""
+In-process registry of room metadata.
+
+Socket handlers and hot REST paths used to resolve a room code with
+GameRepository.get_by_room_code (and the snippet, just for its length) on
+every event. The registry caches what they need per room code: game id,
+host, status, snippet id and snippet length. GameService fills it whenever
+it loads a game anyway and keeps it current on start, finish, host
+transfer and rematch, and drops entries when a game is deleted.
+
+Entries are immutable and replaced wholesale, so readers on the event loop
+and on executor threads never see a half-updated room. Without room
+affinity another worker may change a room behind this one's back, so
+entries also expire after ``ROOM_REGISTRY_TTL_S``.
+"""
+import os
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+
+ROOM_REGISTRY_TTL_S = float(os.getenv("ROOM_REGISTRY_TTL_S", "30"))
+
+
+@dataclass(frozen=True)
+class RoomMeta:
+    """What hot paths need to know about a room without a query"""
+    room_code: str
+    game_id: int
+    host_user_id: int
+    status: str
+    snippet_id: int
+    snippet_len: int
+
+
+class RoomRegistry:
+    """Room code -> RoomMeta, with per-entry expiry"""
+
+    def __init__(self, ttl_s: float = ROOM_REGISTRY_TTL_S, clock=time.monotonic):
+        self.ttl_s = ttl_s
+        self.clock = clock
+        self._rooms: Dict[str, Tuple[RoomMeta, float]] = {}
+        # Counters
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def get(self, room_code: str) -> Optional[RoomMeta]:
+        """Cached metadata of a room, or None if unknown or expired"""
+        room_code = room_code.upper()
+        entry = self._rooms.get(room_code)
+        if entry is not None and entry[1] <= self.clock():
+            self._rooms.pop(room_code, None)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def put(self, meta: RoomMeta) -> RoomMeta:
+        self._rooms[meta.room_code] = (meta, self.clock() + self.ttl_s)
+        return meta
+
+    def remember(self, game, snippet_len: int) -> RoomMeta:
+        """Cache a game row just loaded or written, with its snippet's length"""
+        return self.put(RoomMeta(
+            room_code=game.room_code.upper(),
+            game_id=game.id,
+            host_user_id=game.host_user_id,
+            status=game.status,
+            snippet_id=game.snippet_id,
+            snippet_len=snippet_len
+        ))
+
+    def update(self, room_code: str, **changes) -> None:
+        """Apply a known change (status, host) to a cached room"""
+        entry = self._rooms.get(room_code.upper())
+        if entry is not None:
+            self.put(replace(entry[0], **changes))
+
+    def invalidate(self, room_code: str) -> None:
+        """Forget a room, e.g. once its game was deleted"""
+        self._rooms.pop(room_code.upper(), None)
+
+    def clear(self) -> None:
+        self._rooms.clear()
+
+    def stats(self) -> dict:
+        return {'rooms': len(self._rooms), 'hits': self.hits, 'misses': self.misses}
+
+
+# Process-wide registry shared by GameService and the Socket.IO handlers
+room_registry = RoomRegistry()
@@ -0,0 +1,108 @@
+"""
+Resumable room sessions.
+
+Every join_room hands the client a resume token for its (room, user)
+membership. When the user's last socket drops, the participant is only
+marked away and a per-user grace timer starts; the leave logic (row
+delete, host transfer, game cleanup) runs only if that timer expires. A
+reconnect inside the window that presents the token is served from the
+live race state, so a network blip costs no database work at all.
+
+Tokens live in this worker's memory; with room affinity every socket of a
+room reconnects to the same owner.
+"""
+import os
+import secrets
+from typing import Dict, Optional, Set, Tuple
+
+RESUME_GRACE_S = float(os.getenv("RESUME_GRACE_S", "30"))
+
+Member = Tuple[str, int]
+
+
+class ResumableSessions:
+    """Resume tokens and the participants currently away"""
+
+    def __init__(self):
+        self._tokens: Dict[str, Member] = {}
+        self._by_member: Dict[Member, str] = {}
+        self._by_room: Dict[str, Set[int]] = {}
+        self._away: Set[Member] = set()
+        # Counters
+        self.resumed = 0
+        self.expired = 0
+
+    def issue(self, room_code: str, user_id: int) -> str:
+        """Hand out a fresh token for a membership, revoking the previous one"""
+        member = (room_code, user_id)
+        old = self._by_member.pop(member, None)
+        if old is not None:
+            self._tokens.pop(old, None)
+        token = secrets.token_urlsafe(18)
+        self._tokens[token] = member
+        self._by_member[member] = token
+        self._by_room.setdefault(room_code, set()).add(user_id)
+        return token
+
+    def resolve(self, token) -> Optional[Member]:
+        """Membership a token was issued for"""
+        if not isinstance(token, str):
+            return None
+        return self._tokens.get(token)
+
+    def has_token(self, room_code: str, user_id: int) -> bool:
+        return (room_code, user_id) in self._by_member
+
+    def mark_away(self, room_code: str, user_id: int) -> None:
+        """The user's last socket dropped; their slot is held"""
+        self._away.add((room_code, user_id))
+
+    def is_away(self, room_code: str, user_id: int) -> bool:
+        return (room_code, user_id) in self._away
+
+    def back(self, room_code: str, user_id: int) -> bool:
+        """The user reconnected; returns whether they had been away"""
+        member = (room_code, user_id)
+        if member not in self._away:
+            return False
+        self._away.discard(member)
+        self.resumed += 1
+        return True
+
+    def expire(self, room_code: str, user_id: int) -> bool:
+        """The grace window ran out; returns whether the user was still away"""
+        if (room_code, user_id) not in self._away:
+            return False
+        self.forget(room_code, user_id)
+        self.expired += 1
+        return True
+
+    def forget(self, room_code: str, user_id: int) -> None:
+        """Drop a membership, e.g. after the user left"""
+        member = (room_code, user_id)
+        self._away.discard(member)
+        token = self._by_member.pop(member, None)
+        if token is not None:
+            self._tokens.pop(token, None)
+        users = self._by_room.get(room_code)
+        if users is not None:
+            users.discard(user_id)
+            if not users:
+                del self._by_room[room_code]
+
+    def forget_room(self, room_code: str) -> None:
+        """Drop every membership of a deleted room"""
+        for user_id in list(self._by_room.get(room_code, ())):
+            self.forget(room_code, user_id)
+
+    def stats(self) -> dict:
+        return {
+            'sessions': len(self._by_member),
+            'away': len(self._away),
+            'resumed': self.resumed,
+            'expired': self.expired
+        }
+
+
+# Process-wide sessions shared by the Socket.IO handlers
+room_sessions = ResumableSessions()
@@ -0,0 +1,115 @@
+"""
+Spectator fan-out tier.
+
+Spectators watch a room without a GameParticipant row and without joining
+its Socket.IO room, so they never receive the per-tick progress frames or
+count as players. Instead they sit in a separate spectator channel that
+gets one aggregated snapshot of the whole room at ``SPECTATOR_HZ``, and
+only for rooms that changed since the last snapshot. Progress events just
+mark the room dirty, so hundreds of viewers cost one emit per room per
+spectator tick regardless of typing rate.
+"""
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+SPECTATOR_HZ = float(os.getenv("SPECTATOR_HZ", "3"))
+
+# Called with a room code whose snapshot should go to its spectators
+EmitSnapshot = Callable[[str], Awaitable[None]]
+
+
+def spectator_channel(room_code: str) -> str:
+    """Socket.IO room holding a game room's spectators"""
+    return f"{room_code}:spectators"
+
+
+class SpectatorFeed:
+    """Tracks spectators per room and sends them downsampled snapshots"""
+
+    def __init__(self, emit: EmitSnapshot, hz: float = SPECTATOR_HZ):
+        self.emit = emit
+        self.interval = 1 / hz
+        self._rooms: Dict[str, Set[str]] = {}
+        self._by_sid: Dict[str, str] = {}
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        # Counters
+        self.marks = 0
+        self.snapshots = 0
+
+    def add(self, room_code: str, sid: str) -> Optional[str]:
+        """Register a spectator; returns the room it was watching before, if any"""
+        previous = self.remove(sid)
+        self._rooms.setdefault(room_code, set()).add(sid)
+        self._by_sid[sid] = room_code
+        return previous
+
+    def remove(self, sid: str) -> Optional[str]:
+        """Forget a spectator and return the room it was watching"""
+        room_code = self._by_sid.pop(sid, None)
+        if room_code is None:
+            return None
+        sids = self._rooms.get(room_code)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self._rooms[room_code]
+                self._dirty.discard(room_code)
+        return room_code
+
+    def room_of(self, sid: str) -> Optional[str]:
+        return self._by_sid.get(sid)
+
+    def count(self, room_code: str) -> int:
+        """Spectators watching a room"""
+        return len(self._rooms.get(room_code, ()))
+
+    def mark_dirty(self, room_code: str) -> None:
+        """Note that a room changed; free for rooms nobody watches"""
+        if room_code in self._rooms:
+            self.marks += 1
+            self._dirty.add(room_code)
+
+    def discard_room(self, room_code: str) -> None:
+        """Drop a pending snapshot, e.g. after the room was deleted"""
+        self._dirty.discard(room_code)
+
+    async def tick(self) -> int:
+        """Send one snapshot per changed, watched room; returns the count"""
+        dirty, self._dirty = self._dirty, set()
+        for room_code in dirty:
+            self.snapshots += 1
+            try:
+                await self.emit(room_code)
+            except Exception as e:
+                print(f"Spectator snapshot for {room_code} failed: {e}")
+        return len(dirty)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.tick()
+
+    def start(self) -> None:
+        """Start the spectator ticker on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the spectator ticker"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            'watched_rooms': len(self._rooms),
+            'spectators': len(self._by_sid),
+            'marks': self.marks,
+            'snapshots': self.snapshots
+        }
@@ -0,0 +1,234 @@
+"""
+Server-side room timers on a hierarchical timer wheel.
+
+Countdowns, race deadlines and lobby idle timeouts are kept per room in a
+wheel of ``TIMER_WHEEL_SLOTS`` slots per level, each level covering
+``slots`` times the span of the one below. Scheduling and cancelling are
+O(1) dict operations, and one ticker advances the wheel for every room at
+once, so tens of thousands of rooms cost no more than a handful. Timers
+further out than the top level can reach are parked there and re-placed
+as the wheel turns.
+
+A room has at most one timer per kind; scheduling a kind again replaces
+the earlier timer.
+"""
+import asyncio
+import math
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+TIMER_TICK_S = float(os.getenv("TIMER_TICK_S", "0.1"))
+TIMER_WHEEL_SLOTS = 64  # Per level; must be a power of two
+TIMER_WHEEL_LEVELS = 4
+
+# Seconds between the host starting and the race going live (matches the client countdown)
+RACE_COUNTDOWN_S = float(os.getenv("RACE_COUNTDOWN_S", "5"))
+# Race length after the countdown (matches the client timer)
+RACE_TIME_LIMIT_S = float(os.getenv("RACE_TIME_LIMIT_S", "120"))
+# Extra time for clients to report their own finish before the server forces it
+RACE_DEADLINE_GRACE_S = float(os.getenv("RACE_DEADLINE_GRACE_S", "10"))
+# Waiting rooms with no join, leave or start for this long are closed
+LOBBY_IDLE_TIMEOUT_S = float(os.getenv("LOBBY_IDLE_TIMEOUT_S", "1800"))
+
+TIMER_COUNTDOWN = "countdown"
+TIMER_RACE_DEADLINE = "race_deadline"
+TIMER_LOBBY_IDLE = "lobby_idle"
+TIMER_RESUME = "resume"  # Per user: reconnect grace window after a disconnect
+
+# Called with the room code, timer kind and subject (or None) when a timer fires
+OnExpire = Callable[[str, str, Any], Awaitable[None]]
+
+
+class Timer:
+    """A scheduled expiry, placed in one wheel slot"""
+    __slots__ = ("key", "deadline", "slot")
+
+    def __init__(self, key: Hashable, deadline: int):
+        self.key = key
+        self.deadline = deadline  # Absolute tick
+        self.slot: Optional[dict] = None
+
+
+class TimerWheel:
+    """Hierarchical timing wheel keyed by arbitrary hashable keys"""
+
+    def __init__(
+        self,
+        tick_s: float = TIMER_TICK_S,
+        slots: int = TIMER_WHEEL_SLOTS,
+        levels: int = TIMER_WHEEL_LEVELS,
+        now: float = 0.0
+    ):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.tick_s = tick_s
+        self.bits = slots.bit_length() - 1
+        self.mask = slots - 1
+        self.levels = levels
+        self.current = self._ticks(now)
+        self._wheels: List[List[Dict[Hashable, Timer]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        self._timers: Dict[Hashable, Timer] = {}
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def schedule(self, key: Hashable, at: float) -> None:
+        """Fire `key` once the wheel has advanced to time `at` (replaces an earlier timer)"""
+        self.cancel(key)
+        timer = Timer(key, max(self.current + 1, math.ceil(at / self.tick_s - 1e-9)))
+        self._timers[key] = timer
+        self._place(timer)
+
+    def cancel(self, key: Hashable) -> bool:
+        """Remove a pending timer; False if there was none"""
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return False
+        timer.slot.pop(key, None)
+        return True
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        """When a pending timer fires, in the wheel's time base"""
+        timer = self._timers.get(key)
+        return timer.deadline * self.tick_s if timer else None
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Turn the wheel up to time `now` and return the keys that expired, in order"""
+        target = self._ticks(now)
+        expired: List[Hashable] = []
+        while self.current < target:
+            self.current += 1
+            self._cascade()
+            bucket = self._wheels[0][self.current & self.mask]
+            if not bucket:
+                continue
+            due = list(bucket.values())
+            bucket.clear()
+            for timer in sorted(due, key=lambda t: t.deadline):
+                if timer.deadline > self.current:
+                    # Parked beyond the wheel's range; not due yet
+                    self._place(timer)
+                    continue
+                del self._timers[timer.key]
+                expired.append(timer.key)
+        return expired
+
+    def _ticks(self, t: float) -> int:
+        # Tolerate float error so e.g. 3.0 s is tick 30, not 29, at 0.1 s ticks
+        return math.floor(t / self.tick_s + 1e-9)
+
+    def _cascade(self) -> None:
+        """Move timers of the higher-level slots that just came due down a level"""
+        for level in range(1, self.levels):
+            # A level's slot comes due when every level below it wraps to zero
+            if self.current & ((1 << (self.bits * level)) - 1):
+                break
+            bucket = self._wheels[level][(self.current >> (self.bits * level)) & self.mask]
+            moved = list(bucket.values())
+            bucket.clear()
+            for timer in moved:
+                self._place(timer)
+
+    def _place(self, timer: Timer) -> None:
+        for level in range(self.levels):
+            shift = self.bits * (level + 1)
+            if timer.deadline >> shift == self.current >> shift:
+                break
+        else:
+            level = self.levels - 1
+        slot = self._wheels[level][(timer.deadline >> (self.bits * level)) & self.mask]
+        slot[timer.key] = timer
+        timer.slot = slot
+
+
+class RoomTimers:
+    """Per-room countdown, race deadline, lobby idle and resume timers on one ticker"""
+
+    def __init__(self, tick_s: float = TIMER_TICK_S, clock=time.monotonic):
+        self.clock = clock
+        self.wheel = TimerWheel(tick_s=tick_s, now=clock())
+        self.on_expire: Optional[OnExpire] = None
+        self._task: Optional[asyncio.Task] = None
+        # room_code -> keys of its pending timers
+        self._by_room: Dict[str, Set[tuple]] = {}
+        self.fired = 0
+
+    def schedule(self, room_code: str, kind: str, delay_s: float, subject: Hashable = None) -> None:
+        """
+        Fire `kind` for a room after `delay_s` seconds, replacing an earlier
+        one; `subject` (e.g. a user id) allows one timer of a kind per subject
+        """
+        key = (room_code, kind, subject)
+        self.wheel.schedule(key, self.clock() + delay_s)
+        self._by_room.setdefault(room_code, set()).add(key)
+
+    def cancel(self, room_code: str, kind: str, subject: Hashable = None) -> bool:
+        """Cancel one timer of a room"""
+        key = (room_code, kind, subject)
+        self._forget(key)
+        return self.wheel.cancel(key)
+
+    def cancel_room(self, room_code: str) -> None:
+        """Cancel every timer of a room, e.g. once it was deleted"""
+        for key in self._by_room.pop(room_code, ()):
+            self.wheel.cancel(key)
+
+    def remaining(self, room_code: str, kind: str, subject: Hashable = None) -> Optional[float]:
+        """Seconds until a room's timer fires, or None if it isn't set"""
+        deadline = self.wheel.deadline((room_code, kind, subject))
+        return None if deadline is None else max(0.0, deadline - self.clock())
+
+    def _forget(self, key: tuple) -> None:
+        keys = self._by_room.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_room[key[0]]
+
+    async def tick(self) -> int:
+        """Advance the wheel to now and run expiry handlers; returns the number fired"""
+        expired = self.wheel.advance(self.clock())
+        for key in expired:
+            self._forget(key)
+            self.fired += 1
+            if self.on_expire is None:
+                continue
+            room_code, kind, subject = key
+            try:
+                await self.on_expire(room_code, kind, subject)
+            except Exception as e:
+                print(f"Room timer {kind} for {room_code} failed: {e}")
+        return len(expired)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.wheel.tick_s)
+            await self.tick()
+
+    def start(self) -> None:
+        """Start the ticker on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the ticker; pending timers are dropped with the process"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {'pending': len(self.wheel), 'rooms': len(self._by_room), 'fired': self.fired}
+
+
+# Process-wide timers shared by the Socket.IO handlers
+room_timers = RoomTimers()
@@ -0,0 +1,92 @@
+"""
+Authoritative typing statistics from keystroke batches.
+
+Clients send batches of ``[offset, t_ms, char]`` keystrokes: the snippet
+offset a character was typed at, milliseconds since the client's race
+start, and the character itself. Each keystroke is checked against the
+snippet and folded into a few counters, so WPM, accuracy and progress cost
+O(batch) per update and the typed text is never stored.
+
+Progress only advances over correctly typed characters; indentation the
+client skips (lines are typed without leading whitespace) is jumped over.
+A keystroke is correct only if it advances progress: retyping an offset
+already passed, or skipping ahead, counts against accuracy.
+Elapsed time is the larger of the client's own clock and the server's view
+of it, so compressed timestamps can't inflate WPM.
+"""
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+KEYSTROKE_MAX_BATCH = int(os.getenv("KEYSTROKE_MAX_BATCH", "64"))
+
+
+class KeystrokeError(ValueError):
+    """Raised when a keystroke batch is malformed"""
+
+
+@dataclass
+class TypingStats:
+    """Running counters for one participant's keystrokes"""
+    typed: int = 0
+    correct: int = 0
+    progress: int = 0
+    last_ms: int = 0
+    origin: Optional[float] = None  # Server clock (s) at the client's t=0
+
+    def apply(self, batch: List[list], snippet: str, now: float) -> None:
+        """Fold a batch of keystrokes into the counters"""
+        if not isinstance(batch, list) or not batch:
+            raise KeystrokeError("Empty keystroke batch")
+        if len(batch) > KEYSTROKE_MAX_BATCH:
+            raise KeystrokeError(f"At most {KEYSTROKE_MAX_BATCH} keystrokes per batch")
+        entries = [_parse(entry, len(snippet)) for entry in batch]
+        last_ms = self.last_ms
+        for _, t_ms, _ in entries:
+            if t_ms < last_ms:
+                raise KeystrokeError("Keystrokes out of order")
+            last_ms = t_ms
+
+        if self.origin is None:
+            self.origin = now - entries[0][1] / 1000
+        for offset, t_ms, char in entries:
+            self.typed += 1
+            self.last_ms = t_ms
+            # Only a keystroke that advances progress counts as correct, so
+            # retyping an offset already passed can't inflate WPM
+            if (snippet[offset] == char and offset >= self.progress
+                    and not snippet[self.progress:offset].strip()):
+                self.correct += 1
+                self.progress = offset + 1
+
+    def elapsed_s(self, now: float) -> float:
+        """Race time so far, never less than the server has observed"""
+        if self.origin is None:
+            return 0.0
+        return max(self.last_ms / 1000, now - self.origin)
+
+    def wpm(self, now: float) -> float:
+        """Net words per minute (5 correct characters per word)"""
+        elapsed = self.elapsed_s(now)
+        if elapsed <= 0:
+            return 0.0
+        return round(self.correct / 5 / (elapsed / 60), 1)
+
+    def accuracy(self) -> float:
+        """Share of keystrokes that matched the snippet, in percent"""
+        if not self.typed:
+            return 100.0
+        return round(self.correct * 100 / self.typed, 2)
+
+
+def _parse(entry, snippet_len: int) -> tuple:
+    if not isinstance(entry, (list, tuple)) or len(entry) != 3:
+        raise KeystrokeError("Keystrokes must be [offset, t_ms, char]")
+    offset, t_ms, char = entry
+    if not isinstance(offset, int) or not isinstance(t_ms, int) or isinstance(offset, bool):
+        raise KeystrokeError("Keystroke offset and time must be integers")
+    if not isinstance(char, str) or len(char) != 1:
+        raise KeystrokeError("Keystroke must be a single character")
+    if not 0 <= offset < snippet_len or t_ms < 0:
+        raise KeystrokeError("Keystroke outside the snippet")
+    return offset, t_ms, char
@@ -0,0 +1,105 @@
+"""
+Compact binary wire format for progress and finish events.
+
+Clients that join with ``encoding: "binary"`` receive progress and finish
+frames as Socket.IO binary attachments instead of JSON dicts. Participants
+are referenced by their per-room slot (sent once in the JSON roster), and
+every value is a fixed-width little-endian integer:
+
+    header           <BBH   version, frame type, entry count
+    progress entry   <BIHH  slot, progress, wpm x10, accuracy x100
+    finish entry     <BHHB  slot, wpm x10, accuracy x100, position
+
+Inbound ``progress_bin`` events carry a room code plus a single <IHH
+payload (progress, wpm x10, accuracy x100); the user is resolved from the
+connection, so no ids travel with each frame. JSON stays the default.
+
+The binary encoding is a server-side opt-in for third-party and load-test
+clients: the bundled frontend joins with JSON and reports keystroke
+batches. decode_frame is the reference decoder for such clients, and a
+single byte per slot caps rooms at 255 players (GameCreate.max_players).
+"""
+import struct
+from typing import Iterable, List, Tuple
+
+from .race_state import ParticipantState
+
+WIRE_VERSION = 1
+FRAME_PROGRESS = 1
+FRAME_FINISH = 2
+
+ENCODING_JSON = "json"
+ENCODING_BINARY = "binary"
+ENCODINGS = (ENCODING_JSON, ENCODING_BINARY)
+
+HEADER = struct.Struct("<BBH")
+PROGRESS_ENTRY = struct.Struct("<BIHH")
+FINISH_ENTRY = struct.Struct("<BHHB")
+CLIENT_PROGRESS = struct.Struct("<IHH")
+
+
+class WireFormatError(ValueError):
+    """Raised when a binary frame cannot be decoded"""
+
+
+def progress_channel(room_code: str, encoding: str) -> str:
+    """Socket.IO room that receives a room's progress frames in one encoding"""
+    return f"{room_code}#{encoding}"
+
+
+def _fixed(value: float, scale: int) -> int:
+    return max(0, min(0xFFFF, int(round(value * scale))))
+
+
+def encode_progress_frame(participants: Iterable[ParticipantState]) -> bytes:
+    """Encode changed participants as one binary progress frame"""
+    entries = [
+        PROGRESS_ENTRY.pack(p.slot, max(0, p.progress), _fixed(p.wpm, 10), _fixed(p.accuracy, 100))
+        for p in participants
+    ]
+    return HEADER.pack(WIRE_VERSION, FRAME_PROGRESS, len(entries)) + b"".join(entries)
+
+
+def encode_finish_frame(participant: ParticipantState) -> bytes:
+    """Encode a single finish result"""
+    return HEADER.pack(WIRE_VERSION, FRAME_FINISH, 1) + FINISH_ENTRY.pack(
+        participant.slot,
+        _fixed(participant.wpm, 10),
+        _fixed(participant.accuracy, 100),
+        min(0xFF, participant.finish_position or 0)
+    )
+
+
+def decode_frame(data: bytes) -> Tuple[int, List[dict]]:
+    """Decode a server frame into (frame type, entries); the reference for client decoders"""
+    if len(data) < HEADER.size:
+        raise WireFormatError("Frame too short")
+    version, frame_type, count = HEADER.unpack_from(data)
+    if version != WIRE_VERSION:
+        raise WireFormatError(f"Unsupported wire version {version}")
+    entry = PROGRESS_ENTRY if frame_type == FRAME_PROGRESS else FINISH_ENTRY
+    if frame_type not in (FRAME_PROGRESS, FRAME_FINISH) or len(data) != HEADER.size + count * entry.size:
+        raise WireFormatError("Malformed frame")
+    entries = []
+    for i in range(count):
+        values = entry.unpack_from(data, HEADER.size + i * entry.size)
+        if frame_type == FRAME_PROGRESS:
+            slot, progress, wpm, accuracy = values
+            entries.append({'slot': slot, 'progress': progress, 'wpm': wpm / 10, 'accuracy': accuracy / 100})
+        else:
+            slot, wpm, accuracy, position = values
+            entries.append({'slot': slot, 'wpm': wpm / 10, 'accuracy': accuracy / 100, 'position': position})
+    return frame_type, entries
+
+
+def encode_client_progress(progress: int, wpm: float, accuracy: float) -> bytes:
+    """Encode an inbound progress_bin payload (used by clients and tests)"""
+    return CLIENT_PROGRESS.pack(max(0, progress), _fixed(wpm, 10), _fixed(accuracy, 100))
+
+
+def decode_client_progress(data: bytes) -> Tuple[int, float, float]:
+    """Decode an inbound progress_bin payload into (progress, wpm, accuracy)"""
+    if not isinstance(data, (bytes, bytearray)) or len(data) != CLIENT_PROGRESS.size:
+        raise WireFormatError("Malformed progress payload")
+    progress, wpm, accuracy = CLIENT_PROGRESS.unpack(data)
+    return progress, wpm / 10, accuracy / 100
@@ -0,0 +1,135 @@
+"""
+Write-behind stage for participant progress.
+
+Progress changes are collected in memory, keeping only the latest value per
+participant, and written as a single bulk UPDATE on an interval, when the
+number of dirty rows crosses a threshold, on finish and on shutdown.
+"""
+import asyncio
+import os
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..repositories.game_repository import ParticipantRepository
+from .race_state import ParticipantState
+
+FLUSH_INTERVAL_MS = int(os.getenv("PROGRESS_FLUSH_INTERVAL_MS", "1000"))
+FLUSH_MAX_PENDING = int(os.getenv("PROGRESS_FLUSH_MAX_PENDING", "500"))
+
+
+class ProgressWriteBehind:
+    """Coalesces dirty participant progress and flushes it in bulk"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        interval_ms: int = FLUSH_INTERVAL_MS,
+        max_pending: int = FLUSH_MAX_PENDING
+    ):
+        self.session_factory = session_factory
+        self.interval = interval_ms / 1000
+        self.max_pending = max_pending
+        # participant_id -> latest row values
+        self._pending: Dict[int, dict] = {}
+        # Created per start() so each event loop (lifespan) gets its own
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # Counters for tuning under load
+        self.marked = 0
+        self.coalesced = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def mark_dirty(self, participant: ParticipantState) -> None:
+        """Record the participant's current progress for the next flush"""
+        self.marked += 1
+        if participant.participant_id in self._pending:
+            self.coalesced += 1
+        self._pending[participant.participant_id] = {
+            "participant_id": participant.participant_id,
+            "progress": participant.progress,
+            "wpm": participant.wpm,
+            "accuracy": participant.accuracy
+        }
+        if len(self._pending) >= self.max_pending and self._wakeup is not None:
+            self._wakeup.set()
+
+    def discard(self, participant_ids: Iterable[int]) -> None:
+        """Forget pending writes, e.g. when a room is reset for a rematch"""
+        for participant_id in participant_ids:
+            self._pending.pop(participant_id, None)
+
+    async def flush(self) -> int:
+        """Write all pending rows in one statement and return how many were sent"""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        try:
+            await asyncio.to_thread(self._write, list(batch.values()))
+        except Exception:
+            self.failed_flushes += 1
+            # Put the batch back without clobbering newer values
+            for participant_id, row in batch.items():
+                self._pending.setdefault(participant_id, row)
+            raise
+        self.flushes += 1
+        self.flushed += len(batch)
+        return len(batch)
+
+    def _write(self, rows: list) -> None:
+        db = self.session_factory()
+        try:
+            ParticipantRepository(db).bulk_update_progress(rows)
+        finally:
+            db.close()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Progress flush failed: {e}")
+
+    def start(self) -> None:
+        """Start the background flush loop on the running event loop"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write whatever is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._wakeup = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        """Counters for monitoring coalescing efficiency"""
+        return {
+            "pending": len(self._pending),
+            "marked": self.marked,
+            "coalesced": self.coalesced,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes
+        }
+
+
+# Process-wide writer shared by the Socket.IO handlers
+progress_writer = ProgressWriteBehind()
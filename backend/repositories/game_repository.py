@@ -1,9 +1,11 @@
 """
 Game and participant repositories for game-related database operations
 """
-from typing import Optional, List
-from sqlalchemy.orm import Session
-from ..models import Game, GameParticipant
+from datetime import datetime
+from typing import Optional, List, Tuple, Iterable
+from sqlalchemy import update, bindparam, func, case
+from sqlalchemy.orm import Session, defer, contains_eager
+from ..models import Game, GameParticipant, RaceReplay, Snippet
 from .base import BaseRepository
 
 
@@ -19,6 +21,21 @@ class GameRepository(BaseRepository[Game]):
             Game.room_code == room_code.upper()
         ).first()
     
+    def get_details(self, room_code: str) -> Optional[Game]:
+        """
+        Get a game with its participants, snippet and snippet language loaded
+        by a single joined query (participants in join order)
+        """
+        rows = self.db.query(Game).outerjoin(Game.participants).outerjoin(Game.snippet).outerjoin(
+            Snippet.language
+        ).options(
+            contains_eager(Game.participants),
+            contains_eager(Game.snippet).contains_eager(Snippet.language)
+        ).filter(
+            Game.room_code == room_code.upper()
+        ).order_by(GameParticipant.id).populate_existing().all()
+        return rows[0] if rows else None
+    
     def room_code_exists(self, room_code: str) -> bool:
         """Check if room code already exists"""
         return self.get_by_room_code(room_code) is not None
@@ -34,6 +51,94 @@ class GameRepository(BaseRepository[Game]):
         return self.db.query(Game).filter(
             Game.host_user_id == host_user_id
         ).all()
+    
+    def lock(self, game_id: int) -> Optional[Game]:
+        """Get a game with its row locked until the caller's transaction ends"""
+        return self.db.query(Game).filter(
+            Game.id == game_id
+        ).with_for_update().populate_existing().first()
+    
+    def delete_stale(
+        self,
+        status: str,
+        older_than: datetime,
+        limit: int,
+        exclude_room_codes: Iterable[str] = ()
+    ) -> Tuple[List[str], int]:
+        """
+        Delete up to `limit` games of a status last active before `older_than`.
+
+        Activity is the latest of the finish, start and creation times that
+        are set. Rows another transaction holds (e.g. a finish in flight) are
+        skipped rather than waited for. Participants go with their game;
+        replays keep their row with game_id cleared. Returns the deleted room
+        codes and participant count.
+        """
+        # Portable GREATEST that ignores unset times (SQLite has no GREATEST)
+        started = func.coalesce(Game.started_at, Game.created_at)
+        finished = func.coalesce(Game.finished_at, Game.created_at)
+        last_active = case((started > finished, started), else_=finished)
+        query = self.db.query(Game.id, Game.room_code).filter(
+            Game.status == status,
+            last_active < older_than
+        )
+        exclude = [code.upper() for code in exclude_room_codes]
+        if exclude:
+            query = query.filter(Game.room_code.notin_(exclude))
+        rows = query.order_by(Game.id).limit(limit).with_for_update(skip_locked=True).all()
+        if not rows:
+            self.db.rollback()
+            return [], 0
+        ids = [row.id for row in rows]
+        participants = self.db.query(GameParticipant).filter(
+            GameParticipant.game_id.in_(ids)
+        ).delete(synchronize_session=False)
+        self.db.query(Game).filter(Game.id.in_(ids)).delete(synchronize_session=False)
+        self.db.commit()
+        return [row.room_code for row in rows], participants
+    
+    def adjust_counts(self, game_id: int, players: int = 0, finished: int = 0) -> None:
+        """
+        Shift a game's participant counters in place.
+
+        Runs as part of the caller's transaction, so the counters commit
+        together with the participant change they describe.
+        """
+        self.db.execute(
+            update(Game)
+            .where(Game.id == game_id)
+            .values(
+                player_count=Game.player_count + players,
+                finished_count=Game.finished_count + finished
+            )
+            .execution_options(synchronize_session=False)
+        )
+    
+    def record_finish(self, game_id: int) -> Optional[Tuple[int, str]]:
+        """
+        Hand out the next finish position, count the finisher and mark the
+        game finished once everyone has.
+
+        A single UPDATE ... RETURNING on the game row acts as the per-game
+        sequence: concurrent finishers each get a distinct position without
+        locking any participant rows, and exactly one of them sees the game
+        flip to finished. Returns (finish_position, status), or None if the
+        game no longer exists. Runs as part of the caller's transaction.
+        """
+        all_finished = Game.finished_count + 1 >= Game.player_count
+        row = self.db.execute(
+            update(Game)
+            .where(Game.id == game_id)
+            .values(
+                last_finish_position=Game.last_finish_position + 1,
+                finished_count=Game.finished_count + 1,
+                status=case((all_finished, "finished"), else_=Game.status),
+                finished_at=case((all_finished, func.now()), else_=Game.finished_at)
+            )
+            .returning(Game.last_finish_position, Game.status)
+            .execution_options(synchronize_session=False)
+        ).first()
+        return tuple(row) if row else None
 
 
 class ParticipantRepository(BaseRepository[GameParticipant]):
@@ -49,12 +154,76 @@ class ParticipantRepository(BaseRepository[GameParticipant]):
             GameParticipant.user_id == user_id
         ).first()
     
+    def claim_finish(self, participant_id: int) -> bool:
+        """
+        Mark a participant finished unless it already is. The conditional
+        UPDATE lets exactly one of several concurrent finishes (REST and
+        socket, or two workers) through. Runs as part of the caller's
+        transaction.
+        """
+        result = self.db.execute(
+            update(GameParticipant)
+            .where(GameParticipant.id == participant_id, GameParticipant.is_finished.is_(False))
+            .values(is_finished=True)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
     def get_by_game(self, game_id: int) -> List[GameParticipant]:
         """Get all participants for a specific game"""
         return self.db.query(GameParticipant).filter(
             GameParticipant.game_id == game_id
         ).all()
     
+    def delete_by_game_and_user(self, game_id: int, user_id: int) -> bool:
+        """Remove a participant from a game"""
+        participant = self.get_by_game_and_user(game_id, user_id)
+        if not participant:
+            return False
+        self.remove(participant)
+        return True
+    
+    def remove(self, participant: GameParticipant) -> None:
+        """Delete an already loaded participant"""
+        self.db.delete(participant)
+        self.db.commit()
+    
+    def delete_by_game(self, game_id: int) -> int:
+        """Delete every participant of a game (caller's transaction)"""
+        return self.db.query(GameParticipant).filter(
+            GameParticipant.game_id == game_id
+        ).delete(synchronize_session=False)
+    
+    def bulk_update_progress(self, rows: List[dict]) -> None:
+        """
+        Write progress for many participants in one executemany UPDATE.
+
+        Each row needs participant_id, progress, wpm and accuracy. Finished
+        participants are skipped so a late flush never overwrites a result.
+        """
+        if not rows:
+            return
+        params = [{
+            "p_id": row["participant_id"],
+            "p_progress": row["progress"],
+            "p_wpm": row["wpm"],
+            "p_accuracy": row["accuracy"]
+        } for row in rows]
+        stmt = (
+            update(GameParticipant.__table__)
+            .where(
+                GameParticipant.__table__.c.id == bindparam("p_id"),
+                GameParticipant.__table__.c.is_finished.is_(False)
+            )
+            .values(
+                progress=bindparam("p_progress"),
+                wpm=bindparam("p_wpm"),
+                accuracy=bindparam("p_accuracy")
+            )
+        )
+        self.db.execute(stmt, params)
+        self.db.commit()
+    
     def count_by_game(self, game_id: int) -> int:
         """Count participants in a game"""
         return self.db.query(GameParticipant).filter(
@@ -67,13 +236,29 @@ class ParticipantRepository(BaseRepository[GameParticipant]):
             GameParticipant.game_id == game_id,
             GameParticipant.is_finished == True
         ).count()
-    
-    def get_next_finish_position(self, game_id: int) -> int:
-        """Get the next finish position for a game"""
-        # Lock existing finished rows to avoid race conditions assigning duplicate positions
-        query = self.db.query(GameParticipant.finish_position).filter(
-            GameParticipant.game_id == game_id,
-            GameParticipant.finish_position.isnot(None)
-        ).order_by(GameParticipant.finish_position.desc()).with_for_update()
-        max_position = query.first()
-        return (max_position[0] + 1) if max_position and max_position[0] else 1
+
+
+class ReplayRepository(BaseRepository[RaceReplay]):
+    """Repository for RaceReplay model; blob reads are ranged so playback can stream"""
+
+    def __init__(self, db: Session):
+        super().__init__(RaceReplay, db)
+
+    def get_by_room_code(self, room_code: str, limit: int = 20) -> List[RaceReplay]:
+        """Most recent replays recorded in a room, without loading their blobs"""
+        return self.db.query(RaceReplay).options(defer(RaceReplay.data)).filter(
+            RaceReplay.room_code == room_code.upper()
+        ).order_by(RaceReplay.id.desc()).limit(limit).all()
+
+    def read_chunk(self, replay_id: int, offset: int, size: int) -> Optional[bytes]:
+        """Read `size` bytes of a replay blob starting at `offset` (0-based)"""
+        row = self.db.query(func.substr(RaceReplay.data, offset + 1, size)).filter(
+            RaceReplay.id == replay_id
+        ).first()
+        return bytes(row[0]) if row and row[0] is not None else None
+
+    def get_summary(self, replay_id: int) -> Optional[RaceReplay]:
+        """Get a replay's metadata without loading its blob"""
+        return self.db.query(RaceReplay).options(defer(RaceReplay.data)).filter(
+            RaceReplay.id == replay_id
+        ).first()
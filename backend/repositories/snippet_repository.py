@@ -14,6 +14,11 @@ class SnippetRepository(BaseRepository[Snippet]):
     def __init__(self, db: Session):
         super().__init__(Snippet, db)
     
+    def get_length(self, snippet_id: int) -> int:
+        """Length of a snippet's code without loading the code itself"""
+        length = self.db.query(func.length(Snippet.code)).filter(Snippet.id == snippet_id).scalar()
+        return length or 0
+
     def get_random(self) -> Optional[Snippet]:
         """Get a random code snippet"""
         return self.db.query(Snippet).order_by(func.random()).first()
@@ -1,7 +1,7 @@
 """
 User repository for user-specific database operations
 """
-from typing import Optional
+from typing import Optional, List
 from sqlalchemy.orm import Session
 from ..models import User
 from .base import BaseRepository
@@ -13,6 +13,10 @@ class UserRepository(BaseRepository[User]):
     def __init__(self, db: Session):
         super().__init__(User, db)
     
+    def get_by_ids(self, user_ids: List[int]) -> List[User]:
+        """Get several users in one query"""
+        return self.db.query(User).filter(User.id.in_(user_ids)).all()
+
     def get_by_email(self, email: str) -> Optional[User]:
         """Get user by email address"""
         return self.db.query(User).filter(User.email == email).first()
@@ -1,13 +1,17 @@
 """
 Game routes - thin controllers using GameService
 """
-from fastapi import APIRouter, Depends
+from typing import List
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from ..database import get_db
 from ..services.game_service import GameService
+from ..services.replay_service import ReplayService, replay_stream
+from ..realtime.affinity import room_affinity
 from ..schemas.game import (
     GameCreate, GameJoin, GameResponse, GameDetailResponse,
-    ParticipantProgress, ParticipantFinish
+    ParticipantProgress, ParticipantFinish, ReplaySummary
 )
 
 router = APIRouter(prefix="/games", tags=["games"])
@@ -18,6 +22,11 @@ def get_game_service(db: Session = Depends(get_db)) -> GameService:
     return GameService(db)
 
 
+def get_replay_service(db: Session = Depends(get_db)) -> ReplayService:
+    """Dependency injection for ReplayService"""
+    return ReplayService(db)
+
+
 @router.post("/create", response_model=GameResponse)
 def create_game(
     payload: GameCreate,
@@ -45,6 +54,38 @@ def get_game(
     return game_service.get_game_details(room_code)
 
 
+@router.get("/{room_code}/endpoint")
+def get_game_endpoint(room_code: str):
+    """Socket.IO endpoint of the worker that owns the room (null: use the default URL)"""
+    room_code = room_code.upper()
+    return {
+        "room_code": room_code,
+        "node_id": room_affinity.owner(room_code),
+        "endpoint": room_affinity.endpoint_for(room_code)
+    }
+
+
+@router.get("/{room_code}/replays", response_model=List[ReplaySummary])
+def list_replays(
+    room_code: str,
+    limit: int = Query(20, ge=1, le=100),
+    replay_service: ReplayService = Depends(get_replay_service)
+):
+    """Most recent replays recorded in a room"""
+    return replay_service.list_replays(room_code, limit=limit)
+
+
+@router.get("/replays/{replay_id}/stream")
+def stream_replay(
+    replay_id: int,
+    speed: float = Query(1.0, ge=1.0, le=64.0),
+    replay_service: ReplayService = Depends(get_replay_service)
+):
+    """Play back a finished race as NDJSON progress samples, paced at `speed`x"""
+    head = replay_service.open_replay(replay_id)
+    return StreamingResponse(replay_stream(replay_id, head, speed), media_type="application/x-ndjson")
+
+
 @router.post("/{room_code}/start")
 def start_game(
     room_code: str,
@@ -1,7 +1,7 @@
 """
 Game schemas for request/response validation
 """
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -10,7 +10,8 @@ class GameCreate(BaseModel):
     """Schema for creating a new game"""
     user_id: int
     snippet_id: Optional[int] = None
-    max_players: int = 4
+    # Wire-format slots and finish positions are single bytes
+    max_players: int = Field(4, le=255)
     language: Optional[str] = None  # Optional language name for random snippet selection
 
 
@@ -75,3 +76,16 @@ class GameDetailResponse(BaseModel):
     participants: List[ParticipantResponse]
     snippet_code: str
     snippet_language: Optional[str] = None
+
+
+class ReplaySummary(BaseModel):
+    """Schema for a stored race replay (without the timeline itself)"""
+    id: int
+    game_id: Optional[int]
+    room_code: str
+    snippet_id: Optional[int]
+    duration_ms: int
+    event_count: int
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
@@ -3,16 +3,44 @@ Game service for game and participant management
 """
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from ..models import Game, GameParticipant
-from ..repositories.game_repository import GameRepository, ParticipantRepository
+from ..models import Game, GameParticipant, RaceReplay
+from ..repositories.game_repository import GameRepository, ParticipantRepository, ReplayRepository
 from ..repositories.user_repository import UserRepository
 from ..repositories.snippet_repository import SnippetRepository
+from ..realtime.room_registry import room_registry, RoomMeta
 from ..schemas.game import (
     GameCreate, GameJoin, GameResponse, GameDetailResponse,
     ParticipantResponse, ParticipantProgress, ParticipantFinish
 )
 import random
 import string
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# Anti-cheat upper bound for reported typing speed
+MAX_WPM = 400
+
+
+def clamp_progress(progress: int, wpm: float, accuracy: float, snippet_len: int) -> Tuple[int, float, float]:
+    """Clamp reported progress, WPM and accuracy to valid bounds"""
+    # Clamp progress to valid bounds (characters typed)
+    if progress < 0:
+        progress = 0
+    if snippet_len and progress > snippet_len:
+        progress = snippet_len
+
+    # Clamp WPM & accuracy to sensible anti-cheat bounds
+    if wpm < 0:
+        wpm = 0
+    if wpm > MAX_WPM:
+        wpm = MAX_WPM
+
+    if accuracy < 0:
+        accuracy = 0
+    if accuracy > 100:
+        accuracy = 100
+
+    return progress, wpm, accuracy
 
 
 class GameService:
@@ -24,7 +52,26 @@ class GameService:
         self.participant_repo = ParticipantRepository(db)
         self.user_repo = UserRepository(db)
         self.snippet_repo = SnippetRepository(db)
+        self.replay_repo = ReplayRepository(db)
     
+    def get_room(self, room_code: str) -> Optional[RoomMeta]:
+        """
+        Resolve a room code to its cached metadata
+
+        Only queries (game row and snippet length) when the registry has no
+        fresh entry for the room.
+
+        Returns:
+            Room metadata, or None if the game does not exist
+        """
+        meta = room_registry.get(room_code)
+        if meta is not None:
+            return meta
+        game = self.game_repo.get_by_room_code(room_code)
+        if not game:
+            return None
+        return room_registry.remember(game, self.snippet_repo.get_length(game.snippet_id))
+
     def _generate_unique_room_code(self) -> str:
         """Generate a unique 6-character room code"""
         while True:
@@ -76,7 +123,8 @@ class GameService:
             host_user_id=game_data.user_id,
             snippet_id=snippet_id,
             status="waiting",
-            max_players=game_data.max_players
+            max_players=game_data.max_players,
+            player_count=1  # The host, added below
         )
         created_game = self.game_repo.create(game)
         
@@ -87,9 +135,51 @@ class GameService:
             username=user.username
         )
         self.participant_repo.create(participant)
+        room_registry.remember(created_game, len(snippet.code or ""))
         
         return GameResponse.model_validate(created_game)
     
+    def create_match_game(self, user_ids: List[int], language: str, max_players: int) -> GameResponse:
+        """
+        Create a room for a group formed by quick-play matchmaking
+
+        Args:
+            user_ids: Matched players, longest waiting first; the first one hosts
+            language: Language to pick the snippet from
+            max_players: Room capacity
+
+        Returns:
+            Created game details
+
+        Raises:
+            HTTPException: If no user remains or no snippet exists for the language
+        """
+        users = {u.id: u for u in self.user_repo.get_by_ids(user_ids)}
+        players = [users[user_id] for user_id in user_ids if user_id in users]
+        if not players:
+            raise HTTPException(status_code=404, detail="User not found")
+        snippet = self.snippet_repo.get_random_by_language(language)
+        if not snippet:
+            raise HTTPException(status_code=404, detail="No snippets available for selected language")
+
+        game = Game(
+            room_code=self._generate_unique_room_code(),
+            host_user_id=players[0].id,
+            snippet_id=snippet.id,
+            status="waiting",
+            max_players=max(max_players, len(players)),
+            player_count=len(players)
+        )
+        self.db.add(game)
+        self.db.flush()
+        # Game and participants commit together
+        self.db.add_all([
+            GameParticipant(game_id=game.id, user_id=u.id, username=u.username) for u in players
+        ])
+        game = self.game_repo.update(game)
+        room_registry.remember(game, len(snippet.code or ""))
+        return GameResponse.model_validate(game)
+
     def join_game(self, join_data: GameJoin) -> dict:
         """
         Join an existing game room
@@ -122,10 +212,11 @@ class GameService:
             raise HTTPException(status_code=400, detail="Already in this game")
         
         # Check capacity
-        if self.participant_repo.count_by_game(game.id) >= game.max_players:
+        if game.player_count >= game.max_players:
             raise HTTPException(status_code=400, detail="Game room is full")
         
-        # Add participant
+        # Add participant (the counter commits with the new row)
+        self.game_repo.adjust_counts(game.id, players=1)
         participant = GameParticipant(
             game_id=game.id,
             user_id=user.id,
@@ -148,45 +239,75 @@ class GameService:
         Raises:
             HTTPException: If game not found
         """
-        game = self.game_repo.get_by_room_code(room_code)
+        # Game, participants, snippet and language in one round trip
+        game = self.game_repo.get_details(room_code)
         if not game:
             raise HTTPException(status_code=404, detail="Game not found")
         
-        participants = self.participant_repo.get_by_game(game.id)
-        snippet = self.snippet_repo.get_by_id(game.snippet_id)
+        snippet = game.snippet
+        room_registry.remember(game, len(snippet.code or "") if snippet else 0)
         
         language_name = "" if not snippet or not snippet.language else snippet.language.name
         return GameDetailResponse(
             game=GameResponse.model_validate(game),
-            participants=[ParticipantResponse.model_validate(p) for p in participants],
+            participants=[ParticipantResponse.model_validate(p) for p in game.participants],
             snippet_code=snippet.code if snippet else "",
             snippet_language=language_name
         )
     
-    def start_game(self, room_code: str) -> dict:
+    def get_race_snapshot(self, room_code: str) -> Optional[Tuple[Game, List[GameParticipant], str]]:
+        """
+        Load everything the in-memory race state needs for a room
+
+        Args:
+            room_code: Game room code
+
+        Returns:
+            Tuple of (game, participants, snippet code), or None if the game does not exist
+        """
+        game = self.game_repo.get_by_room_code(room_code)
+        if not game:
+            return None
+        participants = self.participant_repo.get_by_game(game.id)
+        snippet = self.snippet_repo.get_by_id(game.snippet_id)
+        code = snippet.code if snippet and snippet.code else ""
+        room_registry.remember(game, len(code))
+        return game, participants, code
+
+    def start_game(self, room_code: str, user_id: Optional[int] = None) -> dict:
         """
         Start a game
         
         Args:
             room_code: Game room code
+            user_id: If given, only this user may start the game and must be the host
             
         Returns:
-            Success message
+            Success message with the new status and start time
             
         Raises:
-            HTTPException: If game not found or already started
+            HTTPException: If game not found, user is not the host or game already started
         """
         game = self.game_repo.get_by_room_code(room_code)
         if not game:
             raise HTTPException(status_code=404, detail="Game not found")
         
+        if user_id is not None and game.host_user_id != user_id:
+            raise HTTPException(status_code=403, detail="Only host can start")
+        
         if game.status != "waiting":
             raise HTTPException(status_code=400, detail="Game already started or finished")
         
         game.status = "in_progress"
+        game.started_at = datetime.utcnow()
         self.game_repo.update(game)
+        room_registry.update(room_code, status=game.status)
         
-        return {"message": "Game started successfully"}
+        return {
+            "message": "Game started successfully",
+            "status": game.status,
+            "started_at": game.started_at.isoformat()
+        }
     
     def update_progress(self, progress_data: ParticipantProgress) -> dict:
         """
@@ -201,43 +322,20 @@ class GameService:
         Raises:
             HTTPException: If game or participant not found
         """
-        game = self.game_repo.get_by_room_code(progress_data.room_code)
-        if not game:
+        room = self.get_room(progress_data.room_code)
+        if not room:
             raise HTTPException(status_code=404, detail="Game not found")
         
         participant = self.participant_repo.get_by_game_and_user(
-            game.id, progress_data.user_id
+            room.game_id, progress_data.user_id
         )
         if not participant:
             raise HTTPException(status_code=404, detail="Participant not found")
         
-        # Retrieve snippet length for validation/clamping
-        snippet = self.snippet_repo.get_by_id(game.snippet_id)
-        snippet_len = len(snippet.code) if snippet and snippet.code else 0
-
-        # Clamp progress to valid bounds (characters typed)
-        raw_progress = progress_data.progress
-        if raw_progress < 0:
-            raw_progress = 0
-        if snippet_len and raw_progress > snippet_len:
-            raw_progress = snippet_len
-
-        # Clamp WPM & accuracy to sensible anti-cheat bounds
-        raw_wpm = progress_data.wpm
-        if raw_wpm < 0:
-            raw_wpm = 0
-        if raw_wpm > 400:  # Arbitrary high cap
-            raw_wpm = 400
-
-        raw_accuracy = progress_data.accuracy
-        if raw_accuracy < 0:
-            raw_accuracy = 0
-        if raw_accuracy > 100:
-            raw_accuracy = 100
-
-        participant.progress = raw_progress
-        participant.wpm = raw_wpm
-        participant.accuracy = raw_accuracy
+        # Snippet length (for validation/clamping) comes with the room
+        participant.progress, participant.wpm, participant.accuracy = clamp_progress(
+            progress_data.progress, progress_data.wpm, progress_data.accuracy, room.snippet_len
+        )
         self.participant_repo.update(participant)
         
         return {"message": "Progress updated"}
@@ -250,27 +348,29 @@ class GameService:
             finish_data: Participant finish data
             
         Returns:
-            Success message with finish position
+            Success message with finish position, the game status after this
+            finish and the updated participant
             
         Raises:
             HTTPException: If game or participant not found
         """
-        game = self.game_repo.get_by_room_code(finish_data.room_code)
-        if not game:
+        room = self.get_room(finish_data.room_code)
+        if not room:
             raise HTTPException(status_code=404, detail="Game not found")
         
         participant = self.participant_repo.get_by_game_and_user(
-            game.id, finish_data.user_id
+            room.game_id, finish_data.user_id
         )
         if not participant:
             raise HTTPException(status_code=404, detail="Participant not found")
         
-        if participant.is_finished:
+        # The read above may be stale: only the finish that flips the row counts
+        if participant.is_finished or not self.participant_repo.claim_finish(participant.id):
+            self.db.rollback()
             raise HTTPException(status_code=400, detail="Already finished")
         
-        # Retrieve snippet length for accurate final progress
-        snippet = self.snippet_repo.get_by_id(game.snippet_id)
-        snippet_len = len(snippet.code) if snippet and snippet.code else 0
+        # Snippet length (for accurate final progress) comes with the room
+        snippet_len = room.snippet_len
 
         # Set finish data
         participant.is_finished = True
@@ -278,20 +378,21 @@ class GameService:
         participant.accuracy = finish_data.accuracy
         # Progress represents characters typed; set to full snippet length if known
         participant.progress = snippet_len if snippet_len else participant.progress
-        participant.finish_position = self.participant_repo.get_next_finish_position(game.id)
+        # Position and "all finished" check come from one statement on the game row
+        sequenced = self.game_repo.record_finish(room.game_id)
+        if sequenced is None:
+            room_registry.invalidate(finish_data.room_code)
+            raise HTTPException(status_code=404, detail="Game not found")
+        participant.finish_position, status = sequenced
         self.participant_repo.update(participant)
-        
-        # Check if all players finished
-        total_participants = self.participant_repo.count_by_game(game.id)
-        finished_participants = self.participant_repo.count_finished_by_game(game.id)
-        
-        if total_participants == finished_participants:
-            game.status = "finished"
-            self.game_repo.update(game)
+        if status != room.status:
+            room_registry.update(finish_data.room_code, status=status)
         
         return {
             "message": "Participant marked as finished",
-            "finish_position": participant.finish_position
+            "finish_position": participant.finish_position,
+            "status": status,
+            "participant": ParticipantResponse.model_validate(participant)
         }
 
     def leave_game(self, room_code: str, user_id: int) -> dict:
@@ -310,10 +411,14 @@ class GameService:
 
         # Allow leaving from any game status (waiting, in_progress, or finished)
 
-        # Remove participant
-        removed = self.participant_repo.delete_by_game_and_user(game.id, user_id)
-        if not removed:
+        # Remove participant (the counters commit with the delete)
+        participant = self.participant_repo.get_by_game_and_user(game.id, user_id)
+        if not participant:
             raise HTTPException(status_code=404, detail="Not in this game")
+        self.game_repo.adjust_counts(
+            game.id, players=-1, finished=-1 if participant.is_finished else 0
+        )
+        self.participant_repo.remove(participant)
 
         # Load remaining participants
         remaining = self.participant_repo.get_by_game(game.id)
@@ -321,6 +426,7 @@ class GameService:
         # If no one remains, delete the game
         if not remaining:
             self.game_repo.delete(game.id)
+            room_registry.invalidate(room_code)
             return {"message": "Game deleted - no players remaining", "game_deleted": True}
 
         response: dict = {"message": "Left game successfully"}
@@ -330,6 +436,7 @@ class GameService:
             new_host = remaining[0]
             game.host_user_id = new_host.user_id
             self.game_repo.update(game)
+            room_registry.update(room_code, host_user_id=game.host_user_id)
             response["new_host_id"] = new_host.user_id
             response["new_host_username"] = new_host.username
 
@@ -380,7 +487,11 @@ class GameService:
         game.snippet_id = new_snippet.id
         game.status = "waiting"
         game.started_at = None
+        game.finished_at = None
+        game.finished_count = 0
+        game.last_finish_position = 0
         self.game_repo.update(game)
+        room_registry.remember(game, len(new_snippet.code or ""))
         
         # Reset all participants
         participants = self.participant_repo.get_by_game(game.id)
@@ -393,3 +504,80 @@ class GameService:
             self.participant_repo.update(participant)
         
         return GameResponse.model_validate(game)
+
+    def force_finish_game(self, room_code: str, game_id: int) -> Optional[str]:
+        """
+        End a race whose deadline passed, finishing everyone still racing
+
+        Unfinished participants keep their last persisted progress and are
+        placed after the finishers, furthest along first.
+
+        Args:
+            room_code: Game room code
+            game_id: Game the deadline was set for (a rematch gets a new deadline)
+
+        Returns:
+            The new status, or None if the game is gone or no longer in progress
+        """
+        game = self.game_repo.get_by_room_code(room_code)
+        if not game or game.id != game_id:
+            return None
+        # Serialise with concurrent finishers, which update the same row
+        game = self.game_repo.lock(game.id)
+        if not game or game.status != "in_progress":
+            self.db.rollback()
+            return None
+        racing = sorted(
+            (p for p in self.participant_repo.get_by_game(game.id) if not p.is_finished),
+            key=lambda p: (-(p.progress or 0), p.id)
+        )
+        for participant in racing:
+            game.last_finish_position += 1
+            participant.is_finished = True
+            participant.finish_position = game.last_finish_position
+        game.finished_count += len(racing)
+        game.status = "finished"
+        game.finished_at = datetime.utcnow()
+        self.game_repo.update(game)
+        room_registry.update(room_code, status=game.status)
+        return game.status
+
+    def close_idle_game(self, room_code: str, game_id: int) -> bool:
+        """
+        Delete a lobby nobody started before its idle timeout
+
+        Returns:
+            True if the game was deleted, False if it is gone or no longer waiting
+        """
+        game = self.game_repo.get_by_room_code(room_code)
+        if not game or game.id != game_id or game.status != "waiting":
+            return False
+        # Participants go in the same transaction as the game
+        self.participant_repo.delete_by_game(game.id)
+        room_registry.invalidate(room_code)
+        return self.game_repo.delete(game.id)
+
+    def save_replay(self, game_id: int, data: bytes, duration_ms: int, event_count: int) -> Optional[RaceReplay]:
+        """
+        Store a finished race's packed timeline
+
+        Args:
+            game_id: Game the race belonged to
+            data: Replay blob (see realtime/replay.py)
+            duration_ms: Race length covered by the timeline
+            event_count: Number of recorded events
+
+        Returns:
+            The stored replay, or None if the game no longer exists
+        """
+        game = self.game_repo.get_by_id(game_id)
+        if not game:
+            return None
+        return self.replay_repo.create(RaceReplay(
+            game_id=game.id,
+            room_code=game.room_code,
+            snippet_id=game.snippet_id,
+            duration_ms=duration_ms,
+            event_count=event_count,
+            data=data
+        ))
@@ -0,0 +1,126 @@
+"""
+Replay service for listing stored races and streaming their playback
+"""
+import asyncio
+import json
+from typing import AsyncIterator, Callable, List
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from ..database import SessionLocal
+from ..repositories.game_repository import ReplayRepository
+from ..schemas.game import ReplaySummary
+from ..realtime.replay import EVENT, HEADER, ReplayDecoder, ReplayFormatError, read_header, read_roster
+
+# Events decoded per database read while streaming
+REPLAY_CHUNK_EVENTS = 512
+
+
+class ReplayService:
+    """Service layer for race replay business logic"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.replay_repo = ReplayRepository(db)
+
+    def list_replays(self, room_code: str, limit: int = 20) -> List[ReplaySummary]:
+        """
+        List the most recent replays recorded in a room
+
+        Args:
+            room_code: Game room code
+            limit: Maximum number of replays to return
+
+        Returns:
+            Replay summaries, newest first
+        """
+        replays = self.replay_repo.get_by_room_code(room_code, limit=limit)
+        return [ReplaySummary.model_validate(r) for r in replays]
+
+    def get_replay(self, replay_id: int) -> ReplaySummary:
+        """
+        Get a replay's metadata
+
+        Raises:
+            HTTPException: If replay not found
+        """
+        replay = self.replay_repo.get_summary(replay_id)
+        if not replay:
+            raise HTTPException(status_code=404, detail="Replay not found")
+        return ReplaySummary.model_validate(replay)
+
+    def open_replay(self, replay_id: int) -> dict:
+        """
+        Read and validate a replay's header and roster before streaming it
+
+        Raises:
+            HTTPException: 404 if replay not found, 422 if its blob is corrupt
+        """
+        self.get_replay(replay_id)
+        try:
+            return read_replay_head(replay_id, lambda *args: self.replay_repo.read_chunk(*args) or b"")
+        except ReplayFormatError as e:
+            raise HTTPException(status_code=422, detail=f"Corrupt replay: {e}")
+
+
+def read_replay_head(replay_id: int, read_chunk: Callable[[int, int, int], bytes]) -> dict:
+    """Decode a replay's header and roster; raises ReplayFormatError"""
+    header = read_header(read_chunk(replay_id, 0, HEADER.size))
+    roster = read_roster(read_chunk(replay_id, HEADER.size, header["roster_bytes"]), header["roster_count"])
+    return {**header, "roster": roster}
+
+
+def _read_chunk(replay_id: int, offset: int, size: int) -> bytes:
+    db = SessionLocal()
+    try:
+        return ReplayRepository(db).read_chunk(replay_id, offset, size) or b""
+    finally:
+        db.close()
+
+
+async def replay_stream(
+    replay_id: int,
+    head: dict,
+    speed: float = 1.0,
+    read_chunk=_read_chunk
+) -> AsyncIterator[str]:
+    """
+    Stream a stored replay as NDJSON, paced at `speed` times real time
+
+    `head` is the replay's header and roster from read_replay_head, checked
+    before the response starts so a missing or corrupt replay gets a proper
+    status. The first line describes the race (duration and roster); every
+    following line is one progress sample. The blob is read a chunk of
+    events at a time, each on its own short-lived session, so neither memory
+    nor a database connection is held for the whole playback. A blob that
+    ends early yields an ``error`` line instead of the closing ``end``.
+    """
+    header, roster = head, head["roster"]
+    yield json.dumps({
+        "type": "header",
+        "replay_id": replay_id,
+        "duration_ms": header["duration_ms"],
+        "event_count": header["event_count"],
+        "speed": speed,
+        "roster": roster
+    }) + "\n"
+
+    decoder = ReplayDecoder(roster)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    offset = HEADER.size + header["roster_bytes"]
+    remaining = header["event_count"]
+    while remaining > 0:
+        count = min(remaining, REPLAY_CHUNK_EVENTS)
+        chunk = await asyncio.to_thread(read_chunk, replay_id, offset, count * EVENT.size)
+        if len(chunk) != count * EVENT.size:
+            # Deleted or truncated mid-playback: don't pass it off as complete
+            yield json.dumps({"type": "error", "message": "Replay truncated"}) + "\n"
+            return
+        offset += len(chunk)
+        remaining -= count
+        for sample in decoder.feed(chunk):
+            delay = started + sample["t"] / 1000 / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield json.dumps({"type": "progress", **sample}) + "\n"
+    yield json.dumps({"type": "end", "duration_ms": header["duration_ms"]}) + "\n"
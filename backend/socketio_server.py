@@ -1,11 +1,36 @@
 import socketio
 import os
-from datetime import datetime
+import time
+from typing import Optional
+from fastapi import HTTPException
 
-from .database import SessionLocal
-from .models import Game, GameParticipant
+from .database import AsyncSessionLocal, SessionLocal
 from .services.game_service import GameService
-from .schemas.game import ParticipantProgress, ParticipantFinish
+from .schemas.game import ParticipantFinish
+from .realtime.race_state import race_state, RaceStateError
+from .realtime.write_behind import progress_writer
+from .realtime.broadcaster import ProgressBroadcaster, progress_frame
+from .realtime.executor import game_executor
+from .realtime.room_backend import create_room_backend
+from .realtime.affinity import room_affinity
+from .realtime.rate_limit import progress_limiter
+from .realtime.typing_stats import KeystrokeError
+from .realtime.replay import race_recorder
+from .realtime.reaper import game_reaper
+from .realtime.matchmaking import matchmaker, Match, MatchmakingError
+from .realtime.spectators import SpectatorFeed, spectator_channel
+from .realtime.outbound import OutboundQueues
+from .realtime.metrics import metrics, room_emits_total, instrument_socket_handlers
+from .realtime.room_registry import room_registry
+from .realtime.sessions import room_sessions, RESUME_GRACE_S
+from .realtime.timers import (
+    room_timers, TIMER_COUNTDOWN, TIMER_RACE_DEADLINE, TIMER_LOBBY_IDLE, TIMER_RESUME,
+    RACE_COUNTDOWN_S, RACE_TIME_LIMIT_S, RACE_DEADLINE_GRACE_S, LOBBY_IDLE_TIMEOUT_S
+)
+from .realtime.wire import (
+    ENCODING_BINARY, ENCODING_JSON, ENCODINGS, WireFormatError, progress_channel,
+    encode_progress_frame, encode_finish_frame, decode_client_progress
+)
 
 
 # Production CORS
@@ -19,15 +44,314 @@ allowed_origins = [
 # Optional Redis message queue for horizontal scaling
 redis_url = os.getenv("REDIS_URL")
 
+# How handlers run GameService work: "threadpool" (sync sessions on the
+# bounded executor's threads) or "async" (AsyncSession.run_sync)
+socket_db_mode = os.getenv("SOCKET_DB_MODE", "threadpool")
+
 # Create Socket.IO server (attach Redis if configured)
 sio = socketio.AsyncServer(
     async_mode='asgi',
     cors_allowed_origins=allowed_origins,
-    message_queue=redis_url if redis_url else None
+    client_manager=socketio.AsyncRedisManager(redis_url) if redis_url else None
 )
 
-# Store active connections: room_code -> {sid -> user_id}
-active_connections = {}
+# Room memberships: process-local, or shared through Redis across workers
+connections = create_room_backend(redis_url)
+
+
+# Sockets that negotiated the compact binary encoding on join_room
+binary_sids = set()
+
+# Sockets told to reconnect to another worker; their disconnect isn't a leave
+migrating_sids = set()
+
+
+def room_sids(room: str) -> list:
+    """Sockets of this worker in a Socket.IO room"""
+    return [sid for sid, _ in sio.manager.get_participants('/', room)]
+
+
+def transport_depth(sid: str) -> int:
+    """Packets waiting in a socket's Engine.IO send queue"""
+    try:
+        socket = sio.eio.sockets.get(sio.manager.eio_sid_from_sid(sid, '/'))
+    except Exception:
+        return 0
+    return socket.queue.qsize() if socket is not None else 0
+
+
+async def send_progress_to(sid: str, room_code: str, encoding: str, participants: list) -> None:
+    """Send one merged progress frame to one socket"""
+    if encoding == ENCODING_BINARY:
+        await sio.emit('progress_bin', encode_progress_frame(participants), to=sid)
+    else:
+        await sio.emit('progress_update', progress_frame(room_code, participants), to=sid)
+
+
+async def send_event_to(sid: str, event: str, data) -> None:
+    await sio.emit(event, data, to=sid)
+
+
+async def disconnect_overflowed(sid: str) -> None:
+    """Drop a client too far behind to catch up; it resyncs when it reconnects"""
+    print(f"Outbound queue of {sid} overflowed, disconnecting")
+    await sio.disconnect(sid)
+
+
+# Bounded per-connection queues for room broadcasts
+outbound = OutboundQueues(send_event_to, send_progress_to, transport_depth, on_overflow=disconnect_overflowed)
+
+
+def local_fanout(room_code: str) -> bool:
+    """
+    Whether every socket of a room is attached to this worker.
+
+    True without a shared backend, or when this worker owns the room under
+    room affinity; broadcasts may then go through the outbound queues.
+    """
+    if not connections.shared:
+        return True
+    return room_affinity.active and not room_affinity.migrating() and room_affinity.owns(room_code)
+
+
+async def emit_to_room(event: str, data, room_code: str, channel: str = None, skip_sid: str = None,
+                       supersede: bool = False) -> None:
+    """
+    Broadcast to a room (or one of its progress channels).
+
+    When this worker owns the room under room affinity, every socket of
+    the room is attached here and the message queue is skipped. Local
+    broadcasts go through each socket's outbound queue, which never drops
+    these events unless `supersede` is set: then a newer broadcast replaces
+    one still queued for a slow socket (periodic snapshots).
+    """
+    room_emits_total.inc(event)
+    if outbound.enabled and local_fanout(room_code):
+        key = (event, channel or room_code) if supersede else None
+        for sid in room_sids(channel or room_code):
+            if sid != skip_sid:
+                outbound.push_event(sid, event, data, key=key)
+        return
+    await sio.emit(event, data, room=channel or room_code, skip_sid=skip_sid,
+                   ignore_queue=not room_affinity.use_queue(room_code))
+
+
+def room_encodings(room_code: str) -> set:
+    """Encodings used by the sockets currently in a room"""
+    if connections.shared:
+        # Sockets on other workers may use either encoding
+        return set(ENCODINGS)
+    return {
+        ENCODING_BINARY if sid in binary_sids else ENCODING_JSON
+        for sid in connections.local_members(room_code)
+    }
+
+
+async def emit_progress_frame(room_code: str, participants: list) -> None:
+    """Send a merged progress frame to the room in every encoding in use"""
+    if outbound.enabled and local_fanout(room_code):
+        # Per socket, so slow clients coalesce instead of piling up frames
+        for encoding in ENCODINGS:
+            sids = room_sids(progress_channel(room_code, encoding))
+            if sids:
+                room_emits_total.inc('progress_bin' if encoding == ENCODING_BINARY else 'progress_update')
+            for sid in sids:
+                for participant in participants:
+                    outbound.push_progress(sid, room_code, encoding, participant)
+        return
+    encodings = room_encodings(room_code)
+    if ENCODING_JSON in encodings:
+        await emit_to_room('progress_update', progress_frame(room_code, participants),
+                           room_code, channel=progress_channel(room_code, ENCODING_JSON))
+    if ENCODING_BINARY in encodings:
+        await emit_to_room('progress_bin', encode_progress_frame(participants),
+                           room_code, channel=progress_channel(room_code, ENCODING_BINARY))
+
+
+# Merges progress changes and emits one frame per room per tick
+progress_broadcaster = ProgressBroadcaster(emit_progress_frame)
+
+
+def spectator_snapshot(room) -> dict:
+    """Whole-room state as sent to spectators"""
+    return {
+        'room_code': room.room_code,
+        'status': room.status,
+        'version': room.version,
+        'participants': room.participant_list()
+    }
+
+
+async def emit_spectator_snapshot(room_code: str) -> None:
+    """Send a room's spectators one aggregated snapshot of the whole room"""
+    room = race_state.get(room_code)
+    if room is None:
+        return
+    # Each snapshot is complete, so a slow spectator only needs the latest
+    await emit_to_room('spectator_snapshot', spectator_snapshot(room),
+                       room_code, channel=spectator_channel(room_code), supersede=True)
+
+
+# Downsampled fan-out tier for spectators
+spectator_feed = SpectatorFeed(emit_spectator_snapshot)
+
+
+def call_with_session(fn, *args):
+    """Run fn(GameService, *args) on a fresh synchronous session"""
+    db = SessionLocal()
+    try:
+        return fn(GameService(db), *args)
+    finally:
+        db.close()
+
+
+async def call_with_async_session(fn, *args):
+    """
+    Run fn(GameService, *args) on an AsyncSession.
+
+    The existing synchronous service code runs unchanged through
+    AsyncSession.run_sync, while the asyncio driver keeps every query off
+    the event loop.
+    """
+    async with AsyncSessionLocal() as session:
+        return await session.run_sync(lambda db: fn(GameService(db), *args))
+
+
+async def run_game_service(room_code: str, fn, *args, reject_when_full: bool = True):
+    """
+    Run GameService work for a room through the bounded executor.
+
+    Work for the same room never reorders; raises ExecutorSaturatedError
+    when too many jobs are already queued.
+    """
+    if socket_db_mode == "async":
+        return await game_executor.submit_async(
+            room_code, call_with_async_session, fn, *args, reject_when_full=reject_when_full
+        )
+    return await game_executor.submit(
+        room_code, call_with_session, fn, *args, reject_when_full=reject_when_full
+    )
+
+
+def error_message(e: Exception) -> str:
+    """Client-facing message for a failed service call"""
+    return e.detail if isinstance(e, HTTPException) else str(e)
+
+
+async def refresh_room_state(room_code: str):
+    """(Re)load a room's live race state from the database"""
+    snapshot = await run_game_service(room_code, GameService.get_race_snapshot, room_code)
+    if snapshot is None:
+        race_state.drop(room_code)
+        return None
+    return race_state.load(*snapshot)
+
+
+def room_delta(room_code: str, before) -> dict:
+    """
+    Version and changes of a room since `before` for a room-wide broadcast.
+
+    changes is None when clients can't catch up from the log and should
+    ask for a sync instead.
+    """
+    room = race_state.get(room_code)
+    if room is None:
+        return {'version': None, 'changes': None}
+    return {'version': room.version, 'changes': room.changes_since(before)}
+
+
+def touch_lobby(room_code: str) -> None:
+    """Restart a waiting room's idle timeout after activity in it"""
+    room = race_state.get(room_code)
+    if room and room.status == 'waiting':
+        room_timers.schedule(room_code, TIMER_LOBBY_IDLE, LOBBY_IDLE_TIMEOUT_S)
+
+
+def cancel_race_timers(room_code: str) -> None:
+    """Cancel a room's countdown and race deadline; players' resume timers keep running"""
+    room_timers.cancel(room_code, TIMER_COUNTDOWN)
+    room_timers.cancel(room_code, TIMER_RACE_DEADLINE)
+
+
+async def broadcast_leave_result(room_code: str, user_id, result: dict) -> None:
+    """Mirror a GameService.leave_game result into live state and notify the room"""
+    if result.get('game_deleted'):
+        race_state.drop(room_code)
+        progress_broadcaster.discard_room(room_code)
+        race_recorder.discard(room_code)
+        room_timers.cancel_room(room_code)
+        room_sessions.forget_room(room_code)
+        spectator_feed.discard_room(room_code)
+        for channel in (None, spectator_channel(room_code)):
+            await emit_to_room('game_deleted', {
+                'message': 'Game has been deleted'
+            }, room_code, channel=channel)
+        return
+    room_sessions.forget(room_code, user_id)
+    room_timers.cancel(room_code, TIMER_RESUME, user_id)
+    room = race_state.get(room_code)
+    before = room.version if room else None
+    race_state.remove_participant(room_code, user_id, result.get('new_host_id'))
+    touch_lobby(room_code)
+    spectator_feed.mark_dirty(room_code)
+    await emit_to_room('player_left', {
+        'user_id': user_id,
+        'participants': [p.model_dump() for p in result.get('remaining_participants', [])],
+        'new_host_id': result.get('new_host_id'),
+        'new_host_username': result.get('new_host_username'),
+        **room_delta(room_code, before)
+    }, room_code)
+
+
+def ordered_results(participants, host_user_id: int) -> list:
+    """Final standings payload, ordered by finish position"""
+    ordered = sorted(
+        [p for p in participants if p.finish_position is not None],
+        key=lambda x: x.finish_position
+    )
+    return [{
+        'user_id': p.user_id,
+        'username': p.username,
+        'wpm': float(p.wpm),
+        'accuracy': float(p.accuracy),
+        'position': p.finish_position,
+        'is_host': p.user_id == host_user_id
+    } for p in ordered]
+
+
+def load_results(svc: GameService, room_code: str):
+    """Final standings straight from the database"""
+    room = svc.get_room(room_code)
+    if not room:
+        return None
+    return ordered_results(svc.participant_repo.get_by_game(room.game_id), room.host_user_id)
+
+
+async def race_results(room_code: str) -> list:
+    """
+    Final standings of a finished race.
+
+    Built from the live room state, which already holds every finish this
+    worker applied; only falls back to the database when some finish
+    happened elsewhere (e.g. on another worker without room affinity).
+    """
+    room = race_state.get(room_code)
+    if room and all(p.is_finished and p.finish_position for p in room.participants.values()):
+        return ordered_results(room.participants.values(), room.host_user_id)
+    return await run_game_service(room_code, load_results, room_code, reject_when_full=False) or []
+
+
+def rematch_and_snapshot(svc: GameService, room_code: str, user_id: int):
+    """Reset a finished game for a rematch and return its fresh race snapshot"""
+    game = svc.game_repo.get_by_room_code(room_code)
+    if not game:
+        raise HTTPException(status_code=404, detail='Game not found')
+    if game.host_user_id != user_id:
+        raise HTTPException(status_code=403, detail='Only host can start rematch')
+    if game.status != 'finished':
+        raise HTTPException(status_code=400, detail='Can only rematch finished games')
+    svc.reset_game_for_rematch(room_code, user_id)
+    return svc.get_race_snapshot(room_code)
 
 
 @sio.event
@@ -36,38 +360,113 @@ async def connect(sid, environ):
     print(f"Client connected: {sid}")
 
 
+async def leave_after_disconnect(room_code: str, user_id) -> None:
+    """Run leave_game for a user whose last socket in the room went away"""
+    if await connections.user_connected(room_code, user_id):
+        # Still present through another socket (another tab or worker)
+        return
+    # Use service to perform leave + host transfer if needed
+    try:
+        # Cleanup is never rejected, even when the executor is saturated
+        result = await run_game_service(
+            room_code, GameService.leave_game, room_code, user_id, reject_when_full=False
+        )
+    except Exception as e:
+        # If service fails, emit minimal event and continue
+        await emit_to_room('error', {'message': str(e)}, room_code)
+        return
+    await broadcast_leave_result(room_code, user_id, result)
+
+
+async def release_membership(room_code: str, user_id) -> None:
+    """
+    A user's socket left the room without leave_room.
+
+    Users holding a resume token are only marked away; leave_game runs when
+    their TIMER_RESUME expires without a reconnect.
+    """
+    if (RESUME_GRACE_S <= 0 or race_state.get(room_code) is None
+            or not room_sessions.has_token(room_code, user_id)):
+        await leave_after_disconnect(room_code, user_id)
+        return
+    if await connections.user_connected(room_code, user_id):
+        return
+    room_sessions.mark_away(room_code, user_id)
+    room_timers.schedule(room_code, TIMER_RESUME, RESUME_GRACE_S, subject=user_id)
+    await emit_to_room('player_away', {
+        'user_id': user_id,
+        'grace_s': RESUME_GRACE_S
+    }, room_code)
+
+
+async def flush_progress() -> None:
+    """
+    Write buffered progress ahead of a finish or hand-off. A failed flush
+    (possibly over another room's rows) is already re-queued by the writer
+    and must not stop the caller.
+    """
+    try:
+        await progress_writer.flush()
+    except Exception as e:
+        print(f"Progress flush failed: {e}")
+
+
+async def release_purged(memberships: list) -> None:
+    """Sockets of workers that died without disconnecting never come back"""
+    for room_code, user_id in memberships:
+        await leave_after_disconnect(room_code, user_id)
+
+
+connections.on_purge = release_purged
+
+
+async def handle_rebalance(previous: tuple, current: tuple, dead: list) -> None:
+    """React to workers joining or leaving the affinity set"""
+    if connections.shared:
+        for node_id in dead:
+            await release_purged(await connections.purge_node(node_id))
+    # Send local sockets of rooms this worker no longer owns to the new owner
+    moving = [room_code for room_code in connections.local_rooms() if not room_affinity.owns(room_code)]
+    if moving:
+        # The new owner loads the rooms from the database: persist buffered progress first
+        await flush_progress()
+    for room_code in moving:
+        migrating_sids.update(connections.local_members(room_code))
+        await sio.emit('room_migrate', {
+            'room_code': room_code,
+            'endpoint': room_affinity.endpoint_for(room_code)
+        }, room=room_code, ignore_queue=True)
+
+
+room_affinity.on_rebalance = handle_rebalance
+
+
 @sio.event
 async def disconnect(sid):
     """Handle client disconnection and cleanup state"""
     print(f"Client disconnected: {sid}")
-    # Remove from active connections and update game state
-    for room_code in list(active_connections.keys()):
-        if sid in active_connections[room_code]:
-            user_id = active_connections[room_code][sid]
-            del active_connections[room_code][sid]
-            # Use service to perform leave + host transfer if needed
-            db = SessionLocal()
-            try:
-                svc = GameService(db)
-                try:
-                    result = svc.leave_game(room_code, user_id)
-                except Exception as e:
-                    # If service fails, emit minimal event and continue
-                    await sio.emit('error', {'message': str(e)}, room=room_code)
-                    continue
-                if result.get('game_deleted'):
-                    await sio.emit('game_deleted', {
-                        'message': 'Game has been deleted'
-                    }, room=room_code)
-                else:
-                    await sio.emit('player_left', {
-                        'user_id': user_id,
-                        'participants': result.get('remaining_participants', []),
-                        'new_host_id': result.get('new_host_id'),
-                        'new_host_username': result.get('new_host_username')
-                    }, room=room_code)
-            finally:
-                db.close()
+    binary_sids.discard(sid)
+    progress_limiter.forget(sid)
+    matchmaker.cancel_sid(sid)
+    spectator_feed.remove(sid)
+    outbound.forget(sid)
+    memberships = await connections.pop_sid(sid)
+    if sid in migrating_sids:
+        # Reconnecting to the room's new owner; keep the participant
+        migrating_sids.discard(sid)
+        return
+    # Hold each slot for the resume grace period
+    for room_code, user_id in memberships:
+        await release_membership(room_code, user_id)
+
+
+async def issue_session(sid, room_code: str, user_id) -> None:
+    """Send a joiner the token that resumes its membership after a disconnect"""
+    await sio.emit('session', {
+        'room_code': room_code,
+        'resume_token': room_sessions.issue(room_code, user_id),
+        'grace_s': RESUME_GRACE_S
+    }, to=sid)
 
 
 @sio.event
@@ -79,36 +478,87 @@ async def join_room(sid, data):
     if not room_code or not user_id:
         await sio.emit('error', {'message': 'Missing room_code or user_id'}, to=sid)
         return
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        await sio.emit('error', {'message': 'Invalid user_id'}, to=sid)
+        return
+    
+    # With room affinity, every socket of a room belongs on its owner
+    if room_affinity.active and not room_affinity.owns(room_code):
+        endpoint = room_affinity.endpoint_for(room_code)
+        if endpoint:
+            await sio.emit('room_migrate', {'room_code': room_code, 'endpoint': endpoint}, to=sid)
+            return
+    
+    # Progress/finish encoding negotiated per connection; JSON is the fallback
+    encoding = data.get('encoding', ENCODING_JSON)
+    if encoding not in ENCODINGS:
+        encoding = ENCODING_JSON
+    if encoding == ENCODING_BINARY:
+        binary_sids.add(sid)
+    else:
+        binary_sids.discard(sid)
     
-    # Join the Socket.IO room
+    # Join the Socket.IO room and its progress channel
     await sio.enter_room(sid, room_code)
+    await sio.enter_room(sid, progress_channel(room_code, encoding))
     
     # Track connection
-    if room_code not in active_connections:
-        active_connections[room_code] = {}
-    active_connections[room_code][sid] = user_id
+    await connections.add(room_code, sid, user_id)
     
-    # Get game state
-    db = SessionLocal()
+    # Back within the grace period; a valid resume token also skips the reload
+    room_timers.cancel(room_code, TIMER_RESUME, user_id)
+    was_away = room_sessions.back(room_code, user_id)
+    if room_sessions.resolve(data.get('resume_token')) == (room_code, user_id):
+        room = race_state.get(room_code)
+        if room and user_id in room.participants:
+            await sio.emit('room_sync', room.sync(data.get('since_version')), to=sid)
+            if was_away:
+                await emit_to_room('player_back', {'user_id': user_id}, room_code, skip_sid=sid)
+            await issue_session(sid, room_code, user_id)
+            return
+    
+    # Refresh live room state (the participant row was created via REST)
+    tracked = race_state.get(room_code)
+    before = tracked.version if tracked else None
     try:
-        game = db.query(Game).filter(Game.room_code == room_code).first()
-        if game:
-            participants = db.query(GameParticipant).filter(GameParticipant.game_id == game.id).all()
-            participant_data = [{
-                'user_id': p.user_id,
-                'username': p.username,
-                'progress': p.progress,
-                'wpm': float(p.wpm),
-                'is_finished': p.is_finished
-            } for p in participants]
-            
-            # Notify others that a player joined
-            await sio.emit('player_joined', {
+        room = await refresh_room_state(room_code)
+    except Exception as e:
+        await sio.emit('error', {'message': str(e)}, to=sid)
+        return
+    if room:
+        touch_lobby(room_code)
+        spectator_feed.mark_dirty(room_code)
+        # Full snapshot (or delta since the client's last version) only to the joiner
+        await sio.emit('room_sync', room.sync(data.get('since_version')), to=sid)
+        delta = room_delta(room_code, before)
+        if delta['changes'] != []:
+            # Others only hear what changed
+            await emit_to_room('player_joined', {
                 'user_id': user_id,
-                'participants': participant_data
-            }, room=room_code)
-    finally:
-        db.close()
+                **delta
+            }, room_code, skip_sid=sid)
+        if was_away:
+            await emit_to_room('player_back', {'user_id': user_id}, room_code, skip_sid=sid)
+        if user_id in room.participants:
+            await issue_session(sid, room_code, user_id)
+
+
+@sio.event
+async def sync_room(sid, data):
+    """Client noticed a version gap and asks for a delta or snapshot"""
+    room_code = data.get('room_code', '').upper()
+    if connections.user_of(room_code, sid) is None:
+        await sio.emit('error', {'message': 'Join the room before syncing'}, to=sid)
+        return
+    room = race_state.get(room_code)
+    if room is None:
+        try:
+            room = await refresh_room_state(room_code)
+        except Exception as e:
+            await sio.emit('error', {'message': str(e)}, to=sid)
+            return
+    if room:
+        await sio.emit('room_sync', room.sync(data.get('since_version')), to=sid)
 
 
 @sio.event
@@ -118,37 +568,24 @@ async def leave_room(sid, data):
     user_id = data.get('user_id')
     
     await sio.leave_room(sid, room_code)
+    for encoding in ENCODINGS:
+        await sio.leave_room(sid, progress_channel(room_code, encoding))
     
-    if room_code in active_connections and sid in active_connections[room_code]:
-        user_id = active_connections[room_code][sid]
-        del active_connections[room_code][sid]
+    tracked_user_id = await connections.remove(room_code, sid)
+    if tracked_user_id is not None:
+        user_id = tracked_user_id
     
+    if user_id is None:
+        # If user_id wasn't passed and not found, fall back to minimal event
+        await emit_to_room('player_left', {'sid': sid}, room_code)
+        return
     # Update game via service and broadcast detailed info
-    db = SessionLocal()
     try:
-        if user_id is None:
-            # If user_id wasn't passed and not found, fall back to minimal event
-            await sio.emit('player_left', {'sid': sid}, room=room_code)
-            return
-        svc = GameService(db)
-        try:
-            result = svc.leave_game(room_code, user_id)
-        except Exception as e:
-            await sio.emit('error', {'message': str(e)}, room=room_code)
-            return
-        if result.get('game_deleted'):
-            await sio.emit('game_deleted', {
-                'message': 'Game has been deleted'
-            }, room=room_code)
-        else:
-            await sio.emit('player_left', {
-                'user_id': user_id,
-                'participants': result.get('remaining_participants', []),
-                'new_host_id': result.get('new_host_id'),
-                'new_host_username': result.get('new_host_username')
-            }, room=room_code)
-    finally:
-        db.close()
+        result = await run_game_service(room_code, GameService.leave_game, room_code, user_id)
+    except Exception as e:
+        await emit_to_room('error', {'message': str(e)}, room_code)
+        return
+    await broadcast_leave_result(room_code, user_id, result)
 
 
 @sio.event
@@ -159,28 +596,27 @@ async def start_game(sid, data):
     if not room_code or not user_id:
         await sio.emit('error', {'message': 'Missing room_code or user_id'}, to=sid)
         return
-    db = SessionLocal()
     try:
-        svc = GameService(db)
-        game = svc.game_repo.get_by_room_code(room_code)
-        if not game:
-            await sio.emit('error', {'message': 'Game not found'}, to=sid)
-            return
-        if game.host_user_id != user_id:
-            await sio.emit('error', {'message': 'Only host can start'}, to=sid)
-            return
-        if game.status != 'waiting':
-            await sio.emit('error', {'message': 'Game already started or finished'}, to=sid)
-            return
-        game.status = 'in_progress'
-        game.started_at = datetime.utcnow()
-        svc.game_repo.update(game)
-        await sio.emit('game_started', {
-            'status': game.status,
-            'started_at': game.started_at.isoformat()
-        }, room=room_code)
-    finally:
-        db.close()
+        started = await run_game_service(room_code, GameService.start_game, room_code, user_id)
+    except Exception as e:
+        await sio.emit('error', {'message': error_message(e)}, to=sid)
+        return
+    if race_state.get(room_code) is None:
+        await refresh_room_state(room_code)
+    race_state.set_status(room_code, started['status'])
+    room = race_state.get(room_code)
+    if room:
+        race_recorder.start(room)
+    # The race deadline is armed once the countdown ends
+    room_timers.cancel(room_code, TIMER_LOBBY_IDLE)
+    room_timers.schedule(room_code, TIMER_COUNTDOWN, RACE_COUNTDOWN_S)
+    spectator_feed.mark_dirty(room_code)
+    await emit_to_room('game_started', {
+        'status': started['status'],
+        'started_at': started['started_at'],
+        'countdown_s': RACE_COUNTDOWN_S,
+        'time_limit_s': RACE_TIME_LIMIT_S
+    }, room_code)
 
 
 @sio.event
@@ -194,34 +630,87 @@ async def update_progress(sid, data):
     if not room_code or not user_id:
         await sio.emit('error', {'message': 'Missing room_code or user_id'}, to=sid)
         return
-    db = SessionLocal()
+    await apply_progress(sid, room_code, user_id, progress, wpm, accuracy)
+
+
+@sio.event
+async def progress_bin(sid, room_code, payload):
+    """Compact progress update: room code plus a fixed-width binary payload"""
+    room_code = (room_code or '').upper()
+    user_id = connections.user_of(room_code, sid)
+    if user_id is None:
+        await sio.emit('error', {'message': 'Join the room before sending progress'}, to=sid)
+        return
+    try:
+        progress, wpm, accuracy = decode_client_progress(payload)
+    except WireFormatError as e:
+        await sio.emit('error', {'message': str(e)}, to=sid)
+        return
+    await apply_progress(sid, room_code, user_id, progress, wpm, accuracy)
+
+
+@sio.event
+async def keystrokes(sid, data):
+    """Keystroke batch; the server derives progress, WPM and accuracy itself"""
+    room_code = data.get('room_code', '').upper()
+    user_id = connections.user_of(room_code, sid)
+    if user_id is None:
+        await sio.emit('error', {'message': 'Join the room before sending keystrokes'}, to=sid)
+        return
+    keys = data.get('keys')
+    # Charged per keystroke, so batches flushed together after a stall pass
+    if not await admit_progress(sid, room_code, keystrokes=len(keys) if isinstance(keys, list) else 1):
+        return
     try:
-        svc = GameService(db)
+        participant = race_state.apply_keystrokes(room_code, user_id, keys, time.monotonic())
+    except (RaceStateError, KeystrokeError) as e:
+        await sio.emit('error', {'message': str(e)}, to=sid)
+        return
+    commit_progress(room_code, participant)
+
+
+async def admit_progress(sid, room_code: str, keystrokes: Optional[int] = None) -> bool:
+    """Rate-limit a progress event (or keystroke batch) and make sure its room is tracked"""
+    # Flooding clients are dropped before any work is done
+    if keystrokes is None:
+        allowed = progress_limiter.allow(sid)
+    else:
+        allowed = progress_limiter.allow_keystrokes(sid, keystrokes)
+    if not allowed:
+        return False
+    if race_state.get(room_code) is None:
+        # Room not tracked yet (e.g. after a restart): load it once
         try:
-            svc.update_progress(ParticipantProgress(
-                room_code=room_code,
-                user_id=user_id,
-                progress=progress,
-                wpm=wpm,
-                accuracy=accuracy
-            ))
+            await refresh_room_state(room_code)
         except Exception as e:
             await sio.emit('error', {'message': str(e)}, to=sid)
-            return
-        # Fetch participant for broadcast (ensures clamped values)
-        participant = svc.participant_repo.get_by_game_and_user(
-            svc.game_repo.get_by_room_code(room_code).id, user_id
-        )
-        if participant:
-            await sio.emit('progress_update', {
-                'user_id': user_id,
-                'username': participant.username,
-                'progress': participant.progress,
-                'wpm': float(participant.wpm),
-                'accuracy': float(participant.accuracy)
-            }, room=room_code)
-    finally:
-        db.close()
+            return False
+    return True
+
+
+def commit_progress(room_code: str, participant) -> None:
+    """Queue a changed participant for persistence and broadcast"""
+    if participant is None:
+        # Same values as the last accepted update: nothing to persist or send
+        progress_limiter.record_redundant()
+        return
+    progress_limiter.record_accepted()
+    progress_writer.mark_dirty(participant)
+    progress_broadcaster.mark_dirty(room_code, participant)
+    spectator_feed.mark_dirty(room_code)
+    race_recorder.record(room_code, participant)
+
+
+async def apply_progress(sid, room_code: str, user_id: int, progress, wpm, accuracy) -> None:
+    """Apply a progress update to live state and queue it for persistence and broadcast"""
+    if not await admit_progress(sid, room_code):
+        return
+    try:
+        participant = race_state.update_progress(room_code, user_id, progress, wpm, accuracy)
+    except RaceStateError as e:
+        await sio.emit('error', {'message': str(e)}, to=sid)
+        return
+    commit_progress(room_code, participant)
 
 
 @sio.event
@@ -234,50 +723,66 @@ async def finish_race(sid, data):
     if not room_code or not user_id:
         await sio.emit('error', {'message': 'Missing room_code or user_id'}, to=sid)
         return
-    db = SessionLocal()
+    # Clients that sent keystrokes get the server-computed result
+    typed = race_state.typing_result(room_code, user_id, time.monotonic())
+    if typed is not None:
+        wpm, accuracy = typed
+    # Persist buffered progress before the final result is written
+    await flush_progress()
     try:
-        svc = GameService(db)
-        game = svc.game_repo.get_by_room_code(room_code)
-        if not game:
-            return
-        try:
-            resp = svc.finish_participant(ParticipantFinish(
-                room_code=room_code,
-                user_id=user_id,
-                wpm=wpm,
-                accuracy=accuracy
-            ))
-        except Exception as e:
-            await sio.emit('error', {'message': str(e)}, to=sid)
-            return
-        participant = svc.participant_repo.get_by_game_and_user(game.id, user_id)
-        if participant:
-            await sio.emit('player_finished', {
-                'user_id': user_id,
-                'username': participant.username,
-                'wpm': float(participant.wpm),
-                'accuracy': float(participant.accuracy),
-                'position': participant.finish_position
-            }, room=room_code)
-        # If game finished, broadcast ordered results
-        game = svc.game_repo.get_by_room_code(room_code)
-        if game.status == 'finished':
-            all_participants = svc.participant_repo.get_by_game(game.id)
-            ordered = sorted(
-                [p for p in all_participants if p.finish_position is not None],
-                key=lambda x: x.finish_position
-            )
-            results = [{
-                'user_id': p.user_id,
-                'username': p.username,
-                'wpm': float(p.wpm),
-                'accuracy': float(p.accuracy),
-                'position': p.finish_position,
-                'is_host': p.user_id == game.host_user_id
-            } for p in ordered]
-            await sio.emit('game_finished', {'results': results}, room=room_code)
-    finally:
-        db.close()
+        outcome = await run_game_service(room_code, GameService.finish_participant, ParticipantFinish(
+            room_code=room_code,
+            user_id=user_id,
+            wpm=wpm,
+            accuracy=accuracy
+        ))
+    except Exception as e:
+        await sio.emit('error', {'message': error_message(e)}, to=sid)
+        return
+    participant = outcome['participant']
+    state = race_state.apply_finish(room_code, participant)
+    if state is not None:
+        race_recorder.record(room_code, state)
+    spectator_feed.mark_dirty(room_code)
+    # Deliver pending progress before the finish event
+    await progress_broadcaster.flush_room(room_code)
+    encodings = room_encodings(room_code)
+    if ENCODING_JSON in encodings or state is None:
+        await emit_to_room('player_finished', {
+            'user_id': user_id,
+            'username': participant.username,
+            'wpm': float(participant.wpm),
+            'accuracy': float(participant.accuracy),
+            'position': participant.finish_position
+        }, room_code, channel=progress_channel(room_code, ENCODING_JSON))
+    if ENCODING_BINARY in encodings and state is not None:
+        await emit_to_room('player_finished_bin', encode_finish_frame(state),
+                           room_code, channel=progress_channel(room_code, ENCODING_BINARY))
+    # If game finished, broadcast ordered results
+    if outcome['status'] == 'finished':
+        race_state.set_status(room_code, outcome['status'])
+        cancel_race_timers(room_code)
+        spectator_feed.mark_dirty(room_code)
+        results = await race_results(room_code)
+        await emit_to_room('game_finished', {'results': results}, room_code)
+        await save_replay(room_code, results)
+
+
+async def save_replay(room_code: str, results: list) -> None:
+    """Persist a finished race's recorded timeline as a single replay blob"""
+    buffer = race_recorder.finish(room_code)
+    if buffer is None or not len(buffer):
+        return
+    positions = {r['user_id']: r['position'] for r in results}
+    try:
+        await run_game_service(
+            room_code, GameService.save_replay, buffer.game_id,
+            buffer.to_blob(positions), buffer.duration_ms, len(buffer),
+            reject_when_full=False
+        )
+    except Exception as e:
+        # Losing a replay must never affect the race itself
+        print(f"Failed to save replay for room {room_code}: {e}")
 
 
 @sio.event
@@ -290,36 +795,230 @@ async def rematch_game(sid, data):
         await sio.emit('error', {'message': 'Missing room_code or user_id'}, to=sid)
         return
     
-    db = SessionLocal()
+    # Reset the game, dropping progress still buffered from the last race
+    room = race_state.get(room_code)
     try:
-        svc = GameService(db)
-        game = svc.game_repo.get_by_room_code(room_code)
-        
-        if not game:
-            await sio.emit('error', {'message': 'Game not found'}, to=sid)
-            return
-        
-        if game.host_user_id != user_id:
-            await sio.emit('error', {'message': 'Only host can start rematch'}, to=sid)
+        snapshot = await run_game_service(room_code, rematch_and_snapshot, room_code, user_id)
+    except Exception as e:
+        await sio.emit('error', {'message': error_message(e)}, to=sid)
+        return
+    if room:
+        progress_writer.discard(p.participant_id for p in room.participants.values())
+    progress_broadcaster.discard_room(room_code)
+    race_recorder.discard(room_code)
+    cancel_race_timers(room_code)
+    if snapshot:
+        race_state.load(*snapshot)
+        touch_lobby(room_code)
+    spectator_feed.mark_dirty(room_code)
+    
+    # Notify all players in the room
+    await emit_to_room('rematch_started', {
+        'room_code': room_code,
+        'message': 'Host started a rematch!',
+        **room_delta(room_code, room.version if room else None)
+    }, room_code)
+
+
+async def force_finish_race(room_code: str, game_id: int) -> None:
+    """Finish a race whose deadline passed and announce the standings"""
+    # Rank unfinished racers by their latest progress
+    await flush_progress()
+    status = await run_game_service(
+        room_code, GameService.force_finish_game, room_code, game_id, reject_when_full=False
+    )
+    if status is None:
+        return
+    await refresh_room_state(room_code)
+    await progress_broadcaster.flush_room(room_code)
+    results = await race_results(room_code)
+    await emit_to_room('game_finished', {'results': results, 'timed_out': True}, room_code)
+    spectator_feed.mark_dirty(room_code)
+    await save_replay(room_code, results)
+
+
+async def close_idle_lobby(room_code: str, game_id: int) -> None:
+    """Delete a waiting room nobody started before its idle timeout"""
+    deleted = await run_game_service(
+        room_code, GameService.close_idle_game, room_code, game_id, reject_when_full=False
+    )
+    if deleted:
+        await broadcast_leave_result(room_code, None, {'game_deleted': True})
+
+
+async def handle_room_timer(room_code: str, kind: str, subject) -> None:
+    """React to a room's countdown, race deadline, lobby idle or resume timer firing"""
+    if kind == TIMER_COUNTDOWN:
+        room_timers.schedule(room_code, TIMER_RACE_DEADLINE, RACE_TIME_LIMIT_S + RACE_DEADLINE_GRACE_S)
+        return
+    if kind == TIMER_RESUME:
+        # The away player didn't come back in time
+        if room_sessions.expire(room_code, subject):
+            await leave_after_disconnect(room_code, subject)
+        return
+    room = race_state.get(room_code) or await refresh_room_state(room_code)
+    if room is None:
+        return
+    if kind == TIMER_RACE_DEADLINE:
+        await force_finish_race(room_code, room.game_id)
+    elif kind == TIMER_LOBBY_IDLE:
+        await close_idle_lobby(room_code, room.game_id)
+
+
+room_timers.on_expire = handle_room_timer
+
+
+async def forget_reaped_rooms(room_codes: list) -> None:
+    """Drop process-local state of games the reaper deleted"""
+    for room_code in room_codes:
+        race_state.drop(room_code)
+        progress_broadcaster.discard_room(room_code)
+        race_recorder.discard(room_code)
+        room_timers.cancel_room(room_code)
+        room_sessions.forget_room(room_code)
+        room_registry.invalidate(room_code)
+
+
+# Rooms with sockets attached here are live and never reaped
+game_reaper.live_rooms = connections.local_rooms
+game_reaper.on_reaped = forget_reaped_rooms
+
+
+@sio.event
+async def spectate(sid, data):
+    """Watch a room without taking part; snapshots arrive at SPECTATOR_HZ"""
+    room_code = data.get('room_code', '').upper()
+    if not room_code:
+        await sio.emit('error', {'message': 'Missing room_code'}, to=sid)
+        return
+    if room_affinity.active and not room_affinity.owns(room_code):
+        endpoint = room_affinity.endpoint_for(room_code)
+        if endpoint:
+            await sio.emit('room_migrate', {'room_code': room_code, 'endpoint': endpoint}, to=sid)
             return
-        
-        if game.status != 'finished':
-            await sio.emit('error', {'message': 'Can only rematch finished games'}, to=sid)
+    room = race_state.get(room_code)
+    if room is None:
+        try:
+            room = await refresh_room_state(room_code)
+        except Exception as e:
+            await sio.emit('error', {'message': str(e)}, to=sid)
             return
-        
-        # Reset the game
-        result = svc.reset_game_for_rematch(room_code, user_id)
-        
-        # Notify all players in the room
-        await sio.emit('rematch_started', {
-            'room_code': room_code,
-            'message': 'Host started a rematch!'
-        }, room=room_code)
-        
-    except Exception as e:
+    if room is None:
+        await sio.emit('error', {'message': 'Game not found'}, to=sid)
+        return
+    previous = spectator_feed.add(room_code, sid)
+    if previous and previous != room_code:
+        await sio.leave_room(sid, spectator_channel(previous))
+    await sio.enter_room(sid, spectator_channel(room_code))
+    await sio.emit('spectator_snapshot', spectator_snapshot(room), to=sid)
+
+
+@sio.event
+async def stop_spectating(sid, data=None):
+    """Stop watching a room"""
+    room_code = spectator_feed.remove(sid)
+    if room_code:
+        await sio.leave_room(sid, spectator_channel(room_code))
+
+
+@sio.event
+async def find_match(sid, data):
+    """Queue for a quick-play race in a language (and optional skill band)"""
+    user_id = data.get('user_id')
+    if not user_id:
+        await sio.emit('error', {'message': 'Missing user_id'}, to=sid)
+        return
+    try:
+        ticket = matchmaker.enqueue(user_id, sid, data.get('language'), data.get('skill_band'))
+    except MatchmakingError as e:
         await sio.emit('error', {'message': str(e)}, to=sid)
-    finally:
-        db.close()
+        return
+    await sio.emit('match_queued', {
+        'language': ticket.language,
+        'skill_band': ticket.skill_band,
+        'waiting': matchmaker.waiting(ticket.language, ticket.skill_band)
+    }, to=sid)
+
+
+@sio.event
+async def cancel_match(sid, data):
+    """Leave the quick-play queue"""
+    user_id = data.get('user_id')
+    if user_id is not None:
+        matchmaker.cancel(user_id)
+    await sio.emit('match_cancelled', {}, to=sid)
+
+
+async def start_match(match: Match) -> None:
+    """Create the room for a matched group and send everyone to it"""
+    try:
+        # Rooms for the same language are created in order, apart from races
+        game = await run_game_service(
+            f"match:{match.language}", GameService.create_match_game,
+            match.user_ids, match.language, matchmaker.max_players, reject_when_full=False
+        )
+    except Exception as e:
+        for ticket in match.tickets:
+            await sio.emit('match_failed', {'message': error_message(e)}, to=ticket.sid)
+        return
+    for ticket in match.tickets:
+        await sio.emit('match_found', {
+            'room_code': game.room_code,
+            'game_id': game.id,
+            'language': match.language,
+            'players': len(match.tickets)
+        }, to=ticket.sid)
+
+
+matchmaker.on_match = start_match
+
+
+# Per-event latency for every handler above; register new handlers before this
+instrument_socket_handlers(sio)
+metrics.gauge("coderacer_active_rooms", "Rooms with live race state on this worker", lambda: len(race_state))
+metrics.gauge("coderacer_connected_sockets", "Socket.IO connections on this worker", lambda: len(sio.eio.sockets))
+metrics.gauge("coderacer_cached_rooms", "Rooms in the metadata registry", lambda: len(room_registry))
+metrics.gauge("coderacer_executor_pending", "GameService jobs queued or running", lambda: game_executor.pending)
+metrics.gauge("coderacer_outbound_queue_depth", "Messages waiting in a socket's outbound queue",
+              lambda: {(sid,): depth for sid, depth in outbound.depths().items()}, ("sid",))
+metrics.gauge("coderacer_outbound_dropped", "Outbound messages dropped for a connected socket",
+              lambda: {(sid,): dropped for sid, dropped in outbound.dropped_by_sid.items()}, ("sid",))
+metrics.counter_from(
+    "coderacer_progress_events_total", "Progress events and keystroke batches by admission result",
+    lambda: {
+        ("accepted",): progress_limiter.accepted,
+        ("rate_limited",): progress_limiter.rate_limited,
+        ("redundant",): progress_limiter.redundant
+    }, ("result",)
+)
+metrics.counter_from(
+    "coderacer_executor_seconds_total", "Time GameService jobs spent queued and executing",
+    lambda: {
+        ("queue_wait",): game_executor.queue_wait.total_ms / 1000,
+        ("execution",): game_executor.execution.total_ms / 1000
+    }, ("phase",)
+)
+metrics.counter_from(
+    "coderacer_executor_jobs_total", "GameService jobs timed per phase",
+    lambda: {("queue_wait",): game_executor.queue_wait.count, ("execution",): game_executor.execution.count},
+    ("phase",)
+)
+metrics.gauge(
+    "coderacer_executor_max_seconds", "Longest GameService queue wait and execution so far",
+    lambda: {
+        ("queue_wait",): game_executor.queue_wait.max_ms / 1000,
+        ("execution",): game_executor.execution.max_ms / 1000
+    }, ("phase",)
+)
+metrics.counter_from(
+    "coderacer_progress_writes_total", "Progress rows coalesced in or flushed by the write-behind",
+    lambda: {("coalesced",): progress_writer.coalesced, ("flushed",): progress_writer.flushed},
+    ("result",)
+)
+metrics.counter_from("coderacer_progress_flush_failures_total", "Failed write-behind flushes",
+                     lambda: progress_writer.failed_flushes)
+metrics.gauge("coderacer_outbound_overflows", "Sockets disconnected for overflowing their outbound queue",
+              lambda: outbound.overflowed)
 
 
 # Create ASGI app
@@ -0,0 +1,116 @@
+"""
+Tests for room-to-worker affinity in realtime/affinity.py
+"""
+import asyncio
+import pytest
+from backend.realtime.affinity import AffinityRouter, owner_of
+
+
+def make_router(server, node_id, clock, **kwargs):
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    return AffinityRouter(
+        node_id, f"https://{node_id}.example", client, enabled=True,
+        ttl_s=15, grace_s=30, prefix="test", clock=clock, **kwargs
+    )
+
+
+def test_owner_is_deterministic_and_moves_few_rooms():
+    rooms = [f"ROOM{i:02d}" for i in range(200)]
+    three = ["a", "b", "c"]
+    before = {room: owner_of(room, three) for room in rooms}
+
+    assert before == {room: owner_of(room, reversed(three)) for room in rooms}
+    assert set(before.values()) == set(three)
+
+    after = {room: owner_of(room, three + ["d"]) for room in rooms}
+    moved = [room for room in rooms if before[room] != after[room]]
+    # Only rooms that now hash to the new worker move
+    assert all(after[room] == "d" for room in moved)
+    assert 0 < len(moved) < len(rooms) / 2
+
+
+def test_disabled_router_always_uses_queue():
+    router = AffinityRouter("solo", None, redis=None, enabled=True)
+
+    assert router.active is False
+    assert router.use_queue("ROOM01") is True
+    assert router.stats()["queued_emits"] == 0
+    assert asyncio.run(router.refresh()) is False
+
+
+def test_workers_discover_each_other_and_rebalance(clock):
+    async def scenario():
+        fakeredis = pytest.importorskip("fakeredis")
+        server = fakeredis.FakeServer()
+        calls = []
+        a = make_router(server, "node-a", clock)
+
+        async def on_rebalance(previous, current, dead):
+            calls.append((previous, current, dead))
+        a.on_rebalance = on_rebalance
+
+        await a.refresh()
+        assert a.nodes == ("node-a",)
+        b = make_router(server, "node-b", clock)
+        await b.refresh()
+        assert await a.refresh() is True
+
+        assert a.nodes == b.nodes == ("node-a", "node-b")
+        assert calls[-1] == (("node-a",), ("node-a", "node-b"), [])
+        room = next(r for r in (f"R{i}" for i in range(100)) if a.owner(r) == "node-b")
+        assert a.endpoint_for(room) == "https://node-b.example"
+        assert a.owns(room) is False and b.owns(room) is True
+
+    asyncio.run(scenario())
+
+
+def test_owner_skips_queue_only_after_migration_grace(clock):
+    async def scenario():
+        fakeredis = pytest.importorskip("fakeredis")
+        server = fakeredis.FakeServer()
+        a = make_router(server, "node-a", clock)
+        b = make_router(server, "node-b", clock)
+        await a.refresh()
+        await b.refresh()
+        await a.refresh()
+        room = next(r for r in (f"R{i}" for i in range(100)) if a.owns(r))
+
+        assert a.use_queue(room) is True
+        clock.now += 31
+        assert a.use_queue(room) is False
+        other = next(r for r in (f"R{i}" for i in range(100)) if not a.owns(r))
+        assert a.use_queue(other) is True
+
+    asyncio.run(scenario())
+
+
+def test_dead_worker_is_claimed_by_exactly_one_survivor(clock):
+    async def scenario():
+        fakeredis = pytest.importorskip("fakeredis")
+        server = fakeredis.FakeServer()
+        a = make_router(server, "node-a", clock)
+        b = make_router(server, "node-b", clock)
+        c = make_router(server, "node-c", clock)
+        for router in (a, b, c):
+            await router.refresh()
+
+        claimed = []
+
+        async def on_rebalance(previous, current, dead):
+            claimed.extend(dead)
+        a.on_rebalance = b.on_rebalance = on_rebalance
+
+        # node-c stops heartbeating while the others keep going
+        clock.now += 10
+        await a.refresh()
+        await b.refresh()
+        assert claimed == []
+        clock.now += 10
+        await a.refresh()
+        await b.refresh()
+
+        assert claimed == ["node-c"]
+        assert a.nodes == b.nodes == ("node-a", "node-b")
+
+    asyncio.run(scenario())
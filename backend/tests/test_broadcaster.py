@@ -0,0 +1,51 @@
+"""
+Tests for tick-based progress broadcasting in realtime/broadcaster.py
+"""
+import asyncio
+from backend.realtime.broadcaster import ProgressBroadcaster, progress_frame
+from backend.realtime.race_state import ParticipantState
+
+
+def make_broadcaster():
+    frames = []
+
+    async def emit(room_code, participants):
+        frames.append((room_code, progress_frame(room_code, participants)))
+
+    return ProgressBroadcaster(emit, tick_hz=20), frames
+
+
+def test_tick_merges_changes_into_one_frame_per_room():
+    broadcaster, frames = make_broadcaster()
+    alice = ParticipantState(participant_id=1, user_id=1, username="alice")
+    bob = ParticipantState(participant_id=2, user_id=2, username="bob")
+    carol = ParticipantState(participant_id=3, user_id=3, username="carol")
+
+    for progress in range(10):
+        alice.progress = progress
+        broadcaster.mark_dirty("ROOM01", alice)
+    broadcaster.mark_dirty("ROOM01", bob)
+    broadcaster.mark_dirty("ROOM02", carol)
+    sent = asyncio.run(broadcaster.tick())
+
+    assert sent == 2
+    by_room = dict(frames)
+    assert [u["user_id"] for u in by_room["ROOM01"]["updates"]] == [1, 2]
+    assert by_room["ROOM01"]["updates"][0]["progress"] == 9
+    assert broadcaster.stats()["changes"] == 12
+
+
+def test_idle_tick_emits_nothing():
+    broadcaster, frames = make_broadcaster()
+
+    assert asyncio.run(broadcaster.tick()) == 0
+    assert frames == []
+
+
+def test_flush_room_emits_immediately_and_clears_pending():
+    broadcaster, frames = make_broadcaster()
+    broadcaster.mark_dirty("ROOM01", ParticipantState(participant_id=1, user_id=1, username="alice"))
+
+    assert asyncio.run(broadcaster.flush_room("ROOM01")) is True
+    assert asyncio.run(broadcaster.tick()) == 0
+    assert len(frames) == 1
@@ -0,0 +1,39 @@
+"""
+Tests for the bidirectional connection registry in realtime/connections.py
+"""
+from backend.realtime.connections import ConnectionRegistry
+
+
+def test_add_indexes_both_directions():
+    registry = ConnectionRegistry()
+    registry.add("ROOM01", "sid-a", 1)
+    registry.add("ROOM02", "sid-a", 1)
+    registry.add("ROOM01", "sid-b", 2)
+
+    assert registry.members("ROOM01") == {"sid-a": 1, "sid-b": 2}
+    assert registry.rooms_of("sid-a") == {"ROOM01", "ROOM02"}
+    assert registry.connection_count() == 2
+
+
+def test_remove_cleans_up_empty_entries():
+    registry = ConnectionRegistry()
+    registry.add("ROOM01", "sid-a", 1)
+
+    assert registry.remove("ROOM01", "sid-a") == 1
+    assert registry.remove("ROOM01", "sid-a") is None
+    assert len(registry) == 0
+    assert registry.rooms_of("sid-a") == set()
+
+
+def test_pop_sid_returns_only_that_sockets_memberships():
+    registry = ConnectionRegistry()
+    registry.add("ROOM01", "sid-a", 1)
+    registry.add("ROOM02", "sid-a", 1)
+    registry.add("ROOM01", "sid-b", 2)
+
+    removed = registry.pop_sid("sid-a")
+
+    assert sorted(removed) == [("ROOM01", 1), ("ROOM02", 1)]
+    assert registry.members("ROOM01") == {"sid-b": 2}
+    assert registry.members("ROOM02") == {}
+    assert registry.pop_sid("sid-a") == []
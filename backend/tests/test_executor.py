@@ -0,0 +1,69 @@
+"""
+Tests for the per-room ordered executor in realtime/executor.py
+"""
+import asyncio
+import threading
+import time
+import pytest
+from backend.realtime.executor import RoomExecutor, ExecutorSaturatedError
+
+
+def test_jobs_for_same_room_run_in_submission_order():
+    executor = RoomExecutor(max_workers=4, max_pending=100)
+    order = []
+
+    def job(i):
+        # Earlier jobs are slower, so any reordering would show up
+        time.sleep(0.002 * (10 - i))
+        order.append(i)
+        return i
+
+    async def main():
+        return await asyncio.gather(*(executor.submit("ROOM01", job, i) for i in range(10)))
+
+    results = asyncio.run(main())
+    executor.shutdown()
+
+    assert results == list(range(10))
+    assert order == list(range(10))
+
+
+def test_jobs_for_different_rooms_run_in_parallel():
+    executor = RoomExecutor(max_workers=2, max_pending=100)
+    barrier = threading.Barrier(2, timeout=2)
+
+    async def main():
+        # Both jobs must be running at once for the barrier to release
+        await asyncio.gather(
+            executor.submit("ROOM01", barrier.wait),
+            executor.submit("ROOM02", barrier.wait)
+        )
+
+    asyncio.run(main())
+    executor.shutdown()
+
+
+def test_submissions_beyond_limit_are_rejected():
+    executor = RoomExecutor(max_workers=1, max_pending=2)
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(executor.submit("ROOM01", release.wait, 2))
+        second = asyncio.ensure_future(executor.submit("ROOM02", release.wait, 2))
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorSaturatedError):
+            await executor.submit("ROOM03", lambda: None)
+        # Cleanup work may bypass the limit
+        forced = asyncio.ensure_future(executor.submit("ROOM03", lambda: "ok", reject_when_full=False))
+        release.set()
+        return await asyncio.gather(first, second, forced)
+
+    results = asyncio.run(main())
+    executor.shutdown()
+
+    assert results[2] == "ok"
+    stats = executor.stats()
+    assert stats["rejected"] == 1
+    assert stats["pending"] == 0
+    assert stats["active_rooms"] == 0
+    assert stats["execution"]["count"] == 3
@@ -0,0 +1,79 @@
+"""
+Concurrency tests for finish position sequencing in GameService.finish_participant
+"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+from backend.models import Game, GameParticipant
+from backend.schemas.game import ParticipantFinish
+from backend.services.game_service import GameService
+
+RACERS = 12
+
+
+def seed_race(db_session, make_user, snippet) -> Game:
+    users = [make_user(f"racer{i}") for i in range(RACERS)]
+    game = Game(room_code="SEQ001", host_user_id=users[0].id, snippet_id=snippet.id,
+                status="in_progress", max_players=RACERS, player_count=RACERS)
+    db_session.add(game)
+    db_session.commit()
+    db_session.add_all([GameParticipant(game_id=game.id, user_id=u.id, username=u.username) for u in users])
+    db_session.commit()
+    return game
+
+
+def test_simultaneous_finishes_get_unique_contiguous_positions(db_session, make_user, snippet):
+    game = seed_race(db_session, make_user, snippet)
+    user_ids = [p.user_id for p in db_session.query(GameParticipant).filter_by(game_id=game.id)]
+    make_session = sessionmaker(bind=db_session.get_bind())
+    start = Barrier(len(user_ids))
+
+    def finish(user_id: int) -> dict:
+        db = make_session()
+        try:
+            start.wait()
+            return GameService(db).finish_participant(ParticipantFinish(
+                room_code="SEQ001", user_id=user_id, wpm=50.0, accuracy=95.0
+            ))
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=len(user_ids)) as pool:
+        results = list(pool.map(finish, user_ids))
+
+    positions = sorted(r["finish_position"] for r in results)
+    assert positions == list(range(1, RACERS + 1))
+    # Exactly one finisher saw the game flip to finished
+    assert [r["status"] for r in results].count("finished") == 1
+
+    db_session.expire_all()
+    stored = sorted(p.finish_position for p in db_session.query(GameParticipant).filter_by(game_id=game.id))
+    assert stored == positions
+    assert db_session.get(Game, game.id).status == "finished"
+
+
+def test_a_participant_is_counted_once_when_finishing_twice(db_session, make_user, snippet):
+    game = seed_race(db_session, make_user, snippet)
+    user_id = db_session.query(GameParticipant).filter_by(game_id=game.id).first().user_id
+    make_session = sessionmaker(bind=db_session.get_bind())
+    finish = ParticipantFinish(room_code="SEQ001", user_id=user_id, wpm=50.0, accuracy=95.0)
+    rest, socket = make_session(), make_session()
+    try:
+        # The socket path has already read the participant as unfinished
+        late = GameService(socket)
+        stale = late.participant_repo.get_by_game_and_user(game.id, user_id)
+        assert GameService(rest).finish_participant(finish)["finish_position"] == 1
+        assert stale.is_finished is False
+
+        with pytest.raises(HTTPException) as exc:
+            late.finish_participant(finish)
+        assert exc.value.status_code == 400
+    finally:
+        rest.close()
+        socket.close()
+
+    db_session.expire_all()
+    stored = db_session.get(Game, game.id)
+    assert (stored.finished_count, stored.last_finish_position) == (1, 1)
@@ -2,7 +2,10 @@
 Integration tests for multiplayer game endpoints in routes/games.py
 """
 from fastapi import status
+from sqlalchemy import event
 from backend.models import Language, Snippet, GameParticipant
+from backend.services.game_service import GameService
+from backend.realtime.room_registry import room_registry
 
 
 def signup_user(client, username: str, email: str, password: str = "testpass123") -> int:
@@ -148,3 +151,100 @@ def test_start_game_transitions_to_in_progress(client, db_session):
     # Fetch details to verify change
     details = client.get(f"/games/{room_code}").json()
     assert details["game"]["status"] == "in_progress"
+
+
+def test_finish_counters_flip_status_on_last_finisher(client, db_session):
+    seed_snippet(db_session)
+    host_id = signup_user(client, "fin_host", "fin_host@example.com")
+    guest_id = signup_user(client, "fin_guest", "fin_guest@example.com")
+    room_code = client.post("/games/create", json={"user_id": host_id}).json()["room_code"]
+    client.post("/games/join", json={"user_id": guest_id, "room_code": room_code})
+    client.post(f"/games/{room_code}/start")
+
+    first = client.post("/games/finish", json={"room_code": room_code, "user_id": guest_id, "wpm": 80, "accuracy": 99})
+    assert first.json()["finish_position"] == 1
+    assert first.json()["status"] == "in_progress"
+
+    second = client.post("/games/finish", json={"room_code": room_code, "user_id": host_id, "wpm": 60, "accuracy": 95})
+    assert second.json()["finish_position"] == 2
+    assert second.json()["status"] == "finished"
+
+    game = client.get(f"/games/{room_code}").json()["game"]
+    assert game["status"] == "finished"
+
+
+def test_leaving_player_keeps_counters_consistent(client, db_session):
+    seed_snippet(db_session)
+    host_id = signup_user(client, "cnt_host", "cnt_host@example.com")
+    guest_id = signup_user(client, "cnt_guest", "cnt_guest@example.com")
+    room_code = client.post("/games/create", json={"user_id": host_id}).json()["room_code"]
+    client.post("/games/join", json={"user_id": guest_id, "room_code": room_code})
+    client.post(f"/games/{room_code}/start")
+    GameService(db_session).leave_game(room_code, guest_id)
+
+    # The host is now the only racer, so their finish ends the game
+    resp = client.post("/games/finish", json={"room_code": room_code, "user_id": host_id, "wpm": 60, "accuracy": 95})
+    assert resp.json()["status"] == "finished"
+
+
+def test_force_finish_ranks_unfinished_racers_by_progress(client, db_session):
+    seed_snippet(db_session)
+    host_id = signup_user(client, "ff_host", "ff_host@example.com")
+    guest_id = signup_user(client, "ff_guest", "ff_guest@example.com")
+    game = client.post("/games/create", json={"user_id": host_id}).json()
+    room_code = game["room_code"]
+    client.post("/games/join", json={"user_id": guest_id, "room_code": room_code})
+    client.post(f"/games/{room_code}/start")
+    client.post("/games/progress", json={"room_code": room_code, "user_id": guest_id, "progress": 5, "wpm": 30, "accuracy": 90})
+
+    assert GameService(db_session).force_finish_game(room_code, game["id"]) == "finished"
+
+    participants = {p["user_id"]: p for p in client.get(f"/games/{room_code}").json()["participants"]}
+    assert participants[guest_id]["finish_position"] == 1
+    assert participants[host_id]["finish_position"] == 2
+    # Already finished games are left alone
+    assert GameService(db_session).force_finish_game(room_code, game["id"]) is None
+
+
+def test_room_registry_follows_host_transfer_and_delete(client, db_session):
+    seed_snippet(db_session)
+    host_id = signup_user(client, "reg_host", "reg_host@example.com")
+    guest_id = signup_user(client, "reg_guest", "reg_guest@example.com")
+    room_code = client.post("/games/create", json={"user_id": host_id}).json()["room_code"]
+    client.post("/games/join", json={"user_id": guest_id, "room_code": room_code})
+
+    room = room_registry.get(room_code)
+    assert room.host_user_id == host_id
+    assert room.snippet_len == len("print('hi')")
+
+    svc = GameService(db_session)
+    svc.leave_game(room_code, host_id)
+    assert room_registry.get(room_code).host_user_id == guest_id
+    svc.leave_game(room_code, guest_id)
+    assert room_registry.get(room_code) is None
+
+
+def test_get_game_details_is_one_query(client, db_session):
+    seed_snippet(db_session)
+    host_id = signup_user(client, "q_host", "q_host@example.com")
+    guest_id = signup_user(client, "q_guest", "q_guest@example.com")
+    room_code = client.post("/games/create", json={"user_id": host_id}).json()["room_code"]
+    client.post("/games/join", json={"user_id": guest_id, "room_code": room_code})
+    db_session.expire_all()
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        details = GameService(db_session).get_game_details(room_code)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert len(statements) == 1, statements
+    assert [p.user_id for p in details.participants] == [host_id, guest_id]
+    assert details.snippet_language == "python"
+    assert details.snippet_code == "print('hi')"
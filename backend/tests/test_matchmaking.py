@@ -0,0 +1,87 @@
+"""
+Tests for the quick-play matchmaking queue in realtime/matchmaking.py
+"""
+import asyncio
+import pytest
+from backend.realtime.matchmaking import MatchmakingError, MatchmakingQueue
+
+
+def make_queue(clock, **kwargs):
+    return MatchmakingQueue(max_players=3, min_players=2, max_wait_s=10, clock=clock, **kwargs)
+
+
+def test_full_rooms_form_per_language_in_arrival_order(clock):
+    queue = make_queue(clock)
+    for user_id, language in enumerate(["python", "Python", "js", "python ", "python"]):
+        clock.now += 1
+        queue.enqueue(user_id, f"sid{user_id}", language)
+
+    matches = queue.match()
+
+    assert [(m.language, m.user_ids) for m in matches] == [("python", [0, 1, 3])]
+    assert queue.waiting("python") == 1
+    assert queue.waiting("js") == 1
+
+
+def test_skill_bands_are_separate_buckets(clock):
+    queue = make_queue(clock)
+    for user_id in range(3):
+        queue.enqueue(user_id, "sid", "python", skill_band=user_id % 2)
+
+    assert queue.match() == []
+    assert queue.waiting("python", 0) == 2
+
+
+def test_partial_room_after_max_wait(clock):
+    queue = make_queue(clock)
+    queue.enqueue(1, "a", "go")
+    queue.enqueue(2, "b", "go")
+    assert queue.match() == []
+
+    clock.now = 10
+    (match,) = queue.match()
+    assert match.user_ids == [1, 2]
+    assert len(queue) == 0
+
+
+def test_cancelled_and_disconnected_players_are_skipped(clock):
+    queue = make_queue(clock)
+    for user_id in range(4):
+        queue.enqueue(user_id, f"sid{user_id}", "rust")
+    queue.cancel(0)
+    queue.cancel_sid("sid2")
+    queue.enqueue(5, "sid5", "rust")
+
+    (match,) = queue.match()
+    assert match.user_ids == [1, 3, 5]
+
+
+def test_requeue_replaces_earlier_ticket(clock):
+    queue = make_queue(clock)
+    queue.enqueue(1, "a", "python")
+    queue.enqueue(1, "a", "js")
+
+    assert queue.waiting("python") == 0
+    assert queue.waiting("js") == 1
+
+
+def test_rejects_missing_language(clock):
+    queue = make_queue(clock)
+    with pytest.raises(MatchmakingError):
+        queue.enqueue(1, "a", "  ")
+
+
+def test_tick_hands_matches_to_handler(clock):
+    queue = make_queue(clock)
+    formed = []
+
+    async def on_match(match):
+        formed.append(match.user_ids)
+
+    queue.on_match = on_match
+    for user_id in range(3):
+        queue.enqueue(user_id, "sid", "python")
+
+    assert asyncio.run(queue.tick()) == 1
+    assert formed == [[0, 1, 2]]
+    assert queue.stats()["matched"] == 3
@@ -0,0 +1,81 @@
+"""
+Tests for the latency histograms and Prometheus rendering in realtime/metrics.py
+"""
+import asyncio
+from backend.realtime.metrics import (
+    MetricsRegistry, MetricsMiddleware, current_db_timer, timed_handler,
+    socket_event_seconds, socket_event_db_seconds, http_request_seconds, http_request_db_seconds
+)
+
+
+def test_histograms_render_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("test_seconds", "Test latency", ("event",), buckets=(0.01, 0.1))
+    emits = registry.counter("test_emits_total", "Test emits", ("event",))
+    registry.gauge("test_rooms", "Test rooms", lambda: 3)
+    registry.gauge("test_depth", "Test depth", lambda: {("sid1",): 4}, ("sid",))
+    registry.counter_from("test_flushes_total", "Test flushes", lambda: 7)
+    for value in (0.005, 0.05, 0.5):
+        latency.observe(value, "join_room")
+    emits.inc("player_left")
+    emits.inc("player_left")
+
+    text = registry.render()
+
+    assert '# TYPE test_seconds histogram' in text
+    assert 'test_seconds_bucket{event="join_room",le="0.01"} 1' in text
+    assert 'test_seconds_bucket{event="join_room",le="0.1"} 2' in text
+    assert 'test_seconds_bucket{event="join_room",le="+Inf"} 3' in text
+    assert 'test_seconds_count{event="join_room"} 3' in text
+    assert 'test_emits_total{event="player_left"} 2' in text
+    assert 'test_rooms 3' in text
+    assert 'test_depth{sid="sid1"} 4' in text
+    assert '# TYPE test_flushes_total counter' in text
+    assert 'test_flushes_total 7' in text
+
+
+def test_timed_handler_records_latency_and_db_time():
+    calls = []
+
+    async def legacy_disconnect(sid):
+        calls.append(sid)
+        current_db_timer.get().seconds += 0.02
+
+    handler = timed_handler("test_disconnect", legacy_disconnect)
+    # Newer python-socketio passes a disconnect reason as well
+    asyncio.run(handler("sid1", "client disconnect"))
+
+    assert calls == ["sid1"]
+    assert socket_event_seconds.labels("test_disconnect").count == 1
+    assert socket_event_db_seconds.labels("test_disconnect").sum == 0.02
+    assert current_db_timer.get() is None
+
+
+def test_middleware_labels_requests_by_route_template():
+    class Route:
+        path = "/games/{room_code}"
+
+    async def app(scope, receive, send):
+        scope["route"] = Route()
+        current_db_timer.get().seconds += 0.01
+        await send({"type": "http.response.start", "status": 404})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET"}
+    asyncio.run(MetricsMiddleware(app)(scope, None, send))
+
+    assert http_request_seconds.labels("GET", "/games/{room_code}", 404).count == 1
+    assert http_request_db_seconds.labels("GET", "/games/{room_code}").sum == 0.01
+
+
+def test_pipeline_counters_are_scraped():
+    from backend.socketio_server import metrics
+
+    text = metrics.render()
+
+    assert 'coderacer_progress_events_total{result="rate_limited"}' in text
+    assert 'coderacer_executor_seconds_total{phase="queue_wait"}' in text
+    assert 'coderacer_progress_writes_total{result="coalesced"}' in text
+    assert 'coderacer_progress_flush_failures_total' in text
@@ -0,0 +1,42 @@
+"""
+Tests for the in-place schema upgrades in migrations.py
+"""
+from sqlalchemy import create_engine, inspect, text
+from backend.migrations import upgrade_schema
+
+# games/game_participants as they were before the counter columns
+OLD_SCHEMA = (
+    """CREATE TABLE games (
+        id INTEGER PRIMARY KEY, room_code VARCHAR(10) NOT NULL, host_user_id INTEGER NOT NULL,
+        snippet_id INTEGER NOT NULL, status VARCHAR(20), max_players INTEGER,
+        created_at TIMESTAMP, started_at TIMESTAMP, finished_at TIMESTAMP
+    )""",
+    """CREATE TABLE game_participants (
+        id INTEGER PRIMARY KEY, game_id INTEGER NOT NULL, user_id INTEGER NOT NULL,
+        username VARCHAR(50) NOT NULL, progress INTEGER, wpm FLOAT, accuracy FLOAT,
+        is_finished BOOLEAN, finish_position INTEGER, joined_at TIMESTAMP, finished_at TIMESTAMP
+    )""",
+    "INSERT INTO games (id, room_code, host_user_id, snippet_id, status) VALUES (1, 'OLD001', 1, 1, 'in_progress')",
+    "INSERT INTO game_participants (game_id, user_id, username, is_finished, finish_position) VALUES (1, 1, 'a', 1, 1)",
+    "INSERT INTO game_participants (game_id, user_id, username, is_finished) VALUES (1, 2, 'b', 0)",
+)
+
+
+def test_upgrade_adds_and_backfills_game_counters(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.execute(text(statement))
+
+    upgrade_schema(engine)
+    # Running again on an upgraded database changes nothing
+    upgrade_schema(engine)
+
+    with engine.connect() as conn:
+        row = conn.execute(text(
+            "SELECT player_count, finished_count, last_finish_position FROM games WHERE id = 1"
+        )).one()
+    assert tuple(row) == (2, 1, 1)
+    schema = inspect(engine)
+    assert "ix_games_status" in {i["name"] for i in schema.get_indexes("games")}
+    assert "race_replays" in schema.get_table_names()
@@ -0,0 +1,129 @@
+"""
+Tests for per-connection outbound queues in realtime/outbound.py
+"""
+import asyncio
+from backend.realtime.outbound import OutboundQueues
+from backend.realtime.race_state import ParticipantState
+
+
+def make_queues(depth, **kwargs):
+    sent = []
+
+    async def send_event(sid, event, data):
+        sent.append((sid, event, data))
+
+    async def send_progress(sid, room_code, encoding, participants):
+        sent.append((sid, "progress", [(p.user_id, p.progress) for p in participants]))
+
+    queues = OutboundQueues(send_event, send_progress, transport_depth=lambda sid: depth[sid],
+                            transport_max=1, poll_s=0.001, **kwargs)
+    return queues, sent
+
+
+def racer(user_id: int, progress: int) -> ParticipantState:
+    return ParticipantState(participant_id=user_id, user_id=user_id, username=f"u{user_id}", progress=progress)
+
+
+def test_slow_socket_coalesces_progress_and_keeps_events():
+    depth = {"slow": 5}
+    queues, sent = make_queues(depth, max_items=3)
+
+    async def scenario():
+        for progress in range(10):
+            queues.push_progress("slow", "ROOM01", "json", racer(1, progress))
+        queues.push_event("slow", "player_finished", {"user_id": 1})
+        for user_id in range(2, 6):
+            queues.push_progress("slow", "ROOM01", "json", racer(user_id, 1))
+        queues.push_event("slow", "game_finished", {})
+        # Events count toward the bound too: game_finished pushed out progress
+        assert queues.depth("slow") == 3
+        # The client catches up
+        depth["slow"] = 0
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+
+    assert sent == [
+        ("slow", "player_finished", {"user_id": 1}),
+        ("slow", "progress", [(5, 1)]),
+        ("slow", "game_finished", {})
+    ]
+    stats = queues.stats()
+    assert stats["superseded"] == 9
+    assert stats["dropped"] == 4
+    assert stats["queued"] == 0
+
+
+def test_fast_socket_gets_every_frame_in_order():
+    queues, sent = make_queues({"fast": 0}, max_items=8)
+
+    async def scenario():
+        queues.push_event("fast", "game_started", {})
+        await asyncio.sleep(0.01)
+        queues.push_progress("fast", "ROOM01", "json", racer(1, 3))
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+
+    assert sent == [("fast", "game_started", {}), ("fast", "progress", [(1, 3)])]
+
+
+def test_forget_stops_sender():
+    queues, sent = make_queues({"gone": 5}, max_items=8)
+
+    async def scenario():
+        queues.push_event("gone", "game_started", {})
+        queues.forget("gone")
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert sent == []
+    assert queues.stats()["connections"] == 0
+
+
+def test_snapshots_supersede_and_events_stay_bounded():
+    depth = {"slow": 5, "stuck": 5}
+    overflowed = []
+
+    async def on_overflow(sid):
+        overflowed.append(sid)
+
+    queues, sent = make_queues(depth, max_items=64, on_overflow=on_overflow)
+
+    async def scenario():
+        for version in range(500):
+            queues.push_event("slow", "spectator_snapshot", {"version": version}, key=("spectator_snapshot", "ROOM01"))
+        assert queues.depth("slow") == 1
+        for i in range(65):
+            queues.push_event("stuck", "player_joined", {"user_id": i})
+        await asyncio.sleep(0)
+        depth["slow"] = 0
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+
+    assert sent == [("slow", "spectator_snapshot", {"version": 499})]
+    # Undroppable events alone overflowed: the socket is let go, not buffered forever
+    assert overflowed == ["stuck"]
+    assert queues.depth("stuck") == 0
+    stats = queues.stats()
+    assert stats["superseded"] == 499
+    assert stats["overflowed"] == 1
+
+
+def test_full_queue_drops_snapshots_after_progress():
+    queues, sent = make_queues({"slow": 5}, max_items=2)
+
+    async def scenario():
+        queues.push_event("slow", "spectator_snapshot", {}, key="snap")
+        queues.push_event("slow", "game_started", {})
+        queues.push_progress("slow", "ROOM01", "json", racer(1, 1))
+        assert queues.depth("slow") == 2
+        queues.push_event("slow", "game_finished", {})
+        assert queues.depth("slow") == 2
+        queues.forget("slow")
+
+    asyncio.run(scenario())
+
+    assert queues.dropped == 2
+    assert queues.dropped_by_sid == {}
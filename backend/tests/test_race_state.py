@@ -0,0 +1,151 @@
+"""
+Unit tests for the in-memory race state engine in realtime/race_state.py
+"""
+import pytest
+from backend.models import Game, GameParticipant
+from backend.realtime.race_state import RaceStateEngine, RaceStateError
+
+
+def make_room(engine: RaceStateEngine, status: str = "in_progress", snippet_length: int = 50):
+    game = Game(id=1, room_code="abc123", host_user_id=10, snippet_id=1, status=status)
+    participants = [
+        GameParticipant(id=100, game_id=1, user_id=10, username="host", progress=0, wpm=0.0, accuracy=0.0, is_finished=False),
+        GameParticipant(id=101, game_id=1, user_id=11, username="guest", progress=0, wpm=0.0, accuracy=0.0, is_finished=False),
+    ]
+    return engine.load(game, participants, "x" * snippet_length)
+
+
+def test_load_tracks_room_by_upper_case_code():
+    engine = RaceStateEngine()
+    room = make_room(engine)
+
+    assert engine.get("ABC123") is room
+    assert engine.get("abc123") is room
+    assert set(room.participants) == {10, 11}
+
+
+def test_update_progress_clamps_values():
+    engine = RaceStateEngine()
+    make_room(engine, snippet_length=50)
+
+    participant = engine.update_progress("ABC123", 11, 999, 1000.0, 150.0)
+
+    assert participant.progress == 50
+    assert participant.wpm == 400
+    assert participant.accuracy == 100
+
+
+def test_update_progress_unknown_room_or_participant():
+    engine = RaceStateEngine()
+    make_room(engine)
+
+    with pytest.raises(RaceStateError):
+        engine.update_progress("NOPE00", 10, 1, 1.0, 1.0)
+    with pytest.raises(RaceStateError):
+        engine.update_progress("ABC123", 999, 1, 1.0, 1.0)
+
+
+def test_reload_keeps_live_progress_for_same_race():
+    engine = RaceStateEngine()
+    make_room(engine)
+    engine.update_progress("ABC123", 10, 20, 60.0, 95.0)
+
+    room = make_room(engine)
+
+    assert room.participants[10].progress == 20
+    assert room.participants[10].wpm == 60.0
+
+
+def test_reload_after_status_change_resets_progress():
+    engine = RaceStateEngine()
+    make_room(engine, status="finished")
+    engine.update_progress("ABC123", 10, 20, 60.0, 95.0)
+
+    room = make_room(engine, status="waiting")
+
+    assert room.participants[10].progress == 0
+
+
+def test_remove_participant_applies_host_transfer():
+    engine = RaceStateEngine()
+    room = make_room(engine)
+
+    engine.remove_participant("ABC123", 10, new_host_id=11)
+
+    assert 10 not in room.participants
+    assert room.host_user_id == 11
+
+
+def test_slots_are_unique_and_stable_across_reloads():
+    engine = RaceStateEngine()
+    room = make_room(engine)
+    slots = {uid: p.slot for uid, p in room.participants.items()}
+    assert sorted(slots.values()) == [0, 1]
+
+    engine.remove_participant("ABC123", 10)
+    game = Game(id=1, room_code="ABC123", host_user_id=11, snippet_id=1, status="in_progress")
+    reloaded = engine.load(game, [
+        GameParticipant(id=101, game_id=1, user_id=11, username="guest", progress=0, wpm=0.0, accuracy=0.0, is_finished=False),
+        GameParticipant(id=102, game_id=1, user_id=12, username="late", progress=0, wpm=0.0, accuracy=0.0, is_finished=False),
+    ], "x" * 50)
+
+    assert reloaded.participants[11].slot == slots[11]
+    assert reloaded.participants[12].slot != slots[11]
+    assert reloaded.by_slot(slots[11]).user_id == 11
+
+
+def test_identical_update_is_reported_as_redundant():
+    engine = RaceStateEngine()
+    make_room(engine)
+
+    assert engine.update_progress("ABC123", 10, 5, 30.0, 90.0) is not None
+    assert engine.update_progress("ABC123", 10, 5, 30.0, 90.0) is None
+    # Values that clamp to the current state are redundant too
+    engine.update_progress("ABC123", 10, 50, 30.0, 90.0)
+    assert engine.update_progress("ABC123", 10, 80, 30.0, 90.0) is None
+
+
+def test_roster_changes_bump_version_and_sync_as_delta():
+    engine = RaceStateEngine()
+    room = make_room(engine, status="waiting")
+    base = room.version
+
+    engine.remove_participant("ABC123", 10, new_host_id=11)
+    engine.update_progress("ABC123", 11, 5, 30.0, 90.0)
+
+    assert room.version == base + 2
+    sync = room.sync(base)
+    assert sync['full'] is False
+    assert [c['op'] for c in sync['changes']] == ['remove', 'room']
+    assert sync['changes'][1]['host_user_id'] == 11
+    assert room.sync(room.version)['changes'] == []
+
+
+def test_reload_records_only_what_changed():
+    engine = RaceStateEngine()
+    room = make_room(engine, status="waiting")
+    base = room.version
+    game = Game(id=1, room_code="ABC123", host_user_id=10, snippet_id=1, status="waiting")
+    reloaded = engine.load(game, [
+        GameParticipant(id=100, game_id=1, user_id=10, username="host", progress=0, wpm=0.0, accuracy=0.0, is_finished=False),
+        GameParticipant(id=101, game_id=1, user_id=11, username="guest", progress=0, wpm=0.0, accuracy=0.0, is_finished=False),
+        GameParticipant(id=102, game_id=1, user_id=12, username="late", progress=0, wpm=0.0, accuracy=0.0, is_finished=False),
+    ], "x" * 50)
+
+    changes = reloaded.changes_since(base)
+    assert [(c['op'], c['participant']['user_id']) for c in changes] == [('upsert', 12)]
+
+
+def test_unknown_or_evicted_version_gets_full_snapshot():
+    engine = RaceStateEngine()
+    room = make_room(engine, status="waiting")
+    base = room.version
+
+    assert room.sync(None)['full'] is True
+    assert room.sync(base + 100)['full'] is True
+    for _ in range(room.changes.maxlen + 1):
+        engine.set_status("ABC123", "in_progress")
+        engine.set_status("ABC123", "waiting")
+    full = room.sync(base)
+    assert full['full'] is True
+    assert {p['user_id'] for p in full['participants']} == {10, 11}
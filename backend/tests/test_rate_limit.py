@@ -0,0 +1,50 @@
+"""
+Tests for per-connection progress rate limiting in realtime/rate_limit.py
+"""
+from backend.realtime.rate_limit import ProgressRateLimiter
+
+
+def test_burst_then_refill_at_configured_rate(clock):
+    limiter = ProgressRateLimiter(rate=10, burst=3, clock=clock)
+
+    assert [limiter.allow("sid-a") for _ in range(4)] == [True, True, True, False]
+    clock.now += 0.1
+    assert limiter.allow("sid-a") is True
+    assert limiter.allow("sid-a") is False
+    assert limiter.stats()["dropped_rate_limited"] == 2
+
+
+def test_buckets_are_per_connection(clock):
+    limiter = ProgressRateLimiter(rate=1, burst=1, clock=clock)
+
+    assert limiter.allow("sid-a") is True
+    assert limiter.allow("sid-a") is False
+    assert limiter.allow("sid-b") is True
+
+
+def test_forget_resets_bucket_and_counters_are_reported(clock):
+    limiter = ProgressRateLimiter(rate=1, burst=1, clock=clock)
+    limiter.allow("sid-a")
+    limiter.record_accepted()
+    limiter.record_redundant()
+
+    limiter.forget("sid-a")
+
+    assert limiter.allow("sid-a") is True
+    stats = limiter.stats()
+    assert stats["accepted"] == 1
+    assert stats["dropped_redundant"] == 1
+    assert stats["tracked_sockets"] == 1
+
+
+def test_keystroke_batches_are_charged_per_keystroke(clock):
+    limiter = ProgressRateLimiter(rate=1, burst=1, clock=clock, keystroke_rate=10, keystroke_burst=20)
+
+    # Batches flushed together after a stall fit the burst, a flood does not
+    assert [limiter.allow_keystrokes("sid-a", 8) for _ in range(3)] == [True, True, False]
+    clock.now += 0.5
+    assert limiter.allow_keystrokes("sid-a", 8) is True
+    assert limiter.allow_keystrokes("sid-a", 2) is False
+    # Plain progress events keep their own bucket
+    assert limiter.allow("sid-a") is True
+    assert limiter.stats()["dropped_rate_limited"] == 2
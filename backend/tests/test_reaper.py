@@ -0,0 +1,82 @@
+"""
+Tests for the abandoned game reaper in realtime/reaper.py
+"""
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy.orm import sessionmaker
+from backend.models import Game, GameParticipant
+from backend.realtime.reaper import GameReaper
+
+NOW = datetime(2030, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def seed_games(db_session, make_user, snippet):
+    """Commit games from (room_code, status, hours since last activity) specs"""
+    user = make_user("reaped")
+
+    def seed(specs) -> None:
+        for room_code, status, hours in specs:
+            at = NOW - timedelta(hours=hours)
+            game = Game(room_code=room_code, host_user_id=user.id, snippet_id=snippet.id, status=status,
+                        created_at=at, finished_at=at if status == "finished" else None, player_count=1)
+            db_session.add(game)
+            db_session.commit()
+            db_session.add(GameParticipant(game_id=game.id, user_id=user.id, username=user.username))
+            db_session.commit()
+
+    return seed
+
+
+def make_reaper(db_session, **kwargs) -> GameReaper:
+    return GameReaper(
+        session_factory=sessionmaker(bind=db_session.get_bind()),
+        max_age_s={"waiting": 3600, "in_progress": 3600, "finished": 3600},
+        **kwargs
+    )
+
+
+def room_codes(db_session) -> set:
+    db_session.expire_all()
+    return {g.room_code for g in db_session.query(Game)}
+
+
+def test_reaps_only_stale_games(db_session, seed_games):
+    seed_games([("OLDWAI", "waiting", 5), ("OLDFIN", "finished", 5), ("NEWFIN", "finished", 0.5)])
+    reaper = make_reaper(db_session)
+
+    report = asyncio.run(reaper.run_once(now=NOW))
+
+    assert report == {"games": 2, "participants": 2, "waiting": 1, "in_progress": 0, "finished": 1}
+    assert room_codes(db_session) == {"NEWFIN"}
+    assert db_session.query(GameParticipant).count() == 1
+
+
+def test_batches_are_bounded_and_live_rooms_skipped(db_session, seed_games):
+    seed_games([(f"OLD00{i}", "finished", 5) for i in range(4)])
+    reaped = []
+
+    async def on_reaped(codes):
+        reaped.extend(codes)
+
+    reaper = make_reaper(db_session, batch_size=2, live_rooms=lambda: ["OLD000"])
+    reaper.on_reaped = on_reaped
+
+    assert asyncio.run(reaper.run_once(now=NOW))["games"] == 2
+    assert asyncio.run(reaper.run_once(now=NOW))["games"] == 1
+    assert room_codes(db_session) == {"OLD000"}
+    assert sorted(reaped) == ["OLD001", "OLD002", "OLD003"]
+    assert reaper.stats()["games_reaped"] == 3
+
+
+def test_rematch_ages_from_its_own_start(db_session, seed_games):
+    seed_games([("REMTCH", "in_progress", 30)])
+    # Rematched and restarted 30 minutes ago: old creation time, fresh start, no finish
+    game = db_session.query(Game).filter(Game.room_code == "REMTCH").one()
+    game.started_at = NOW - timedelta(minutes=30)
+    game.finished_at = None
+    db_session.commit()
+
+    assert asyncio.run(make_reaper(db_session).run_once(now=NOW))["games"] == 0
+    assert room_codes(db_session) == {"REMTCH"}
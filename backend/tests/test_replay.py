@@ -0,0 +1,132 @@
+"""
+Tests for race replay recording in realtime/replay.py and streaming playback
+"""
+import asyncio
+import json
+import pytest
+from backend.models import RaceReplay
+from backend.realtime.race_state import ParticipantState, RoomState
+from backend.realtime.replay import (
+    EVENT, HEADER, RaceRecorder, ReplayDecoder, ReplayFormatError, read_header, read_roster
+)
+from backend.services import replay_service
+from backend.services.replay_service import read_replay_head, replay_stream
+
+
+def make_room() -> RoomState:
+    room = RoomState(room_code="ABC123", game_id=7, host_user_id=1, status="in_progress", snippet_length=100)
+    for slot, user_id in enumerate((1, 2)):
+        room.participants[user_id] = ParticipantState(
+            participant_id=10 + slot, user_id=user_id, username=f"racer{user_id}", slot=slot
+        )
+    return room
+
+
+def record_race(clock, max_events: int = 100):
+    recorder = RaceRecorder(max_events=max_events, clock=clock)
+    room = make_room()
+    recorder.start(room)
+    first, second = room.participants[1], room.participants[2]
+    for t, participant, progress in ((0.25, first, 5), (0.5, second, 3), (1.0, first, 12), (1.5, second, 9)):
+        clock.now = t
+        participant.progress, participant.wpm, participant.accuracy = progress, 61.5, 98.25
+        recorder.record(room.room_code, participant)
+    return recorder, recorder.finish(room.room_code)
+
+
+def test_buffer_stores_deltas(clock):
+    _, buffer = record_race(clock)
+
+    assert len(buffer) == 4
+    assert list(buffer.dt_ms) == [250, 250, 500, 500]
+    assert list(buffer.dprogress) == [5, 3, 7, 6]
+    assert buffer.duration_ms == 1500
+
+
+def test_blob_round_trip(clock):
+    _, buffer = record_race(clock)
+    blob = buffer.to_blob({2: 1, 1: 2})
+
+    header = read_header(blob)
+    roster = read_roster(blob[HEADER.size:], header["roster_count"])
+    events = blob[HEADER.size + header["roster_bytes"]:]
+    samples = ReplayDecoder(roster).feed(events)
+
+    assert header["event_count"] == 4
+    assert header["duration_ms"] == 1500
+    assert len(events) == 4 * EVENT.size
+    assert roster[1] == {"slot": 1, "user_id": 2, "username": "racer2", "position": 1}
+    assert [(s["t"], s["user_id"], s["progress"]) for s in samples] == [
+        (250, 1, 5), (500, 2, 3), (1000, 1, 12), (1500, 2, 9)
+    ]
+    assert samples[0]["wpm"] == 61.5
+    assert samples[0]["accuracy"] == 98.25
+
+
+def test_buffer_is_bounded(clock):
+    recorder, buffer = record_race(clock, max_events=3)
+
+    assert len(buffer) == 3
+    assert recorder.dropped == 1
+
+
+def test_unrecorded_rooms_are_ignored():
+    recorder = RaceRecorder()
+    recorder.record("NOPE42", make_room().participants[1])
+
+    assert recorder.finish("NOPE42") is None
+    assert recorder.recorded == 0
+
+
+def test_rejects_foreign_blobs():
+    with pytest.raises(ReplayFormatError):
+        read_header(b"not a replay at all")
+
+
+def test_stream_reads_in_chunks(clock, monkeypatch):
+    _, buffer = record_race(clock)
+    blob = buffer.to_blob()
+    reads = []
+
+    def read_chunk(replay_id, offset, size):
+        reads.append(size)
+        return blob[offset:offset + size]
+
+    async def collect():
+        head = read_replay_head(1, read_chunk)
+        return [json.loads(line) async for line in replay_stream(1, head, speed=64.0, read_chunk=read_chunk)]
+
+    monkeypatch.setattr(replay_service, "REPLAY_CHUNK_EVENTS", 3)
+    lines = asyncio.run(collect())
+
+    assert lines[0]["type"] == "header"
+    assert [line["progress"] for line in lines[1:-1]] == [5, 3, 12, 9]
+    assert lines[-1] == {"type": "end", "duration_ms": 1500}
+    # Header, roster, then events three at a time
+    assert reads[2:] == [3 * EVENT.size, 1 * EVENT.size]
+
+
+def test_stream_reports_a_truncated_blob(clock):
+    _, buffer = record_race(clock)
+    blob = buffer.to_blob()[:-EVENT.size]
+
+    def read_chunk(replay_id, offset, size):
+        return blob[offset:offset + size]
+
+    async def collect():
+        head = read_replay_head(1, read_chunk)
+        return [json.loads(line) async for line in replay_stream(1, head, speed=64.0, read_chunk=read_chunk)]
+
+    lines = asyncio.run(collect())
+
+    assert lines[0]["type"] == "header"
+    assert lines[-1] == {"type": "error", "message": "Replay truncated"}
+    assert all(line["type"] != "end" for line in lines)
+
+
+def test_corrupt_replay_is_rejected_before_streaming(client, db_session):
+    db_session.add(RaceReplay(id=5, room_code="ABC123", duration_ms=1500, event_count=4, data=b"not a replay at all"))
+    db_session.commit()
+
+    assert client.get("/games/replays/5/stream").status_code == 422
+    assert client.get("/games/replays/6/stream").status_code == 404
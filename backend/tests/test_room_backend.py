@@ -0,0 +1,146 @@
+"""
+Tests for the pluggable room state backends in realtime/room_backend.py.
+
+The same scenarios run against the in-memory backend and the Redis backend
+(on fakeredis), plus a two-worker scenario that only the shared backend
+can satisfy.
+"""
+import asyncio
+import pytest
+from backend.realtime.room_backend import InMemoryRoomStateBackend, RedisRoomStateBackend
+
+
+def fake_redis(server=None):
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeAsyncRedis(server=server or fakeredis.FakeServer(), decode_responses=True)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def make_backend(request):
+    if request.param == "memory":
+        return lambda node_id="node-a": InMemoryRoomStateBackend(node_id)
+    client = fake_redis()
+    return lambda node_id="node-a": RedisRoomStateBackend(client, node_id, prefix="test")
+
+
+def test_add_and_remove_membership(make_backend):
+    async def scenario():
+        backend = make_backend()
+        await backend.add("ROOM01", "sid-a", 1)
+        await backend.add("ROOM01", "sid-b", 2)
+        assert await backend.members("ROOM01") == {"sid-a": 1, "sid-b": 2}
+        assert backend.user_of("ROOM01", "sid-a") == 1
+
+        assert await backend.remove("ROOM01", "sid-a") == 1
+        assert await backend.remove("ROOM01", "sid-a") is None
+        assert await backend.members("ROOM01") == {"sid-b": 2}
+
+    asyncio.run(scenario())
+
+
+def test_pop_sid_returns_every_membership(make_backend):
+    async def scenario():
+        backend = make_backend()
+        await backend.add("ROOM01", "sid-a", 1)
+        await backend.add("ROOM02", "sid-a", 1)
+        await backend.add("ROOM02", "sid-b", 2)
+
+        assert sorted(await backend.pop_sid("sid-a")) == [("ROOM01", 1), ("ROOM02", 1)]
+        assert await backend.members("ROOM01") == {}
+        assert await backend.members("ROOM02") == {"sid-b": 2}
+        assert await backend.pop_sid("sid-a") == []
+
+    asyncio.run(scenario())
+
+
+def test_user_connected_counts_other_sockets(make_backend):
+    async def scenario():
+        backend = make_backend()
+        await backend.add("ROOM01", "tab-1", 7)
+        await backend.add("ROOM01", "tab-2", 7)
+
+        await backend.pop_sid("tab-1")
+        assert await backend.user_connected("ROOM01", 7) is True
+        await backend.pop_sid("tab-2")
+        assert await backend.user_connected("ROOM01", 7) is False
+
+    asyncio.run(scenario())
+
+
+def test_redis_backend_shares_presence_across_workers():
+    async def scenario():
+        fakeredis = pytest.importorskip("fakeredis")
+        server = fakeredis.FakeServer()
+        worker_a = RedisRoomStateBackend(fake_redis(server), "node-a", prefix="test")
+        worker_b = RedisRoomStateBackend(fake_redis(server), "node-b", prefix="test")
+
+        await worker_a.add("ROOM01", "sid-a", 1)
+        await worker_b.add("ROOM01", "sid-b", 1)
+        assert await worker_a.members("ROOM01") == {"sid-a": 1, "sid-b": 1}
+        # Local lookups only see this worker's sockets
+        assert worker_a.local_members("ROOM01") == {"sid-a": 1}
+
+        # User 1 is still present through worker B after worker A's socket drops
+        await worker_a.pop_sid("sid-a")
+        assert await worker_a.user_connected("ROOM01", 1) is True
+
+    asyncio.run(scenario())
+
+
+def test_purge_node_removes_dead_worker_memberships():
+    async def scenario():
+        fakeredis = pytest.importorskip("fakeredis")
+        server = fakeredis.FakeServer()
+        survivor = RedisRoomStateBackend(fake_redis(server), "node-a", prefix="test")
+        crashed = RedisRoomStateBackend(fake_redis(server), "node-b", prefix="test")
+        await survivor.add("ROOM01", "sid-a", 1)
+        await crashed.add("ROOM01", "sid-b", 2)
+        await crashed.add("ROOM02", "sid-b", 2)
+
+        assert sorted(await survivor.purge_node("node-b")) == [("ROOM01", 2), ("ROOM02", 2)]
+        assert await survivor.members("ROOM01") == {"sid-a": 1}
+        assert await survivor.members("ROOM02") == {}
+        assert await survivor.purge_node("node-b") == []
+
+    asyncio.run(scenario())
+
+
+def test_heartbeat_purges_workers_that_stopped_beating(clock):
+    async def scenario():
+        fakeredis = pytest.importorskip("fakeredis")
+        server = fakeredis.FakeServer()
+        survivor = RedisRoomStateBackend(fake_redis(server), "node-a", prefix="test", ttl_s=15, clock=clock)
+        # A previous incarnation of a restarted worker, never to beat again
+        crashed = RedisRoomStateBackend(fake_redis(server), "node-b", prefix="test", ttl_s=15, clock=clock)
+        purged = []
+
+        async def on_purge(memberships):
+            purged.extend(memberships)
+
+        survivor.on_purge = on_purge
+        await crashed.add("ROOM01", "sid-b", 2)
+        await crashed.heartbeat()
+        assert await survivor.heartbeat() == []
+
+        clock.now += 20
+        assert await survivor.heartbeat() == [("ROOM01", 2)]
+        assert purged == [("ROOM01", 2)]
+        assert await survivor.members("ROOM01") == {}
+        assert survivor.stats()["purged_nodes"] == 1
+        assert await survivor.heartbeat() == []
+
+    asyncio.run(scenario())
+
+
+def test_redis_reads_skip_non_integer_user_ids():
+    async def scenario():
+        backend = RedisRoomStateBackend(fake_redis(), "node-a", prefix="test")
+        await backend.add("ROOM01", "sid-a", 1)
+        await backend.redis.hset("test:room:ROOM01", "sid-x", "guest")
+        await backend.redis.sadd("test:sid:sid-x", "ROOM01")
+        await backend.redis.sadd("test:node:node-b", "sid-x")
+
+        assert await backend.members("ROOM01") == {"sid-a": 1}
+        assert await backend.purge_node("node-b") == []
+
+    asyncio.run(scenario())
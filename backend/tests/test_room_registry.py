@@ -0,0 +1,42 @@
+"""
+Tests for the room metadata registry in realtime/room_registry.py
+"""
+from types import SimpleNamespace
+from backend.realtime.room_registry import RoomRegistry
+
+
+def make_game(**overrides):
+    fields = dict(room_code="abc123", id=7, host_user_id=1, status="waiting", snippet_id=3)
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def test_remember_update_and_invalidate():
+    registry = RoomRegistry()
+    registry.remember(make_game(), snippet_len=42)
+
+    room = registry.get("ABC123")
+    assert (room.game_id, room.snippet_len, room.status) == (7, 42, "waiting")
+
+    registry.update("abc123", status="in_progress", host_user_id=2)
+    assert registry.get("abc123").status == "in_progress"
+    assert registry.get("abc123").host_user_id == 2
+    # The earlier snapshot is never mutated in place
+    assert room.status == "waiting"
+
+    registry.invalidate("ABC123")
+    assert registry.get("ABC123") is None
+    # Updates to unknown rooms don't create entries
+    registry.update("ABC123", status="finished")
+    assert len(registry) == 0
+
+
+def test_entries_expire(clock):
+    registry = RoomRegistry(ttl_s=30, clock=clock)
+    registry.remember(make_game(), snippet_len=42)
+
+    clock.now = 29
+    assert registry.get("ABC123") is not None
+    clock.now = 30
+    assert registry.get("ABC123") is None
+    assert registry.stats() == {'rooms': 0, 'hits': 1, 'misses': 1}
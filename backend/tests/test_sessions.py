@@ -0,0 +1,46 @@
+"""
+Tests for resumable room sessions in realtime/sessions.py
+"""
+from backend.realtime.sessions import ResumableSessions
+
+
+def test_tokens_rotate_per_membership():
+    sessions = ResumableSessions()
+    first = sessions.issue("ABC123", 1)
+    second = sessions.issue("ABC123", 1)
+
+    assert first != second
+    assert sessions.resolve(first) is None
+    assert sessions.resolve(second) == ("ABC123", 1)
+    assert sessions.resolve(None) is None
+    assert sessions.stats()['sessions'] == 1
+
+
+def test_back_within_grace_keeps_the_session():
+    sessions = ResumableSessions()
+    token = sessions.issue("ABC123", 1)
+    sessions.mark_away("ABC123", 1)
+
+    assert sessions.back("ABC123", 1) is True
+    assert sessions.back("ABC123", 1) is False
+    # The timer may still fire after a resume; it must not evict the player
+    assert sessions.expire("ABC123", 1) is False
+    assert sessions.resolve(token) == ("ABC123", 1)
+    assert sessions.stats() == {'sessions': 1, 'away': 0, 'resumed': 1, 'expired': 0}
+
+
+def test_expiry_and_room_deletion_revoke_tokens():
+    sessions = ResumableSessions()
+    gone = sessions.issue("ABC123", 1)
+    kept = sessions.issue("ABC123", 2)
+    other = sessions.issue("XYZ789", 1)
+    sessions.mark_away("ABC123", 1)
+
+    assert sessions.expire("ABC123", 1) is True
+    assert sessions.resolve(gone) is None
+    assert sessions.resolve(kept) == ("ABC123", 2)
+
+    sessions.forget_room("ABC123")
+    assert sessions.resolve(kept) is None
+    assert sessions.resolve(other) == ("XYZ789", 1)
+    assert sessions.stats() == {'sessions': 1, 'away': 0, 'resumed': 0, 'expired': 1}
@@ -0,0 +1,130 @@
+"""
+Tests for room bookkeeping helpers in socketio_server.py
+"""
+import asyncio
+from backend.database import async_engine
+from backend.models import Game, GameParticipant
+from backend.schemas.game import ParticipantFinish
+from backend.services.game_service import GameService
+from backend import socketio_server
+from backend.socketio_server import cancel_race_timers, connections, finish_race, handle_rebalance, keystrokes
+from backend.realtime.race_state import race_state
+from backend.realtime.rate_limit import PROGRESS_BURST
+from backend.realtime.timers import room_timers, TIMER_COUNTDOWN, TIMER_RACE_DEADLINE, TIMER_RESUME
+
+
+def test_race_end_keeps_resume_timers():
+    room_timers.schedule("END001", TIMER_COUNTDOWN, 5)
+    room_timers.schedule("END001", TIMER_RACE_DEADLINE, 120)
+    room_timers.schedule("END001", TIMER_RESUME, 30, subject=7)
+    try:
+        cancel_race_timers("END001")
+
+        assert room_timers.remaining("END001", TIMER_COUNTDOWN) is None
+        assert room_timers.remaining("END001", TIMER_RACE_DEADLINE) is None
+        # An away player must still be released when their window runs out
+        assert room_timers.remaining("END001", TIMER_RESUME, 7) is not None
+    finally:
+        room_timers.cancel_room("END001")
+
+
+def test_keystroke_batches_are_charged_per_keystroke():
+    snippet = "x" * 100
+    game = Game(id=1, room_code="KEY001", host_user_id=10, snippet_id=1, status="in_progress")
+    race_state.load(game, [
+        GameParticipant(id=100, game_id=1, user_id=10, username="host", progress=0, wpm=0.0, accuracy=0.0, is_finished=False),
+    ], snippet)
+    batches = int(PROGRESS_BURST) + 10
+
+    async def scenario():
+        await connections.add("KEY001", "sid-keys", 10)
+        try:
+            # More events than the progress bucket allows, few keystrokes
+            for i in range(batches):
+                await keystrokes("sid-keys", {"room_code": "KEY001", "keys": [[i, i * 50, "x"]]})
+        finally:
+            await connections.remove("KEY001", "sid-keys")
+
+    try:
+        asyncio.run(scenario())
+        assert race_state.get("KEY001").participants[10].progress == batches
+    finally:
+        race_state.drop("KEY001")
+
+
+def test_rebalance_flushes_progress_before_handing_rooms_off(monkeypatch):
+    calls = []
+
+    async def flush():
+        calls.append("flush")
+        return 1
+
+    async def emit(event, data, room=None, **kwargs):
+        calls.append((event, room))
+
+    monkeypatch.setattr(socketio_server.progress_writer, "flush", flush)
+    monkeypatch.setattr(socketio_server.sio, "emit", emit)
+    monkeypatch.setattr(socketio_server.room_affinity, "owns", lambda room_code: room_code != "MOV001")
+
+    async def scenario():
+        await connections.add("MOV001", "sid-move", 10)
+        await connections.add("STAY01", "sid-stay", 11)
+        try:
+            await handle_rebalance(("a",), ("a", "b"), [])
+        finally:
+            await connections.remove("MOV001", "sid-move")
+            await connections.remove("STAY01", "sid-stay")
+            socketio_server.migrating_sids.discard("sid-move")
+
+    asyncio.run(scenario())
+
+    assert calls == ["flush", ("room_migrate", "MOV001")]
+
+
+def test_finish_is_recorded_even_if_the_progress_flush_fails(monkeypatch):
+    calls = []
+
+    async def flush():
+        raise RuntimeError("database unavailable")
+
+    async def run_game_service(room_code, fn, *args, **kwargs):
+        calls.append(fn.__name__)
+        raise RuntimeError("finish attempted")
+
+    async def emit(event, data, to=None, **kwargs):
+        calls.append((event, data))
+
+    monkeypatch.setattr(socketio_server.progress_writer, "flush", flush)
+    monkeypatch.setattr(socketio_server, "run_game_service", run_game_service)
+    monkeypatch.setattr(socketio_server.sio, "emit", emit)
+
+    asyncio.run(finish_race("sid-fin", {"room_code": "FIN001", "user_id": 10}))
+
+    assert calls == ["finish_participant", ("error", {"message": "finish attempted"})]
+
+
+def test_async_db_mode_runs_game_service_on_an_async_session(db_session, make_user, snippet, monkeypatch):
+    host, guest = make_user("host"), make_user("guest")
+    game = Game(room_code="ASY001", host_user_id=host.id, snippet_id=snippet.id,
+                status="in_progress", player_count=2)
+    db_session.add(game)
+    db_session.commit()
+    db_session.add_all([GameParticipant(game_id=game.id, user_id=u.id, username=u.username) for u in (host, guest)])
+    db_session.commit()
+    monkeypatch.setattr(socketio_server, "socket_db_mode", "async")
+
+    async def scenario():
+        try:
+            return await socketio_server.run_game_service("ASY001", GameService.finish_participant, ParticipantFinish(
+                room_code="ASY001", user_id=guest.id, wpm=60.0, accuracy=98.0
+            ))
+        finally:
+            # Pooled aiosqlite/asyncpg connections belong to this event loop
+            await async_engine.dispose()
+
+    outcome = asyncio.run(scenario())
+
+    assert outcome["finish_position"] == 1
+    assert outcome["status"] == "in_progress"
+    db_session.expire_all()
+    assert db_session.get(Game, game.id).finished_count == 1
@@ -0,0 +1,54 @@
+"""
+Tests for the downsampled spectator feed in realtime/spectators.py
+"""
+import asyncio
+from backend.realtime.spectators import SpectatorFeed, spectator_channel
+
+
+def make_feed():
+    sent = []
+
+    async def emit(room_code):
+        sent.append(room_code)
+
+    return SpectatorFeed(emit, hz=3), sent
+
+
+def test_many_changes_make_one_snapshot_per_tick():
+    feed, sent = make_feed()
+    feed.add("ABC123", "viewer1")
+    feed.add("ABC123", "viewer2")
+
+    for _ in range(50):
+        feed.mark_dirty("ABC123")
+
+    assert asyncio.run(feed.tick()) == 1
+    assert sent == ["ABC123"]
+    assert asyncio.run(feed.tick()) == 0
+
+
+def test_unwatched_rooms_are_never_sent():
+    feed, sent = make_feed()
+    feed.mark_dirty("NOBODY")
+
+    asyncio.run(feed.tick())
+    assert sent == []
+    assert feed.marks == 0
+
+
+def test_switching_rooms_and_leaving():
+    feed, sent = make_feed()
+    feed.add("ROOM01", "viewer")
+
+    assert feed.add("ROOM02", "viewer") == "ROOM01"
+    assert feed.count("ROOM01") == 0
+    assert feed.remove("viewer") == "ROOM02"
+
+    feed.mark_dirty("ROOM02")
+    asyncio.run(feed.tick())
+    assert sent == []
+    assert feed.stats()["spectators"] == 0
+
+
+def test_spectator_channel_is_separate_from_the_room():
+    assert spectator_channel("ABC123") != "ABC123"
@@ -0,0 +1,94 @@
+"""
+Tests for the hierarchical timer wheel and room timers in realtime/timers.py
+"""
+import asyncio
+import random
+import pytest
+from backend.realtime.timers import (
+    RoomTimers, TimerWheel, TIMER_COUNTDOWN, TIMER_LOBBY_IDLE, TIMER_RACE_DEADLINE, TIMER_RESUME
+)
+
+
+def test_timers_fire_in_deadline_order():
+    wheel = TimerWheel(tick_s=1, slots=8, levels=2)
+    for key, at in (("c", 30), ("a", 3), ("b", 9)):
+        wheel.schedule(key, at)
+
+    assert wheel.advance(2) == []
+    assert wheel.advance(10) == ["a", "b"]
+    assert wheel.advance(100) == ["c"]
+    assert len(wheel) == 0
+
+
+def test_cascades_and_far_timers_fire_on_time():
+    rng = random.Random(7)
+    wheel = TimerWheel(tick_s=1, slots=8, levels=3, now=123)
+    # Up to four times the wheel's 512-tick range
+    deadlines = {key: 124 + rng.randrange(2000) for key in range(500)}
+    for key, at in deadlines.items():
+        wheel.schedule(key, at)
+
+    fired = {}
+    now = 123
+    while now < 2700:
+        now += rng.randint(1, 4)
+        for key in wheel.advance(now):
+            fired[key] = now
+
+    assert fired.keys() == deadlines.keys()
+    assert all(0 <= fired[key] - at < 4 for key, at in deadlines.items())
+
+
+def test_reschedule_and_cancel():
+    wheel = TimerWheel(tick_s=1, slots=8, levels=2)
+    wheel.schedule("room", 5)
+    wheel.schedule("room", 20)
+    wheel.schedule("gone", 6)
+
+    assert wheel.cancel("gone") is True
+    assert wheel.cancel("gone") is False
+    assert wheel.advance(10) == []
+    assert wheel.advance(20) == ["room"]
+
+
+def test_room_timers_call_handler_per_kind(clock):
+    timers = RoomTimers(tick_s=0.1, clock=clock)
+    calls = []
+
+    async def on_expire(room_code, kind, subject):
+        calls.append((room_code, kind))
+
+    timers.on_expire = on_expire
+    timers.schedule("ABC123", TIMER_COUNTDOWN, 5)
+    timers.schedule("ABC123", TIMER_LOBBY_IDLE, 1)
+    timers.schedule("XYZ789", TIMER_RACE_DEADLINE, 2)
+    timers.cancel_room("ABC123")
+    timers.schedule("ABC123", TIMER_COUNTDOWN, 3)
+
+    clock.now = 2.5
+    asyncio.run(timers.tick())
+    assert calls == [("XYZ789", TIMER_RACE_DEADLINE)]
+    assert timers.remaining("ABC123", TIMER_COUNTDOWN) == pytest.approx(0.5)
+
+    clock.now = 3.0
+    asyncio.run(timers.tick())
+    assert calls[-1] == ("ABC123", TIMER_COUNTDOWN)
+    assert timers.stats() == {'pending': 0, 'rooms': 0, 'fired': 2}
+
+
+def test_resume_timers_are_per_subject(clock):
+    timers = RoomTimers(tick_s=0.1, clock=clock)
+    calls = []
+
+    async def on_expire(room_code, kind, subject):
+        calls.append((room_code, kind, subject))
+
+    timers.on_expire = on_expire
+    timers.schedule("ABC123", TIMER_RESUME, 1, subject=1)
+    timers.schedule("ABC123", TIMER_RESUME, 1, subject=2)
+    assert timers.cancel("ABC123", TIMER_RESUME, 1) is True
+
+    clock.now = 1.0
+    asyncio.run(timers.tick())
+    assert calls == [("ABC123", TIMER_RESUME, 2)]
+    assert timers.stats()['rooms'] == 0
@@ -0,0 +1,82 @@
+"""
+Tests for keystroke-batch typing statistics in realtime/typing_stats.py
+"""
+import pytest
+from backend.models import Game, GameParticipant
+from backend.realtime.race_state import RaceStateEngine
+from backend.realtime.typing_stats import KeystrokeError, TypingStats
+
+SNIPPET = "def f():\n    return 1"
+
+
+def keys(text: str, start: int = 0, t0: int = 0, step: int = 100) -> list:
+    return [[start + i, t0 + i * step, ch] for i, ch in enumerate(text)]
+
+
+def test_counts_correct_and_wrong_keystrokes():
+    stats = TypingStats()
+    stats.apply(keys("dex"), SNIPPET, now=0.0)
+
+    assert stats.typed == 3
+    assert stats.correct == 2
+    assert stats.progress == 2
+    assert stats.accuracy() == pytest.approx(66.67)
+
+
+def test_retyping_a_passed_offset_earns_nothing():
+    stats = TypingStats()
+    stats.apply([[0, t, "d"] for t in range(0, 640, 10)], SNIPPET, now=1.0)
+
+    assert stats.progress == 1
+    assert stats.correct == 1
+    # One character over 0.63 s, not 64
+    assert stats.wpm(now=1.0) == pytest.approx(19.0, abs=0.1)
+
+
+def test_progress_skips_untyped_indentation():
+    stats = TypingStats()
+    stats.apply(keys("def f():\n"), SNIPPET, now=0.0)
+    # The client types "return 1" without the four leading spaces
+    stats.apply(keys("re", start=13, t0=1000), SNIPPET, now=1.0)
+
+    assert stats.progress == 15
+
+
+def test_wpm_uses_the_slower_of_client_and_server_clocks():
+    stats = TypingStats()
+    # 10 correct chars = 2 words, client claims they took 0.9 s
+    stats.apply(keys("def f():\n ", step=100), SNIPPET, now=100.0)
+
+    assert stats.wpm(now=100.0) == pytest.approx(2 / (0.9 / 60), rel=1e-3)
+    # 60 s later on the server the same counters are only 2 WPM
+    assert stats.wpm(now=160.0) == pytest.approx(2.0, rel=1e-2)
+
+
+@pytest.mark.parametrize("batch", [
+    [],
+    [[0, 0]],
+    [[0, 0, "de"]],
+    [[99, 0, "d"]],
+    [["0", 0, "d"]],
+    [[0, 500, "d"], [1, 100, "e"]],
+])
+def test_malformed_batches_are_rejected(batch):
+    stats = TypingStats()
+    with pytest.raises(KeystrokeError):
+        stats.apply(batch, SNIPPET, now=0.0)
+    assert stats.typed == 0
+
+
+def test_race_state_derives_participant_values_from_keystrokes():
+    engine = RaceStateEngine()
+    game = Game(id=1, room_code="ABC123", host_user_id=10, snippet_id=1, status="in_progress")
+    engine.load(game, [
+        GameParticipant(id=100, game_id=1, user_id=10, username="host", progress=0, wpm=0.0, accuracy=0.0, is_finished=False),
+    ], SNIPPET)
+
+    participant = engine.apply_keystrokes("ABC123", 10, keys("def"), now=10.0)
+
+    assert participant.progress == 3
+    assert participant.accuracy == 100.0
+    assert participant.wpm > 0
+    assert engine.typing_result("ABC123", 10, now=10.0) == (participant.wpm, participant.accuracy)
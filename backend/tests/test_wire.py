@@ -0,0 +1,68 @@
+"""
+Tests for the compact binary wire format in realtime/wire.py
+"""
+import json
+import pytest
+from pydantic import ValidationError
+from backend.realtime.broadcaster import progress_frame
+from backend.realtime.race_state import ParticipantState
+from backend.schemas.game import GameCreate
+from backend.realtime.wire import (
+    FRAME_FINISH, FRAME_PROGRESS, WireFormatError, decode_client_progress, decode_frame,
+    encode_client_progress, encode_finish_frame, encode_progress_frame
+)
+
+
+def make_participants(count: int):
+    return [
+        ParticipantState(participant_id=i, user_id=1000 + i, username=f"racer{i}", slot=i,
+                         progress=10 * i, wpm=55.5 + i, accuracy=97.25)
+        for i in range(count)
+    ]
+
+
+def test_progress_frame_round_trip():
+    participants = make_participants(3)
+
+    frame_type, entries = decode_frame(encode_progress_frame(participants))
+
+    assert frame_type == FRAME_PROGRESS
+    assert [e["slot"] for e in entries] == [0, 1, 2]
+    assert entries[2] == {"slot": 2, "progress": 20, "wpm": 57.5, "accuracy": 97.25}
+
+
+def test_finish_frame_round_trip():
+    participant = make_participants(1)[0]
+    participant.finish_position = 2
+
+    frame_type, entries = decode_frame(encode_finish_frame(participant))
+
+    assert frame_type == FRAME_FINISH
+    assert entries == [{"slot": 0, "wpm": 55.5, "accuracy": 97.25, "position": 2}]
+
+
+def test_binary_frame_is_smaller_than_json():
+    participants = make_participants(8)
+
+    binary = encode_progress_frame(participants)
+    as_json = json.dumps(progress_frame("ABC123", participants)).encode()
+
+    assert len(binary) == 4 + 8 * 9
+    assert len(binary) * 4 < len(as_json)
+
+
+def test_client_progress_round_trip_and_validation():
+    assert decode_client_progress(encode_client_progress(42, 88.8, 99.5)) == (42, 88.8, 99.5)
+    with pytest.raises(WireFormatError):
+        decode_client_progress(b"\x00\x01")
+    with pytest.raises(WireFormatError):
+        decode_frame(b"\x09\x01\x00\x00")
+
+
+def test_rooms_fit_single_byte_slots():
+    frame = encode_progress_frame(make_participants(255))
+
+    assert decode_frame(frame)[1][-1]["slot"] == 254
+    assert GameCreate(user_id=1, max_players=255).max_players == 255
+    with pytest.raises(ValidationError):
+        GameCreate(user_id=1, max_players=256)
@@ -0,0 +1,93 @@
+"""
+Tests for the coalescing progress write-behind in realtime/write_behind.py
+"""
+import asyncio
+from sqlalchemy.orm import sessionmaker
+from backend.models import Game, GameParticipant
+from backend.realtime.race_state import ParticipantState
+from backend.realtime.write_behind import ProgressWriteBehind
+
+
+def seed_participant(db_session, user, snippet) -> GameParticipant:
+    game = Game(room_code="WB0001", host_user_id=user.id, snippet_id=snippet.id, status="in_progress")
+    db_session.add(game)
+    db_session.commit()
+    participant = GameParticipant(game_id=game.id, user_id=user.id, username=user.username)
+    db_session.add(participant)
+    db_session.commit()
+    return participant
+
+
+def test_mark_dirty_keeps_last_value_per_participant():
+    writer = ProgressWriteBehind(session_factory=None)
+    state = ParticipantState(participant_id=1, user_id=1, username="a")
+
+    for progress in range(5):
+        state.progress = progress
+        writer.mark_dirty(state)
+
+    assert len(writer) == 1
+    assert writer.coalesced == 4
+    assert writer.marked == 5
+
+
+def test_flush_writes_latest_progress_in_one_batch(db_session, make_user, snippet):
+    row = seed_participant(db_session, make_user("racer"), snippet)
+    writer = ProgressWriteBehind(session_factory=sessionmaker(bind=db_session.get_bind()))
+    state = ParticipantState(participant_id=row.id, user_id=row.user_id, username=row.username)
+
+    for progress in (2, 5, 9):
+        state.progress, state.wpm, state.accuracy = progress, 40.0 + progress, 97.5
+        writer.mark_dirty(state)
+    flushed = asyncio.run(writer.flush())
+
+    db_session.refresh(row)
+    assert flushed == 1
+    assert writer.stats()["flushes"] == 1
+    assert writer.stats()["pending"] == 0
+    assert row.progress == 9
+    assert row.wpm == 49.0
+    assert row.accuracy == 97.5
+
+
+def test_flush_skips_finished_participants(db_session, make_user, snippet):
+    row = seed_participant(db_session, make_user("racer"), snippet)
+    row.is_finished = True
+    row.progress = 11
+    db_session.commit()
+    writer = ProgressWriteBehind(session_factory=sessionmaker(bind=db_session.get_bind()))
+
+    writer.mark_dirty(ParticipantState(participant_id=row.id, user_id=row.user_id, username=row.username, progress=3))
+    asyncio.run(writer.flush())
+
+    db_session.refresh(row)
+    assert row.progress == 11
+
+
+def test_size_threshold_wakes_flush_loop():
+    writer = ProgressWriteBehind(session_factory=None, max_pending=2)
+
+    async def fill():
+        writer.start()
+        writer.mark_dirty(ParticipantState(participant_id=1, user_id=1, username="a"))
+        assert not writer._wakeup.is_set()
+        writer.mark_dirty(ParticipantState(participant_id=2, user_id=2, username="b"))
+        assert writer._wakeup.is_set()
+        writer.discard([1, 2])
+        await writer.stop()
+
+    asyncio.run(fill())
+
+
+def test_restarts_on_a_new_event_loop():
+    writer = ProgressWriteBehind(session_factory=None, interval_ms=10)
+
+    async def lifespan():
+        writer.start()
+        await asyncio.sleep(0.02)
+        await writer.stop()
+
+    # e.g. a uvicorn reload or a second TestClient in the same process
+    asyncio.run(lifespan())
+    asyncio.run(lifespan())
+    assert writer._task is None
@@ -65,6 +65,9 @@ CREATE TABLE IF NOT EXISTS games (
     snippet_id INTEGER NOT NULL REFERENCES snippets(id),
     status VARCHAR(20) DEFAULT 'waiting',
     max_players INTEGER DEFAULT 4,
+    player_count INTEGER NOT NULL DEFAULT 0,
+    finished_count INTEGER NOT NULL DEFAULT 0,
+    last_finish_position INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     started_at TIMESTAMP,
     finished_at TIMESTAMP
@@ -72,6 +75,7 @@ CREATE TABLE IF NOT EXISTS games (
 
 CREATE INDEX IF NOT EXISTS idx_games_id ON games(id);
 CREATE INDEX IF NOT EXISTS idx_games_room_code ON games(room_code);
+CREATE INDEX IF NOT EXISTS ix_games_status ON games(status);
 
 -- Game Participants table
 CREATE TABLE IF NOT EXISTS game_participants (
@@ -90,10 +94,37 @@ CREATE TABLE IF NOT EXISTS game_participants (
 
 CREATE INDEX IF NOT EXISTS idx_game_participants_id ON game_participants(id);
 
+-- Race replays (one packed progress timeline per finished race)
+CREATE TABLE IF NOT EXISTS race_replays (
+    id SERIAL PRIMARY KEY,
+    game_id INTEGER REFERENCES games(id) ON DELETE SET NULL,
+    room_code VARCHAR(10) NOT NULL,
+    snippet_id INTEGER REFERENCES snippets(id),
+    duration_ms INTEGER NOT NULL,
+    event_count INTEGER NOT NULL,
+    data BYTEA NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_race_replays_id ON race_replays(id);
+CREATE INDEX IF NOT EXISTS idx_race_replays_game_id ON race_replays(game_id);
+CREATE INDEX IF NOT EXISTS idx_race_replays_room_code ON race_replays(room_code);
+
+-- Upgrading a database created before the game counters (safe to re-run;
+-- the app applies the same steps on startup, see backend/migrations.py)
+ALTER TABLE games ADD COLUMN IF NOT EXISTS player_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE games ADD COLUMN IF NOT EXISTS finished_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE games ADD COLUMN IF NOT EXISTS last_finish_position INTEGER NOT NULL DEFAULT 0;
+UPDATE games SET
+    player_count = (SELECT COUNT(*) FROM game_participants p WHERE p.game_id = games.id),
+    finished_count = (SELECT COUNT(*) FROM game_participants p WHERE p.game_id = games.id AND p.is_finished),
+    last_finish_position = COALESCE((SELECT MAX(p.finish_position) FROM game_participants p WHERE p.game_id = games.id), 0);
+
 -- Comments for documentation
 COMMENT ON TABLE users IS 'Registered users of the application';
 COMMENT ON TABLE languages IS 'Programming languages available for code snippets';
 COMMENT ON TABLE snippets IS 'Code snippets used in typing races';
 COMMENT ON TABLE scores IS 'Individual user scores for completed typing races';
 COMMENT ON TABLE games IS 'Multiplayer game sessions';
-COMMENT ON TABLE game_participants IS 'Players participating in multiplayer games';
\ No newline at end of file
+COMMENT ON TABLE game_participants IS 'Players participating in multiplayer games';
+COMMENT ON TABLE race_replays IS 'Compact progress timelines of finished races';
\ No newline at end of file
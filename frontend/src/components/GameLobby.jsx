@@ -1,6 +1,8 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import { io } from "socket.io-client";
 import { getGame, startGame } from "../api";
+import { followRoomMigration, trackRoomSession, resumeToken } from "../roomSocket";
+import { applyRoomChanges, deltaApplies } from "../roomSync";
 import "../styles/GameLobby.css";
 
 export default function GameLobby({ roomCode, userId, onStartRace, onBack }) {
@@ -10,6 +12,8 @@ export default function GameLobby({ roomCode, userId, onStartRace, onBack }) {
   const [error, setError] = useState("");
   const [isHost, setIsHost] = useState(false);
   const [languageName, setLanguageName] = useState("");
+  // Last room state version applied; sent on (re)join to get only the delta
+  const versionRef = useRef(null);
 
   useEffect(() => {
     // Fetch initial game data
@@ -17,7 +21,10 @@ export default function GameLobby({ roomCode, userId, onStartRace, onBack }) {
       try {
         const data = await getGame(roomCode);
         setGameData(data.game);
-        setParticipants(data.participants);
+        // The socket's versioned roster wins once it has arrived
+        if (versionRef.current === null) {
+          setParticipants(data.participants);
+        }
         setIsHost(data.game.host_user_id === userId);
         if (data.snippet_language) {
           setLanguageName(data.snippet_language);
@@ -40,26 +47,59 @@ export default function GameLobby({ roomCode, userId, onStartRace, onBack }) {
       path: "/socket.io",
       transports: ["websocket", "polling"]
     });
+    followRoomMigration(newSocket);
+    trackRoomSession(newSocket);
 
     newSocket.on("connect", () => {
       console.log("Connected to server");
-      newSocket.emit("join_room", { room_code: roomCode, user_id: userId });
+      newSocket.emit("join_room", {
+        room_code: roomCode,
+        user_id: userId,
+        since_version: versionRef.current,
+        resume_token: resumeToken(roomCode)
+      });
+    });
+
+    const applyChanges = (changes) => {
+      setParticipants((prev) => applyRoomChanges(prev, null, changes).participants);
+      const roomChanges = changes.filter((change) => change.op === "room");
+      if (roomChanges.length) {
+        const latest = roomChanges[roomChanges.length - 1];
+        setGameData((prev) => prev ? { ...prev, host_user_id: latest.host_user_id, status: latest.status } : prev);
+        setIsHost(latest.host_user_id === userId);
+      }
+    };
+
+    // Apply a versioned delta, or ask for a sync when versions don't line up
+    const applyDelta = (data) => {
+      if (data?.version != null && versionRef.current !== null && data.version <= versionRef.current) return;
+      if (!deltaApplies(versionRef.current, data)) {
+        newSocket.emit("sync_room", { room_code: roomCode, since_version: versionRef.current });
+        return;
+      }
+      applyChanges(data.changes);
+      versionRef.current = data.version;
+    };
+
+    newSocket.on("room_sync", (data) => {
+      if (data.full) {
+        setParticipants(data.participants);
+        setGameData((prev) => prev ? { ...prev, host_user_id: data.host_user_id, status: data.status } : prev);
+        setIsHost(data.host_user_id === userId);
+      } else {
+        applyChanges(data.changes);
+      }
+      versionRef.current = data.version;
     });
 
     newSocket.on("player_joined", (data) => {
       console.log("Player joined:", data);
-      setParticipants(data.participants);
+      applyDelta(data);
     });
 
     newSocket.on("player_left", (data) => {
       console.log("Player left:", data);
-      // Update participants directly if provided
-      if (data && Array.isArray(data.participants)) {
-        setParticipants(data.participants);
-      } else {
-        // Fallback: refresh game data
-        fetchGameData();
-      }
+      applyDelta(data);
       // Handle host transfer
       if (data && data.new_host_id) {
         setGameData((prev) => prev ? { ...prev, host_user_id: data.new_host_id } : prev);
@@ -82,6 +122,7 @@ export default function GameLobby({ roomCode, userId, onStartRace, onBack }) {
       console.log("Rematch started:", data);
       // Refresh game data to get new snippet
       fetchGameData();
+      applyDelta(data);
     });
 
     newSocket.on("game_deleted", (data) => {
@@ -2,6 +2,7 @@
 import { useState, useEffect, useRef } from "react";
 import { io } from "socket.io-client";
 import { getGame } from "../api";
+import { followRoomMigration, trackRoomSession, resumeToken } from "../roomSocket";
 import CodeDisplay from "./CodeDisplay";
 import TypingInput from "./TypingInput";
 import RaceCountdown from "./RaceCountdown";
@@ -14,6 +15,7 @@ const MAX_CONSECUTIVE_ERRORS = 7;
 const SOCKET_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
 const COUNTDOWN_DURATION = 5;
 const RACE_DURATION_MS = 120000; // 1 minute 30 seconds
+const KEYSTROKE_BATCH_MAX = 64; // Matches the server's KEYSTROKE_MAX_BATCH
 
 export default function MultiplayerRace({ roomCode, userId, onFinish }) {
   // Game state
@@ -43,9 +45,16 @@ export default function MultiplayerRace({ roomCode, userId, onFinish }) {
   const [socket, setSocket] = useState(null);
   const inputRef = useRef(null);
   const lastBroadcastRef = useRef(0);
+  // Keystrokes not yet sent: [snippet offset, ms since race start, char]
+  const keyBufferRef = useRef([]);
 
   // Computed values
   const lines = snippet.split('\n');
+  // Snippet offset where each line starts
+  const lineStarts = lines.reduce((starts, line, i) => {
+    starts.push(i === 0 ? 0 : starts[i - 1] + lines[i - 1].length + 1);
+    return starts;
+  }, []);
   const formatTime = (ms) => {
     const s = Math.max(0, Math.floor(ms / 1000));
     const m = Math.floor(s / 60);
@@ -88,10 +97,16 @@ export default function MultiplayerRace({ roomCode, userId, onFinish }) {
       path: "/socket.io",
       transports: ["websocket", "polling"]
     });
+    followRoomMigration(newSocket);
+    trackRoomSession(newSocket);
 
     newSocket.on("connect", () => {
       console.log("Connected to race");
-      newSocket.emit("join_room", { room_code: roomCode, user_id: userId });
+      newSocket.emit("join_room", {
+        room_code: roomCode,
+        user_id: userId,
+        resume_token: resumeToken(roomCode)
+      });
     });
 
     newSocket.on("progress_update", handleProgressUpdate);
@@ -132,12 +147,16 @@ export default function MultiplayerRace({ roomCode, userId, onFinish }) {
   // ==================== SOCKET EVENT HANDLERS ====================
 
   const handleProgressUpdate = (data) => {
+    // One frame per server tick carrying every participant that changed
+    const updates = Array.isArray(data.updates) ? data.updates : [data];
     setParticipants((prev) => {
       const updated = [...prev];
-      const idx = updated.findIndex((p) => p.user_id === data.user_id);
-      if (idx >= 0) {
-        updated[idx] = { ...updated[idx], ...data };
-      }
+      updates.forEach((entry) => {
+        const idx = updated.findIndex((p) => p.user_id === entry.user_id);
+        if (idx >= 0) {
+          updated[idx] = { ...updated[idx], ...entry };
+        }
+      });
       return updated;
     });
   };
@@ -175,19 +194,26 @@ export default function MultiplayerRace({ roomCode, userId, onFinish }) {
 
   // ==================== PROGRESS BROADCASTING ====================
 
-  const broadcastProgress = (completedLinesOverride = null) => {
+  // Lines are typed without their leading whitespace
+  const recordKeystroke = (lineIndex, column, char) => {
+    if (!startTime) return;
+    const line = lines[lineIndex];
+    const indent = line.length - line.trimStart().length;
+    keyBufferRef.current.push([lineStarts[lineIndex] + indent + column, Date.now() - startTime, char]);
+  };
+
+  // The server derives progress, WPM and accuracy from the keystrokes
+  const broadcastProgress = () => {
     if (!socket) return;
 
-    const linesToUse = completedLinesOverride || completedLines;
-    const totalChars = linesToUse.join('\n').length + userInput.length;
-    
-    socket.emit("update_progress", {
-      room_code: roomCode,
-      user_id: userId,
-      progress: totalChars,
-      wpm: calculateWPM(),
-      accuracy: calculateAccuracy()
-    });
+    const pending = keyBufferRef.current;
+    keyBufferRef.current = [];
+    for (let i = 0; i < pending.length; i += KEYSTROKE_BATCH_MAX) {
+      socket.emit("keystrokes", {
+        room_code: roomCode,
+        keys: pending.slice(i, i + KEYSTROKE_BATCH_MAX)
+      });
+    }
     
     lastBroadcastRef.current = Date.now();
   };
@@ -225,6 +251,7 @@ export default function MultiplayerRace({ roomCode, userId, onFinish }) {
 
     // Check if the new character is correct
     const newCharIndex = value.length - 1;
+    recordKeystroke(currentLineIndex, newCharIndex, value[newCharIndex]);
     const isCorrect = value[newCharIndex] === currentLine[newCharIndex];
 
     if (isCorrect) {
@@ -263,6 +290,9 @@ export default function MultiplayerRace({ roomCode, userId, onFinish }) {
     // Only accept perfect match
     if (userInput !== currentLine) return;
 
+    if (currentLineIndex < lines.length - 1) {
+      recordKeystroke(currentLineIndex, currentLine.length, "\n");
+    }
     const newCompletedLines = [...completedLines, lines[currentLineIndex]];
     setCompletedLines(newCompletedLines);
     
@@ -272,7 +302,7 @@ export default function MultiplayerRace({ roomCode, userId, onFinish }) {
     setConsecutiveErrors(0);
 
     // Broadcast progress immediately on line completion
-    broadcastProgress(newCompletedLines);
+    broadcastProgress();
 
     // Check completion
     if (newLineIndex >= lines.length) {
@@ -305,6 +335,7 @@ export default function MultiplayerRace({ roomCode, userId, onFinish }) {
           // Time's up: finish race with current stats
           setIsFinished(true);
           if (socket) {
+            broadcastProgress();
             socket.emit("finish_race", {
               room_code: roomCode,
               user_id: userId,
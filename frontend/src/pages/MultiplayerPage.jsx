@@ -5,6 +5,7 @@ import GameLobby from "../components/GameLobby";
 import { getGame } from "../api";
 import MultiplayerRace from "../components/MultiplayerRace";
 import { io } from "socket.io-client";
+import { followRoomMigration, trackRoomSession, resumeToken } from "../roomSocket";
 import "../styles/MultiplayerRace.css";
 
 export default function MultiplayerPage({ userId, username, onBack }) {
@@ -39,9 +40,15 @@ export default function MultiplayerPage({ userId, username, onBack }) {
       path: "/socket.io",
       transports: ["websocket", "polling"]
     });
+    followRoomMigration(socket);
+    trackRoomSession(socket);
 
     socket.on("connect", () => {
-      socket.emit("join_room", { room_code: roomCode, user_id: effectiveUserId });
+      socket.emit("join_room", {
+        room_code: roomCode,
+        user_id: effectiveUserId,
+        resume_token: resumeToken(roomCode)
+      });
     });
 
     socket.on("rematch_started", (data) => {
@@ -0,0 +1,28 @@
+// Room affinity: the server can ask a socket to reconnect to the worker
+// that owns its room (on join, or after workers are rebalanced). The same
+// socket object reconnects, so every registered handler keeps working and
+// the "connect" handler re-joins the room.
+export const followRoomMigration = (socket) => {
+  socket.on("room_migrate", (data) => {
+    const endpoint = data?.endpoint;
+    if (!endpoint || endpoint === socket.io.uri) return;
+    socket.io.uri = endpoint;
+    socket.disconnect();
+    socket.connect();
+  });
+};
+
+// Resumable sessions: every join_room answers with a resume token. Sending
+// it back on the next join_room (after a dropped connection or a page
+// reload) keeps the player's slot and progress while the server's grace
+// window is open, instead of leaving and re-joining the room.
+const resumeKey = (roomCode) => `resume_token:${String(roomCode).toUpperCase()}`;
+
+export const trackRoomSession = (socket) => {
+  socket.on("session", (data) => {
+    if (!data?.room_code || !data?.resume_token) return;
+    sessionStorage.setItem(resumeKey(data.room_code), data.resume_token);
+  });
+};
+
+export const resumeToken = (roomCode) => sessionStorage.getItem(resumeKey(roomCode));
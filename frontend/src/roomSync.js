@@ -0,0 +1,30 @@
+// Versioned room state: the server tags roster/lifecycle changes with a
+// per-room version. Deltas are applied in order; any gap means the client
+// missed something and should ask for a sync (room_sync reply).
+
+// Apply a list of changes to a participants array and room fields
+export const applyRoomChanges = (participants, room, changes) => {
+  let nextParticipants = participants;
+  let nextRoom = room;
+  for (const change of changes) {
+    if (change.op === "upsert") {
+      const incoming = change.participant;
+      const exists = nextParticipants.some((p) => p.user_id === incoming.user_id);
+      nextParticipants = exists
+        ? nextParticipants.map((p) => (p.user_id === incoming.user_id ? incoming : p))
+        : [...nextParticipants, incoming];
+    } else if (change.op === "remove") {
+      nextParticipants = nextParticipants.filter((p) => p.user_id !== change.user_id);
+    } else if (change.op === "room") {
+      nextRoom = { ...nextRoom, host_user_id: change.host_user_id, status: change.status };
+    }
+  }
+  return { participants: nextParticipants, room: nextRoom };
+};
+
+// Whether a broadcast delta applies cleanly on top of the known version
+export const deltaApplies = (knownVersion, data) => {
+  if (knownVersion === null || !Array.isArray(data?.changes)) return false;
+  if (data.changes.length === 0) return data.version === knownVersion;
+  return data.changes[0].version === knownVersion + 1;
+};